@@ -0,0 +1,85 @@
+"""
+Pasting N objects through POST /api/canvas/objects/bulk_create/.
+
+  per-item  what the endpoint used to do: a CanvasObjectCreateSerializer
+            and save() per object, so one whiteboard lookup and one INSERT
+            each.
+  bulk      the endpoint as it is: one validation pass and multi-row
+            INSERTs of BULK_CREATE_BATCH_SIZE rows.
+
+Reports latency and queries per request for each size.
+
+    python benchmarks/bench_bulk_create.py [--sizes 100,1000,10000] [--repeat 3]
+"""
+import argparse
+import random
+
+from common import TestDatabase, client_for, measure, print_table
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from boards.models import Whiteboard
+from canvas.models import CanvasObject
+from canvas.serializers import CanvasObjectCreateSerializer
+
+OWNER = 1
+
+
+def make_objects(count, seed):
+    rng = random.Random(seed)
+    return [
+        {"object_type": rng.choice(["rectangle", "circle", "text"]),
+         "x": rng.uniform(0, 1600), "y": rng.uniform(0, 900),
+         "width": rng.uniform(10, 300), "height": rng.uniform(10, 300),
+         "color": "#%06X" % rng.randrange(0x1000000), "data": {"text": "pasted"}}
+        for _ in range(count)
+    ]
+
+
+def per_item(whiteboard_id, objects):
+    request = APIRequestFactory().post("/")
+    request.user = type("User", (), {"id": OWNER})()
+    force_authenticate(request)
+    with transaction.atomic():
+        for data in objects:
+            serializer = CanvasObjectCreateSerializer(data={**data, "whiteboard": whiteboard_id},
+                                                      context={"request": request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+
+def bulk(client, whiteboard_id, objects):
+    response = client.post("/api/canvas/objects/bulk_create/",
+                           {"whiteboard": whiteboard_id, "objects": objects}, format="json")
+    assert response.status_code == 201, response.content[:200]
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    with TestDatabase():
+        whiteboard = Whiteboard.objects.create(name="bench", owner_id=OWNER)
+        client = client_for(OWNER)
+        for size in (int(n) for n in args.sizes.split(",")):
+            objects = make_objects(size, size)
+            for mode in ("per-item", "bulk"):
+                best, queries = None, 0
+                for _ in range(args.repeat):
+                    if mode == "bulk":
+                        _, elapsed, queries = measure(lambda: bulk(client, whiteboard.id, objects))
+                    else:
+                        _, elapsed, queries = measure(lambda: per_item(whiteboard.id, objects))
+                    best = elapsed if best is None else min(best, elapsed)
+                    CanvasObject.objects.all().delete()
+                rows.append([size, mode, f"{best:,.0f}", f"{best * 1000 / size:.0f}", queries])
+
+    print_table(["objects", "mode", "latency ms", "us/object", "queries"], rows)
+
+
+if __name__ == "__main__":
+    main()
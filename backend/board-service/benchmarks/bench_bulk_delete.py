@@ -0,0 +1,94 @@
+"""
+Deleting a large selection through POST /api/canvas/objects/bulk_delete/.
+
+  per-item  what the endpoint used to do: get() each object, check its
+            whiteboard permission (two queries for a shared board), and
+            delete() it, all in one transaction.
+  bulk      the endpoint as it is: one fetch, permission once per
+            whiteboard, one DELETE.
+
+The caller has edit rights through a WhiteboardPermission on --boards
+shared boards, so the permission check is the expensive path.
+
+    python benchmarks/bench_bulk_delete.py [--objects 10000] [--boards 4]
+"""
+import argparse
+
+from common import TestDatabase, client_for, measure, print_table
+from django.db import transaction
+
+from boards.models import Whiteboard, WhiteboardPermission
+from canvas.models import CanvasObject
+from canvas.views import CanvasObjectViewSet
+
+OWNER = 1
+EDITOR = 2
+
+
+class User:
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+def create(whiteboards, count):
+    return [obj.id for obj in CanvasObject.objects.bulk_create([
+        CanvasObject(whiteboard=whiteboards[index % len(whiteboards)], object_type="rectangle",
+                     x=index, y=index, created_by=OWNER)
+        for index in range(count)
+    ], batch_size=1000)]
+
+
+def per_item(ids):
+    view = CanvasObjectViewSet()
+    view.request = type("Request", (), {"user": User(EDITOR)})()
+    deleted = 0
+    with transaction.atomic():
+        for obj_id in ids:
+            try:
+                obj = CanvasObject.objects.get(id=obj_id)
+                if not view._check_whiteboard_permission(obj.whiteboard.id, "edit"):
+                    continue
+                obj.delete()
+                deleted += 1
+            except CanvasObject.DoesNotExist:
+                continue
+    return deleted
+
+
+def bulk(client, ids):
+    response = client.post("/api/canvas/objects/bulk_delete/", {"ids": ids}, format="json")
+    assert response.status_code == 200, response.content[:200]
+    return len(response.data["deleted"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=10_000)
+    parser.add_argument("--boards", type=int, default=4)
+    args = parser.parse_args()
+
+    rows = []
+    with TestDatabase():
+        whiteboards = [Whiteboard.objects.create(name=f"bench {index}", owner_id=OWNER)
+                       for index in range(args.boards)]
+        for whiteboard in whiteboards:
+            WhiteboardPermission.objects.create(whiteboard=whiteboard, user_id=EDITOR, permission_level="edit")
+        client = client_for(EDITOR)
+
+        for mode in ("per-item", "bulk"):
+            ids = create(whiteboards, args.objects)
+            if mode == "bulk":
+                deleted, elapsed, queries = measure(lambda: bulk(client, ids))
+            else:
+                deleted, elapsed, queries = measure(lambda: per_item(ids))
+            assert deleted == args.objects and not CanvasObject.objects.exists()
+            rows.append([mode, f"{deleted:,}", f"{elapsed:,.0f}", f"{elapsed * 1000 / deleted:.1f}", f"{queries:,}"])
+
+    print(f"{args.objects:,} objects over {args.boards} shared boards")
+    print_table(["mode", "deleted", "latency ms", "us/object", "queries"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+PATCH latency with and without the board access-list cache.
+
+An editor who has edit rights through a WhiteboardPermission PATCHes
+--objects objects on one board, --requests times in a row, the way a drag
+session with write-through persistence does.
+
+  uncached  BOARD_ACL_CACHE_TTL=0: every request loads the whiteboard and
+            the caller's permission, as _check_whiteboard_permission
+            always did.
+  cached    the access list comes from Django's cache after the first
+            request; a share or board update drops it.
+
+Reports p50/p99 latency and queries per request. The cache is whatever
+CACHES configures: the local-memory default, or Redis when REDIS_HOST is set.
+
+    python benchmarks/bench_permissions.py [--requests 2000] [--objects 50]
+"""
+import argparse
+import itertools
+import random
+
+from common import TestDatabase, client_for, measure, percentile, print_table
+from django.core.cache import cache, caches
+from django.test.utils import override_settings
+
+from boards.models import Whiteboard, WhiteboardPermission
+from canvas.models import CanvasObject
+
+OWNER = 1
+EDITOR = 2
+# Stamps keep rising across runs so every PATCH wins and writes its row.
+clock = itertools.count(1)
+
+
+def run(client, objects, requests):
+    rng = random.Random(requests)
+    latencies, queries = [], 0
+    for _ in range(requests):
+        obj = rng.choice(objects)
+        payload = {"x": rng.uniform(0, 1600), "y": rng.uniform(0, 900), "v": [next(clock), 7]}
+        response, elapsed, count = measure(
+            lambda: client.patch(f"/api/canvas/objects/{obj.id}/", payload, format="json")
+        )
+        assert response.status_code == 200, response.content[:200]
+        latencies.append(elapsed)
+        queries += count
+    return latencies, queries / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--objects", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = []
+    with TestDatabase():
+        whiteboard = Whiteboard.objects.create(name="bench", owner_id=OWNER)
+        WhiteboardPermission.objects.create(whiteboard=whiteboard, user_id=EDITOR, permission_level="edit")
+        objects = CanvasObject.objects.bulk_create([
+            CanvasObject(whiteboard=whiteboard, object_type="rectangle", x=0, y=0, created_by=OWNER)
+            for _ in range(args.objects)
+        ])
+        client = client_for(EDITOR)
+
+        for mode, ttl in (("uncached", 0), ("cached", 60)):
+            cache.clear()
+            with override_settings(BOARD_ACL_CACHE_TTL=ttl):
+                run(client, objects, 50)  # warm up
+                latencies, queries = run(client, objects, args.requests)
+            rows.append([mode, f"{percentile(latencies, 50):.2f}", f"{percentile(latencies, 99):.2f}",
+                         f"{queries:.1f}"])
+
+    print(f"{args.requests:,} PATCHes over {args.objects} objects, {caches['default'].__class__.__name__}")
+    print_table(["mode", "p50 ms", "p99 ms", "queries/request"], rows)
+
+
+if __name__ == "__main__":
+    main()
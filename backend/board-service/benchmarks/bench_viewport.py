@@ -0,0 +1,119 @@
+"""
+First paint of a large board: the whole list versus a ?bbox= viewport.
+
+For each size in --sizes, fills one board with that many objects, spread
+evenly so a 1920x1080 viewport holds about --per-viewport of them (a mix
+of rectangles and freehand strokes), then measures:
+
+  full      GET ?whiteboard=<id>, what the frontend loads today; skipped
+            above --full-limit objects.
+  viewport  GET ?whiteboard=<id>&bbox=... for --samples random viewports.
+  query     the in_bbox() query alone, without serialization.
+
+and prints the query plan of the viewport query at the largest size. On
+Postgres it should use canvas_object_board_bbox (GiST); other databases get
+a B-tree on (whiteboard_id, bbox_min_x, bbox_max_x), which narrows the
+scan on one axis only.
+
+    python benchmarks/bench_viewport.py [--sizes 1000,100000,1000000] [--samples 20]
+"""
+import argparse
+import math
+import random
+import time
+
+from common import TestDatabase, client_for, percentile, print_table
+
+from boards.models import Whiteboard
+from canvas.models import CanvasObject
+
+OWNER = 1
+VIEWPORT = (1920, 1080)
+
+
+def fill(whiteboard, count, side, seed):
+    rng = random.Random(seed)
+    batch = []
+    for index in range(count):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        if index % 3 == 0:
+            steps = [rng.uniform(-40, 40) for _ in range(20)]
+            obj = CanvasObject(whiteboard=whiteboard, object_type="freehand", x=x, y=y,
+                               data={"points": steps}, created_by=OWNER)
+        else:
+            obj = CanvasObject(whiteboard=whiteboard, object_type="rectangle", x=x, y=y,
+                               width=rng.uniform(20, 200), height=rng.uniform(20, 200), created_by=OWNER)
+        obj.update_bounds()
+        batch.append(obj)
+        if len(batch) == 5000:
+            CanvasObject.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    CanvasObject.objects.bulk_create(batch, batch_size=1000)
+
+
+def viewports(side, samples, seed):
+    rng = random.Random(seed)
+    width, height = VIEWPORT
+    for _ in range(samples):
+        x, y = rng.uniform(0, max(0, side - width)), rng.uniform(0, max(0, side - height))
+        yield x, y, x + width, y + height
+
+
+def timed_get(client, params):
+    started = time.perf_counter()
+    response = client.get("/api/canvas/objects/", params)
+    elapsed = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, response.content[:200]
+    return elapsed, len(response.content), len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--per-viewport", type=int, default=50)
+    parser.add_argument("--full-limit", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = []
+    plan = ""
+    with TestDatabase():
+        whiteboard = Whiteboard.objects.create(name="bench", owner_id=OWNER)
+        client = client_for(OWNER)
+        for size in (int(n) for n in args.sizes.split(",")):
+            CanvasObject.objects.all().delete()
+            side = math.sqrt(size / args.per_viewport * VIEWPORT[0] * VIEWPORT[1])
+            fill(whiteboard, size, side, size)
+
+            if size <= args.full_limit:
+                elapsed, payload, count = timed_get(client, {"whiteboard": whiteboard.id})
+                rows.append([f"{size:,}", "full", f"{count:,}", f"{payload / 1024:,.0f}", f"{elapsed:,.1f}", "-"])
+            else:
+                rows.append([f"{size:,}", "full", "-", "-", "(skipped)", "-"])
+
+            latencies, payloads, counts, query_times = [], [], [], []
+            for bbox in viewports(side, args.samples, size):
+                elapsed, payload, count = timed_get(
+                    client, {"whiteboard": whiteboard.id, "bbox": ",".join(f"{v:.0f}" for v in bbox)})
+                latencies.append(elapsed)
+                payloads.append(payload)
+                counts.append(count)
+
+                queryset = CanvasObject.objects.filter(whiteboard=whiteboard).in_bbox(*bbox)
+                started = time.perf_counter()
+                list(queryset.values_list("id", flat=True))
+                query_times.append((time.perf_counter() - started) * 1000)
+            rows.append([
+                f"{size:,}", "viewport", f"{percentile(counts, 50):,}", f"{percentile(payloads, 50) / 1024:,.1f}",
+                f"{percentile(latencies, 50):,.1f}", f"{percentile(query_times, 50):,.2f}",
+            ])
+            plan = queryset.explain()
+
+    print(f"viewport {VIEWPORT[0]}x{VIEWPORT[1]}, ~{args.per_viewport} objects per viewport, "
+          f"p50 of {args.samples} viewports")
+    print_table(["objects", "request", "returned", "payload KiB", "latency ms", "query ms"], rows)
+    print("\nplan at the largest size:\n" + plan)
+
+
+if __name__ == "__main__":
+    main()
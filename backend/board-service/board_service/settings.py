@@ -1,10 +1,14 @@
 from datetime import timedelta
 import os
+import sys
 from pathlib import Path
 from decouple import config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Code shared between services lives in backend/shared (/shared in the containers).
+sys.path.append(str(BASE_DIR.parent / 'shared'))
+
 SECRET_KEY = config('SECRET_KEY', default='django-insecure-board')
 DEBUG = config('DEBUG', default=True, cast=bool)
 # ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1').split(',')
@@ -105,6 +109,26 @@ CORS_ALLOWED_ORIGINS = [
 
 AUTH_SERVICE_URL = config('AUTH_SERVICE_URL', default='http://localhost:8000')
 
+TOKEN_CACHE_SIZE = config('TOKEN_CACHE_SIZE', default=10000, cast=int)
+
+# Shared by all workers when REDIS_HOST is set, per process otherwise
+REDIS_HOST = config('REDIS_HOST', default='')
+REDIS_PORT = config('REDIS_PORT', default=6379, cast=int)
+if REDIS_HOST:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',
+            'KEY_PREFIX': 'board-service',
+        }
+    }
+# Seconds a board's access list stays cached; 0 turns the cache off
+BOARD_ACL_CACHE_TTL = config('BOARD_ACL_CACHE_TTL', default=60, cast=int)
+
+REALTIME_SERVICE_URL = config('REALTIME_SERVICE_URL', default='http://localhost:8002')
+# Shared secret for service-to-service calls between board- and realtime-service
+INTERNAL_SERVICE_TOKEN = config('INTERNAL_SERVICE_TOKEN', default='')
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
 USE_I18N = True
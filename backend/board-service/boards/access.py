@@ -0,0 +1,78 @@
+# board/access.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Whiteboard, WhiteboardPermission
+
+CACHE_PREFIX = 'board-acl'
+
+
+def _cache_key(whiteboard_id):
+    return f'{CACHE_PREFIX}:{whiteboard_id}'
+
+
+def get_acls(whiteboard_ids):
+    """
+    Access lists of the given boards, keyed by id:
+    {'owner_id': ..., 'is_public': ..., 'permissions': {user_id: level}}
+
+    Boards are read from the shared cache and the rest loaded in two
+    queries, then cached for BOARD_ACL_CACHE_TTL seconds (0 disables the
+    cache). Missing boards are left out.
+    """
+    ids = {int(whiteboard_id) for whiteboard_id in whiteboard_ids}
+    ttl = settings.BOARD_ACL_CACHE_TTL
+    acls = {}
+    if ttl and ids:
+        cached = cache.get_many([_cache_key(whiteboard_id) for whiteboard_id in ids])
+        acls = {int(key.rsplit(':', 1)[1]): acl for key, acl in cached.items()}
+    
+    missing = ids - acls.keys()
+    if missing:
+        loaded = {
+            whiteboard_id: {'owner_id': owner_id, 'is_public': is_public, 'permissions': {}}
+            for whiteboard_id, owner_id, is_public in Whiteboard.objects.filter(
+                id__in=missing
+            ).values_list('id', 'owner_id', 'is_public')
+        }
+        if loaded:
+            for whiteboard_id, user_id, level in WhiteboardPermission.objects.filter(
+                whiteboard_id__in=loaded
+            ).values_list('whiteboard_id', 'user_id', 'permission_level'):
+                loaded[whiteboard_id]['permissions'][user_id] = level
+            if ttl:
+                cache.set_many({_cache_key(whiteboard_id): acl for whiteboard_id, acl in loaded.items()}, ttl)
+        acls.update(loaded)
+    
+    return acls
+
+
+def has_access(acl, user_id, required_level='view'):
+    """
+    Whether a user has required_level ('view', 'edit' or 'admin') on a
+    board, given its access list from get_acls
+    """
+    if acl['owner_id'] == user_id:
+        return True
+    
+    if acl['is_public'] and required_level == 'view':
+        return True
+    
+    level = acl['permissions'].get(user_id)
+    if level is None:
+        return False
+    if required_level == 'edit':
+        return level in ['edit', 'admin']
+    if required_level == 'admin':
+        return level == 'admin'
+    return True
+
+
+def invalidate_access(whiteboard_id):
+    """
+    Drop a board's cached access list, now and again once the current
+    transaction commits, so a concurrent read cannot re-cache the old one
+    """
+    key = _cache_key(whiteboard_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
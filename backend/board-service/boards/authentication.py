@@ -1,8 +1,23 @@
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from django.conf import settings
+from token_cache import TokenCache
+import hmac
 import requests
 
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+
+class CachedToken(dict):
+    """Claims of an access token that was fully validated earlier"""
+
+    @property
+    def payload(self):
+        return self
+
+
 class SharedJWTAuthentication(JWTAuthentication):
     """
     Custom JWT authentication that validates tokens from auth-service
@@ -29,6 +44,19 @@ class SharedJWTAuthentication(JWTAuthentication):
         except Exception as e:
             raise InvalidToken(f'Token is invalid: {str(e)}')
     
+    def get_validated_token(self, raw_token):
+        """
+        Skip signature and claim checks for tokens validated before;
+        cached entries never outlive the token's exp
+        """
+        claims = token_cache.get(raw_token)
+        if claims is not None:
+            return CachedToken(claims)
+
+        validated_token = super().get_validated_token(raw_token)
+        token_cache.put(raw_token, validated_token.payload)
+        return validated_token
+
     def authenticate(self, request):
         """
         Authenticate the request and return user_id
@@ -38,4 +66,35 @@ class SharedJWTAuthentication(JWTAuthentication):
             return None
         
         user, token = result
-        return user, token
\ No newline at end of file
+        return user, token
+
+
+class ServiceUser:
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class ServiceUserAuthentication(BaseAuthentication):
+    """
+    Lets another service act for a user: a request presenting
+    INTERNAL_SERVICE_TOKEN in X-Service-Token is authenticated as the user
+    id in X-Acting-User, so that user's own permissions still apply.
+    realtime-service uses it to persist socket edits long after the user's
+    access token has expired.
+    """
+
+    def authenticate(self, request):
+        token = request.headers.get('X-Service-Token')
+        if not token:
+            return None
+
+        expected = settings.INTERNAL_SERVICE_TOKEN
+        if not expected or not hmac.compare_digest(token, expected):
+            raise AuthenticationFailed('Invalid service token')
+        try:
+            user_id = int(request.headers.get('X-Acting-User', ''))
+        except ValueError:
+            raise AuthenticationFailed('X-Acting-User must be a user id')
+        return ServiceUser(user_id), None
@@ -0,0 +1,27 @@
+# board/realtime.py
+from django.conf import settings
+from django.db import transaction
+import logging
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_acl(whiteboard_id):
+    """
+    Tell realtime-service to drop its cached access list for a board once
+    the current transaction commits
+    """
+    def send():
+        try:
+            requests.post(
+                f"{settings.REALTIME_SERVICE_URL}/internal/acl/invalidate",
+                json={'whiteboard_id': whiteboard_id},
+                headers={'X-Service-Token': settings.INTERNAL_SERVICE_TOKEN},
+                timeout=2,
+            )
+        except requests.RequestException as e:
+            # The realtime cache entry still expires after ACL_CACHE_TTL.
+            logger.warning("ACL invalidation for whiteboard %s failed: %s", whiteboard_id, e)
+
+    transaction.on_commit(send)
@@ -1,3 +1,27 @@
+from unittest import mock
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+
+class User:
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class WhiteboardCreateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User(1))
+
+    @mock.patch('boards.realtime.requests.post')
+    def test_create_drops_the_cached_acl_on_commit(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/boards/whiteboards/', {'name': 'new'}, format='json')
+            post.assert_not_called()
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 201)
+        post.assert_called_once()
+        self.assertEqual(post.call_args.kwargs['json'], {'whiteboard_id': response.data['id']})
@@ -1,12 +1,13 @@
 # board/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WhiteboardViewSet
+from .views import WhiteboardViewSet, InternalAclView
 
 router = DefaultRouter()
 router.register(r'whiteboards', WhiteboardViewSet, basename='whiteboard')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('internal/acl/', InternalAclView.as_view(), name='internal-acl'),
     path('health/', lambda request: Response({'status': 'healthy'}), name='health'),
 ]
\ No newline at end of file
@@ -1,10 +1,15 @@
 # board/views.py
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
-from .models import Whiteboard
-from .serializers import WhiteboardSerializer
+from rest_framework.views import APIView
+from django.conf import settings
+from .models import Whiteboard, WhiteboardPermission
+from .serializers import WhiteboardSerializer, WhiteboardPermissionSerializer
+from .realtime import invalidate_acl
+from .access import get_acls, invalidate_access
+import hmac
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -13,6 +18,14 @@ class IsOwner(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_authenticated
 
+class HasServiceToken(permissions.BasePermission):
+    """Allows calls from other services that present INTERNAL_SERVICE_TOKEN"""
+
+    def has_permission(self, request, view):
+        token = request.headers.get('X-Service-Token', '')
+        expected = settings.INTERNAL_SERVICE_TOKEN
+        return bool(expected) and hmac.compare_digest(token, expected)
+
 class WhiteboardViewSet(viewsets.ModelViewSet):
     serializer_class = WhiteboardSerializer
     permission_classes = [IsAuthenticated]
@@ -26,7 +39,19 @@ class WhiteboardViewSet(viewsets.ModelViewSet):
         return (owned | shared).distinct()
     
     def perform_create(self, serializer):
-        serializer.save(owner_id=self.request.user.id)
+        whiteboard = serializer.save(owner_id=self.request.user.id)
+        # A join that raced the create may have cached the board as missing.
+        invalidate_acl(whiteboard.id)
+
+    def perform_update(self, serializer):
+        whiteboard = serializer.save()
+        invalidate_access(whiteboard.id)
+        invalidate_acl(whiteboard.id)
+
+    def perform_destroy(self, instance):
+        invalidate_access(instance.id)
+        invalidate_acl(instance.id)
+        instance.delete()
     
     @action(detail=True, methods=['post'])
     def share(self, request, pk=None):
@@ -51,8 +76,33 @@ class WhiteboardViewSet(viewsets.ModelViewSet):
         if not created:
             permission.permission_level = permission_level
             permission.save()
+
+        invalidate_access(whiteboard.id)
+        invalidate_acl(whiteboard.id)
         
         return Response(
             WhiteboardPermissionSerializer(permission).data,
             status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+
+class InternalAclView(APIView):
+    """
+    Access lists of several boards in one call, for realtime-service
+
+    GET /api/boards/internal/acl/?ids=1,2,3
+    """
+    authentication_classes = []
+    permission_classes = [HasServiceToken]
+
+    def get(self, request):
+        try:
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i]
+        except ValueError:
+            return Response({'error': 'ids must be a comma-separated list of integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response([
+            {'id': whiteboard_id, **acl}
+            for whiteboard_id, acl in get_acls(ids).items()
+        ])
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canvas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='canvasobject',
+            name='versions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
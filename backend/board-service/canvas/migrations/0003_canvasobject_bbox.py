@@ -0,0 +1,124 @@
+import logging
+
+from django.db import DatabaseError, migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = 'canvas_object_board_bbox'
+BATCH_SIZE = 2000
+BOX = 'box(point(bbox_min_x, bbox_min_y), point(bbox_max_x, bbox_max_y))'
+BOARD_BBOX_INDEX_SQL = f'CREATE INDEX {INDEX_NAME} ON canvas_canvasobject USING gist (whiteboard_id, {BOX})'
+BBOX_INDEX_SQL = f'CREATE INDEX {INDEX_NAME} ON canvas_canvasobject USING gist ({BOX})'
+
+# A copy of CanvasObject.compute_bounds() as of this migration. Historical
+# models have no methods, and the live model may change after it.
+POINT_TYPES = {'line', 'arrow', 'freehand'}
+
+
+def _numbers(values):
+    return [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+def compute_bounds(obj):
+    x, y = obj.x, obj.y
+    points = obj.data.get('points') if isinstance(obj.data, dict) else None
+
+    if obj.object_type in POINT_TYPES and isinstance(points, list):
+        coords = _numbers(points)
+        end = len(coords) // 2 * 2
+        xs, ys = coords[0:end:2], coords[1:end:2]
+        if xs:
+            bounds = [x + min(xs), y + min(ys), x + max(xs), y + max(ys)]
+        else:
+            bounds = [x, y, x, y]
+    else:
+        width, height = obj.width or 0, obj.height or 0
+        if obj.object_type == 'circle':
+            x, y = x - width / 2, y - height / 2
+        bounds = [min(x, x + width), min(y, y + height), max(x, x + width), max(y, y + height)]
+
+    pad = (obj.stroke_width or 0) / 2
+    return bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad
+
+
+def backfill_bounds(apps, schema_editor):
+    CanvasObject = apps.get_model('canvas', 'CanvasObject')
+    fields = ['object_type', 'x', 'y', 'width', 'height', 'stroke_width', 'data']
+    batch = []
+    for obj in CanvasObject.objects.only('id', *fields).iterator(chunk_size=BATCH_SIZE):
+        obj.bbox_min_x, obj.bbox_min_y, obj.bbox_max_x, obj.bbox_max_y = compute_bounds(obj)
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            CanvasObject.objects.bulk_update(batch, ['bbox_min_x', 'bbox_min_y', 'bbox_max_x', 'bbox_max_y'])
+            batch = []
+    if batch:
+        CanvasObject.objects.bulk_update(batch, ['bbox_min_x', 'bbox_min_y', 'bbox_max_x', 'bbox_max_y'])
+
+
+def _has_btree_gist(schema_editor):
+    """
+    Whether btree_gist is installed, installing it if the migrating role may:
+    a superuser, or on Postgres 13+ any role with CREATE on the database.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'btree_gist'")
+        if cursor.fetchone():
+            return True
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    except DatabaseError as e:
+        logger.warning('Could not create the btree_gist extension (%s); %s indexes the boxes alone.', e, INDEX_NAME)
+        return False
+    return True
+
+
+def create_bbox_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # One GiST index over the board and the box, so a viewport query
+        # only visits the matching part of one board. The integer column
+        # needs btree_gist; without it the box is indexed on its own until
+        # a superuser runs CREATE EXTENSION btree_gist and the index is
+        # recreated with BOARD_BBOX_INDEX_SQL.
+        sql = BOARD_BBOX_INDEX_SQL if _has_btree_gist(schema_editor) else BBOX_INDEX_SQL
+        schema_editor.execute(sql)
+    else:
+        schema_editor.execute(
+            f'CREATE INDEX {INDEX_NAME} ON canvas_canvasobject (whiteboard_id, bbox_min_x, bbox_max_x)'
+        )
+
+
+def drop_bbox_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('canvas', '0002_canvasobject_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='canvasobject',
+            name='bbox_min_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='canvasobject',
+            name='bbox_min_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='canvasobject',
+            name='bbox_max_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='canvasobject',
+            name='bbox_max_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_bounds, migrations.RunPython.noop),
+        migrations.RunPython(create_bbox_index, drop_bbox_index),
+    ]
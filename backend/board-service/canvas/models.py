@@ -1,7 +1,41 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 from boards.models import Whiteboard
 
+# Types drawn from data.points, offsets from (x, y) as [dx0, dy0, dx1, dy1, ...].
+POINT_TYPES = {'line', 'arrow', 'freehand'}
+# Fields the bounding box is computed from.
+GEOMETRY_FIELDS = {'object_type', 'x', 'y', 'width', 'height', 'stroke_width', 'data'}
+BOUNDS_FIELDS = ['bbox_min_x', 'bbox_min_y', 'bbox_max_x', 'bbox_max_y']
+
+
+def _numbers(values):
+    return [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+
+
+class CanvasObjectQuerySet(models.QuerySet):
+    def in_bbox(self, min_x, min_y, max_x, max_y):
+        """
+        Objects whose bounding box overlaps the rectangle. On Postgres this
+        is a box overlap (&&) that the canvas_object_board_bbox GiST index
+        answers; elsewhere plain comparisons on the bbox columns.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            table = self.model._meta.db_table
+            return self.filter(RawSQL(
+                f'box(point("{table}"."bbox_min_x", "{table}"."bbox_min_y"), '
+                f'point("{table}"."bbox_max_x", "{table}"."bbox_max_y")) '
+                '&& box(point(%s, %s), point(%s, %s))',
+                (min_x, min_y, max_x, max_y),
+                output_field=BooleanField(),
+            ))
+        return self.filter(
+            bbox_max_x__gte=min_x, bbox_min_x__lte=max_x,
+            bbox_max_y__gte=min_y, bbox_min_y__lte=max_y,
+        )
+
 class CanvasObject(models.Model):
     OBJECT_TYPES = [
         ('rectangle', 'Rectangle'),
@@ -28,6 +62,8 @@ class CanvasObject(models.Model):
     z_index = models.IntegerField(default=0)
     
     data = models.JSONField(default=dict)
+    # Per-field [counter, actor] stamps of the last edit to win; see shared/lww.py.
+    versions = models.JSONField(default=dict, blank=True)
     
     created_by = models.IntegerField()
     created_at = models.DateTimeField(default=timezone.now)
@@ -36,8 +72,52 @@ class CanvasObject(models.Model):
     locked_by = models.IntegerField(null=True, blank=True)
     locked_at = models.DateTimeField(null=True, blank=True)
     
+    # Bounding box in board coordinates, stroke included; kept up to date by
+    # save() and by the bulk endpoints through update_bounds().
+    bbox_min_x = models.FloatField(null=True, blank=True)
+    bbox_min_y = models.FloatField(null=True, blank=True)
+    bbox_max_x = models.FloatField(null=True, blank=True)
+    bbox_max_y = models.FloatField(null=True, blank=True)
+    
+    objects = CanvasObjectQuerySet.as_manager()
+    
     class Meta:
         ordering = ['z_index', 'created_at']
     
+    def compute_bounds(self):
+        """(min_x, min_y, max_x, max_y) of the object as drawn by the frontend"""
+        x, y = self.x, self.y
+        points = self.data.get('points') if isinstance(self.data, dict) else None
+        
+        if self.object_type in POINT_TYPES and isinstance(points, list):
+            coords = _numbers(points)
+            end = len(coords) // 2 * 2
+            xs, ys = coords[0:end:2], coords[1:end:2]
+            if xs:
+                bounds = [x + min(xs), y + min(ys), x + max(xs), y + max(ys)]
+            else:
+                bounds = [x, y, x, y]
+        else:
+            width, height = self.width or 0, self.height or 0
+            if self.object_type == 'circle':
+                # Circles are positioned by their center.
+                x, y = x - width / 2, y - height / 2
+            bounds = [min(x, x + width), min(y, y + height), max(x, x + width), max(y, y + height)]
+        
+        pad = (self.stroke_width or 0) / 2
+        return bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad
+    
+    def update_bounds(self):
+        self.bbox_min_x, self.bbox_min_y, self.bbox_max_x, self.bbox_max_y = self.compute_bounds()
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_bounds()
+        elif GEOMETRY_FIELDS.intersection(update_fields):
+            self.update_bounds()
+            kwargs['update_fields'] = [*update_fields, *BOUNDS_FIELDS]
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.object_type} on {self.whiteboard.name}"
\ No newline at end of file
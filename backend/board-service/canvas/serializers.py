@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import CanvasObject
 from boards.models import Whiteboard
+import lww
 
 class CanvasObjectSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,11 +10,11 @@ class CanvasObjectSerializer(serializers.ModelSerializer):
             'id', 'whiteboard', 'object_type', 
             'x', 'y', 'width', 'height',
             'color', 'stroke_width', 'z_index',
-            'data',
+            'data', 'versions',
             'created_by', 'created_at', 'updated_at',
             'locked_by', 'locked_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by', 'versions']
     
     def validate_whiteboard(self, value):
         """Ensure whiteboard exists"""
@@ -46,18 +47,73 @@ class CanvasObjectCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class CanvasObjectUpdateSerializer(serializers.ModelSerializer):
-    """Serializer for updating canvas objects (position, style, etc.)"""
+class CanvasObjectBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One object of a bulk_create batch. The whiteboard is given once for the
+    whole batch and checked by the view, so items validate without queries.
+    """
     
     class Meta:
         model = CanvasObject
         fields = [
+            'object_type',
             'x', 'y', 'width', 'height',
             'color', 'stroke_width', 'z_index',
             'data'
         ]
 
 
+class CanvasObjectUpdateSerializer(serializers.ModelSerializer):
+    """
+    Serializer for updating canvas objects (position, style, etc.)
+
+    Fields are merged last-writer-wins by the edit's stamp `v`, either
+    [counter, actor] or {field: [counter, actor]}; a field whose stored
+    version is newer keeps its value. Edits without a stamp get a new one
+    from the server and win over everything stored so far.
+    """
+    
+    v = serializers.JSONField(required=False, write_only=True)
+    
+    class Meta:
+        model = CanvasObject
+        fields = [
+            'x', 'y', 'width', 'height',
+            'color', 'stroke_width', 'z_index',
+            'data', 'v', 'versions'
+        ]
+        read_only_fields = ['versions']
+    
+    def validate_v(self, value):
+        stamps = lww.parse_stamps(value)
+        if stamps is None:
+            raise serializers.ValidationError("v must be [counter, actor] or a map of field to [counter, actor]")
+        return stamps
+    
+    def merge(self, instance, validated_data):
+        """
+        Merge the edit into `instance` and its versions without saving;
+        returns the fields that won.
+        """
+        validated_data = dict(validated_data)
+        stamps = validated_data.pop('v', None)
+        fallback = lww.next_stamp(instance.versions)
+        if isinstance(stamps, dict):
+            stamps = {name: stamps.get(name, fallback) for name in validated_data}
+        
+        state = {name: getattr(instance, name) for name in validated_data}
+        won = lww.merge(state, instance.versions, validated_data, stamps or fallback)
+        for name, value in won.items():
+            setattr(instance, name, value)
+        return won
+    
+    def update(self, instance, validated_data):
+        won = self.merge(instance, validated_data)
+        if won:
+            instance.save(update_fields=[*won, 'versions', 'updated_at'])
+        return instance
+
+
 class BulkCanvasObjectSerializer(serializers.Serializer):
     """Serializer for bulk operations"""
     objects = serializers.ListField(
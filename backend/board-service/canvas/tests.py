@@ -1,3 +1,266 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from boards.models import Whiteboard, WhiteboardPermission
+from .models import CanvasObject
 
-# Create your tests here.
+
+class User:
+    is_authenticated = True
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class CanvasAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User(1))
+        self.own = Whiteboard.objects.create(name='own', owner_id=1)
+        self.shared = Whiteboard.objects.create(name='shared', owner_id=2)
+        WhiteboardPermission.objects.create(whiteboard=self.shared, user_id=1, permission_level='edit')
+        self.other = Whiteboard.objects.create(name='other', owner_id=2, is_public=True)
+
+    def make_objects(self, whiteboard, count):
+        return CanvasObject.objects.bulk_create([
+            CanvasObject(whiteboard=whiteboard, object_type='rectangle', x=0, y=0, created_by=1)
+            for _ in range(count)
+        ])
+
+
+class BulkCreateTests(CanvasAPITestCase):
+    def bulk_create(self, whiteboard, objects):
+        return self.client.post(
+            '/api/canvas/objects/bulk_create/', {'whiteboard': whiteboard, 'objects': objects}, format='json'
+        )
+
+    def rectangles(self, count):
+        return [{'object_type': 'rectangle', 'x': n, 'y': 0, 'width': 10, 'height': 5} for n in range(count)]
+
+    def test_creates_every_object_in_order(self):
+        response = self.bulk_create(self.shared.id, [
+            *self.rectangles(2),
+            {'object_type': 'freehand', 'x': 10, 'y': 10, 'data': {'points': [0, 0, 5, -5]}},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['x'] for item in response.data], [0, 1, 10])
+        objects = list(CanvasObject.objects.order_by('id'))
+        self.assertEqual([obj.id for obj in objects], [item['id'] for item in response.data])
+        self.assertTrue(all(obj.whiteboard_id == self.shared.id and obj.created_by == 1 for obj in objects))
+        # Points are relative to (x, y); the box is padded by half the stroke width.
+        self.assertEqual(
+            (objects[2].bbox_min_x, objects[2].bbox_min_y, objects[2].bbox_max_x, objects[2].bbox_max_y),
+            (9, 4, 16, 11),
+        )
+
+    def test_one_invalid_object_creates_nothing(self):
+        objects = self.rectangles(3)
+        objects[1]['x'] = 'left'
+        objects.append({'object_type': 'hexagon'})
+
+        response = self.bulk_create(self.own.id, objects)
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual(len(errors), len(objects))
+        self.assertEqual(errors[0], {})
+        self.assertIn('x', errors[1])
+        self.assertEqual(errors[2], {})
+        self.assertIn('object_type', errors[3])
+        self.assertFalse(CanvasObject.objects.exists())
+
+    def test_needs_edit_access_to_an_existing_whiteboard(self):
+        self.assertEqual(self.bulk_create(self.other.id, self.rectangles(1)).status_code, 403)
+        self.assertEqual(self.bulk_create(999999, self.rectangles(1)).status_code, 404)
+        self.assertEqual(self.bulk_create('abc', self.rectangles(1)).status_code, 404)
+        self.assertEqual(self.bulk_create(None, self.rectangles(1)).status_code, 400)
+        self.assertFalse(CanvasObject.objects.exists())
+
+    def queries_for(self, count):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk_create(self.own.id, self.rectangles(count))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        small = self.queries_for(2)
+        # Within SQLite's 999-parameter limit, which splits larger batches.
+        large = self.queries_for(30)
+        self.assertEqual(small, large)
+        # Permission lookups, one INSERT, plus the savepoint pair.
+        self.assertLessEqual(large, 5)
+
+
+class BulkUpdateTests(CanvasAPITestCase):
+    def bulk_update(self, updates):
+        return self.client.post('/api/canvas/objects/bulk_update/', {'updates': updates}, format='json')
+
+    def queries_for(self, count):
+        objects = self.make_objects(self.own, count // 2) + self.make_objects(self.shared, count - count // 2)
+        updates = [{'id': obj.id, 'x': 10, 'y': 20, 'v': [5, 1]} for obj in objects]
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk_update(updates)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['updated']), count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        small = self.queries_for(4)
+        # Within one UPDATE on SQLite too, whose 999-parameter limit splits
+        # bulk_update batches of about 100 objects.
+        large = self.queries_for(50)
+        self.assertEqual(small, large)
+        # Fetch, two permission queries, one UPDATE, plus the savepoint pair.
+        self.assertLessEqual(large, 6)
+
+    def test_updates_are_merged_and_written(self):
+        obj, = self.make_objects(self.own, 1)
+        response = self.bulk_update([{'id': obj.id, 'x': 5, 'v': [3, 1]}, {'id': obj.id, 'x': 7, 'v': [2, 1]}])
+        self.assertEqual(response.status_code, 200)
+        obj.refresh_from_db()
+        self.assertEqual(obj.x, 5)
+        self.assertEqual(obj.versions, {'x': [3, 1]})
+
+    def test_reports_forbidden_missing_invalid_and_locked(self):
+        mine, = self.make_objects(self.own, 1)
+        theirs, = self.make_objects(self.other, 1)
+        marked, = self.make_objects(self.own, 1)
+        CanvasObject.objects.filter(id=marked.id).update(locked_by=2)
+
+        response = self.bulk_update([
+            {'id': mine.id, 'x': 'left'},
+            {'id': theirs.id, 'x': 1},
+            {'id': 999999, 'x': 1},
+            {'id': marked.id, 'x': 3},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['invalid']], [mine.id])
+        self.assertEqual(response.data['forbidden'], [theirs.id])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(response.data['locked'], [marked.id])
+        self.assertEqual([item['id'] for item in response.data['updated']], [marked.id])
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.x, 0)
+
+
+    def test_ids_are_read_as_integers(self):
+        obj, = self.make_objects(self.own, 1)
+
+        response = self.bulk_update([
+            {'id': str(obj.id), 'x': 4},
+            {'id': [obj.id], 'x': 1},
+            {'id': True, 'x': 1},
+            {'id': 1.5, 'x': 1},
+            {'x': 1},
+            'junk',
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['updated']], [obj.id])
+        self.assertEqual([item['id'] for item in response.data['invalid']], [[obj.id], True, 1.5, None, None])
+        self.assertEqual(response.data['not_found'], [])
+        obj.refresh_from_db()
+        self.assertEqual(obj.x, 4)
+
+    def test_updates_must_be_a_list(self):
+        response = self.client.post('/api/canvas/objects/bulk_update/', {'updates': {'id': 1}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkDeleteTests(CanvasAPITestCase):
+    def test_deletes_allowed_and_reports_the_rest(self):
+        mine = self.make_objects(self.own, 3) + self.make_objects(self.shared, 2)
+        theirs, = self.make_objects(self.other, 1)
+        ids = [obj.id for obj in mine]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/canvas/objects/bulk_delete/', {'ids': [*ids, theirs.id, 999999]}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['deleted']), ids)
+        self.assertEqual(response.data['forbidden'], [theirs.id])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.assertEqual(list(CanvasObject.objects.values_list('id', flat=True)), [theirs.id])
+        self.assertLessEqual(len(queries), 6)
+
+
+@override_settings(INTERNAL_SERVICE_TOKEN='service-secret')
+class ServiceAuthenticationTests(CanvasAPITestCase):
+    def bulk_update_as(self, user_id, token='service-secret'):
+        obj, = self.make_objects(self.own, 1)
+        client = APIClient()
+        client.credentials(HTTP_X_SERVICE_TOKEN=token, HTTP_X_ACTING_USER=str(user_id))
+        return client.post('/api/canvas/objects/bulk_update/', {'updates': [{'id': obj.id, 'x': 9}]}, format='json')
+
+    def test_acts_with_the_users_own_permissions(self):
+        response = self.bulk_update_as(1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['updated']), 1)
+
+        response = self.bulk_update_as(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['forbidden']), 1)
+
+    def test_rejects_a_wrong_token(self):
+        self.assertEqual(self.bulk_update_as(1, token='guess').status_code, 401)
+
+
+class PermissionCacheTests(CanvasAPITestCase):
+    def test_share_invalidates_cached_access(self):
+        obj, = self.make_objects(self.other, 1)
+        url = f'/api/canvas/objects/{obj.id}/'
+        self.assertEqual(self.client.patch(url, {'x': 1}, format='json').status_code, 403)
+
+        owner = APIClient()
+        owner.force_authenticate(User(2))
+        response = owner.post(f'/api/boards/whiteboards/{self.other.id}/share/',
+                              {'user_id': 1, 'permission_level': 'edit'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.patch(url, {'x': 2}, format='json').status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.patch(url, {'x': 3}, format='json').status_code, 200)
+        # The second PATCH finds the board's access list in the cache.
+        self.assertEqual(len(first) - len(second), 2)
+
+
+class BoundingBoxTests(CanvasAPITestCase):
+    def test_bounds_follow_points_and_shapes(self):
+        stroke = CanvasObject.objects.create(
+            whiteboard=self.own, object_type='freehand', x=100, y=100, stroke_width=2,
+            data={'points': [0, 0, 50, -20, 80, 30]}, created_by=1,
+        )
+        circle = CanvasObject.objects.create(
+            whiteboard=self.own, object_type='circle', x=0, y=0, width=40, height=20, stroke_width=0, created_by=1,
+        )
+        self.assertEqual(stroke.compute_bounds(), (99, 79, 181, 131))
+        self.assertEqual(circle.compute_bounds(), (-20, -10, 20, 10))
+
+        stroke.x = 1000
+        stroke.save(update_fields=['x'])
+        stroke.refresh_from_db()
+        self.assertEqual(stroke.bbox_min_x, 999)
+
+    def test_list_filters_by_bbox(self):
+        near = CanvasObject.objects.create(
+            whiteboard=self.own, object_type='rectangle', x=10, y=10, width=20, height=20, created_by=1,
+        )
+        CanvasObject.objects.create(
+            whiteboard=self.own, object_type='rectangle', x=5000, y=5000, width=20, height=20, created_by=1,
+        )
+        response = self.client.get('/api/canvas/objects/', {'whiteboard': self.own.id, 'bbox': '0,0,1920,1080'})
+        self.assertEqual([item['id'] for item in response.data], [near.id])
+
+        response = self.client.get('/api/canvas/objects/', {'whiteboard': self.own.id, 'bbox': '0,0,north'})
+        self.assertEqual(response.status_code, 400)
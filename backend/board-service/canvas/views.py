@@ -1,17 +1,26 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, serializers, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+from django.http import Http404
 from django.db import transaction
-from .models import CanvasObject
+from django.utils import timezone
+from .models import CanvasObject, BOUNDS_FIELDS, GEOMETRY_FIELDS
 from .serializers import (
     CanvasObjectSerializer, 
     CanvasObjectCreateSerializer,
     CanvasObjectUpdateSerializer,
+    CanvasObjectBulkItemSerializer,
     BulkCanvasObjectSerializer
 )
-from boards.models import Whiteboard, WhiteboardPermission
+from boards.access import get_acls, has_access
+from boards.authentication import ServiceUserAuthentication
+
+# Rows per INSERT statement in bulk_create.
+BULK_CREATE_BATCH_SIZE = 1000
 
 
 class CanvasObjectViewSet(viewsets.ModelViewSet):
@@ -20,6 +29,8 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
     
     Endpoints:
     - GET /api/canvas/objects/?whiteboard=<id> - List objects for whiteboard
+    - GET /api/canvas/objects/?whiteboard=<id>&bbox=minx,miny,maxx,maxy - Only
+      objects whose bounding box overlaps the given viewport
     - POST /api/canvas/objects/ - Create object
     - GET /api/canvas/objects/<id>/ - Get single object
     - PUT /api/canvas/objects/<id>/ - Update object
@@ -28,10 +39,18 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
     - POST /api/canvas/objects/bulk_create/ - Create multiple objects
     - POST /api/canvas/objects/bulk_update/ - Update multiple objects
     - POST /api/canvas/objects/bulk_delete/ - Delete multiple objects
-    - POST /api/canvas/objects/<id>/lock/ - Lock object for editing
-    - POST /api/canvas/objects/<id>/unlock/ - Unlock object
+    - POST /api/canvas/objects/<id>/lock/ - Mark object as being edited
+    - POST /api/canvas/objects/<id>/unlock/ - Clear that mark
+    
+    Updates carry a version stamp `v` and are merged field by field,
+    last writer wins (see shared/lww.py), so concurrent edits never block
+    each other. Locks are only an "is editing" hint for other clients.
+    
+    Besides users' own tokens, realtime-service may call these endpoints on
+    a user's behalf with the internal service token (ServiceUserAuthentication).
     """
     
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, ServiceUserAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
@@ -52,39 +71,58 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         if object_type:
             queryset = queryset.filter(object_type=object_type)
         
+        bbox = self.request.query_params.get('bbox')
+        if bbox:
+            try:
+                min_x, min_y, max_x, max_y = (float(value) for value in bbox.split(','))
+            except ValueError:
+                raise ValidationError({'bbox': 'bbox must be minx,miny,maxx,maxy'})
+            queryset = queryset.in_bbox(min_x, min_y, max_x, max_y)
+        
+        if self.action in ['update', 'partial_update']:
+            # Versions are compared and written under the row lock.
+            queryset = queryset.select_for_update(of=('self',))
+        
         return queryset.select_related('whiteboard')
     
+    def _acls(self, whiteboard_ids):
+        """
+        Access lists of the given whiteboards (see boards.access), memoized
+        for the rest of this request
+        """
+        ids = [int(whiteboard_id) for whiteboard_id in whiteboard_ids]
+        memo = self.__dict__.setdefault('_acl_memo', {})
+        missing = set(ids) - memo.keys()
+        if missing:
+            acls = get_acls(missing)
+            memo.update({whiteboard_id: acls.get(whiteboard_id) for whiteboard_id in missing})
+        return {whiteboard_id: memo[whiteboard_id] for whiteboard_id in ids if memo[whiteboard_id] is not None}
+    
     def _check_whiteboard_permission(self, whiteboard_id, required_level='view'):
         """
         Check if user has permission to access whiteboard
         required_level: 'view', 'edit', or 'admin'
         """
-        user_id = self.request.user.id
-        whiteboard = get_object_or_404(Whiteboard, id=whiteboard_id)
-        
-        if whiteboard.owner_id == user_id:
-            return True
-        
-        if whiteboard.is_public and required_level == 'view':
-            return True
-        
         try:
-            permission = WhiteboardPermission.objects.get(
-                whiteboard=whiteboard,
-                user_id=user_id
-            )
-            
-            if required_level == 'view':
-                return True
-            elif required_level == 'edit':
-                return permission.permission_level in ['edit', 'admin']
-            elif required_level == 'admin':
-                return permission.permission_level == 'admin'
-            
-        except WhiteboardPermission.DoesNotExist:
-            pass
-        
-        return False
+            acl = self._acls([whiteboard_id]).get(int(whiteboard_id))
+        except (TypeError, ValueError):
+            # Not an id at all
+            acl = None
+        if acl is None:
+            raise Http404('No Whiteboard matches the given query.')
+        
+        return has_access(acl, self.request.user.id, required_level)
+    
+    def _whiteboards_with_permission(self, whiteboard_ids, required_level='view'):
+        """
+        The subset of whiteboard_ids the user has required_level on.
+        Missing whiteboards are left out.
+        """
+        user_id = self.request.user.id
+        return {
+            whiteboard_id for whiteboard_id, acl in self._acls(whiteboard_ids).items()
+            if has_access(acl, user_id, required_level)
+        }
     
     def list(self, request, *args, **kwargs):
         """List canvas objects for a whiteboard"""
@@ -122,17 +160,12 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         
         return super().create(request, *args, **kwargs)
     
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
-        """Update a canvas object"""
+        """Update a canvas object, merging fields by version"""
         obj = self.get_object()
         
-        if obj.locked_by and obj.locked_by != request.user.id:
-            return Response(
-                {'error': 'Object is locked by another user'},
-                status=status.HTTP_423_LOCKED
-            )
-        
-        if not self._check_whiteboard_permission(obj.whiteboard.id, 'edit'):
+        if not self._check_whiteboard_permission(obj.whiteboard_id, 'edit'):
             return Response(
                 {'error': 'You do not have permission to edit this whiteboard'},
                 status=status.HTTP_403_FORBIDDEN
@@ -144,7 +177,7 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         """Delete a canvas object"""
         obj = self.get_object()
         
-        if not self._check_whiteboard_permission(obj.whiteboard.id, 'edit'):
+        if not self._check_whiteboard_permission(obj.whiteboard_id, 'edit'):
             return Response(
                 {'error': 'You do not have permission to edit this whiteboard'},
                 status=status.HTTP_403_FORBIDDEN
@@ -170,6 +203,11 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
                 ...
             ]
         }
+        
+        The batch is validated in one pass and inserted with multi-row
+        INSERTs of BULK_CREATE_BATCH_SIZE rows. If any object is invalid,
+        nothing is created and the response is 400 with
+        {"errors": [...]}, one entry per object ({} for valid ones).
         """
         whiteboard_id = request.data.get('whiteboard')
         objects_data = request.data.get('objects', [])
@@ -186,21 +224,20 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        created_objects = []
+        serializer = CanvasObjectBulkItemSerializer(data=objects_data, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         
+        created_objects = [
+            CanvasObject(whiteboard_id=int(whiteboard_id), created_by=request.user.id, **item)
+            for item in serializer.validated_data
+        ]
+        for obj in created_objects:
+            obj.update_bounds()
         with transaction.atomic():
-            for obj_data in objects_data:
-                obj_data['whiteboard'] = whiteboard_id
-                serializer = CanvasObjectCreateSerializer(
-                    data=obj_data,
-                    context={'request': request}
-                )
-                
-                if serializer.is_valid():
-                    obj = serializer.save()
-                    created_objects.append(obj)
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            created_objects = CanvasObject.objects.bulk_create(
+                created_objects, batch_size=BULK_CREATE_BATCH_SIZE
+            )
         
         return Response(
             CanvasObjectSerializer(created_objects, many=True).data,
@@ -215,46 +252,106 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         POST /api/canvas/objects/bulk_update/
         {
             "updates": [
-                {"id": 1, "x": 150, "y": 200},
+                {"id": 1, "x": 150, "y": 200, "v": [42, 9137]},
                 {"id": 2, "color": "#00FF00"},
                 ...
             ]
         }
+        
+        Each update is merged by its version stamp like a PATCH. All targets
+        are fetched and locked in one query, permission is resolved once
+        per whiteboard, and the changed columns of every object are written
+        back together, so the query count does not grow with the batch.
+        
+        Response:
+        {
+            "updated": [<object>, ...],
+            "forbidden": [ids on whiteboards the caller cannot edit],
+            "not_found": [ids],
+            "invalid": [{"id": 3, "errors": {...}}, ...],
+            "locked": [ids marked as being edited by someone else]
+        }
+        Locks are advisory, so locked objects are still merged and updated.
+        Ids are read as integers ("3" is 3); an update without a usable id
+        is reported under "invalid" as it was sent.
         """
-        updates = request.data.get('updates', [])
-        updated_objects = []
+        update_list = request.data.get('updates', [])
+        
+        if not isinstance(update_list, list):
+            return Response(
+                {'error': 'updates must be a list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        id_field = serializers.IntegerField(min_value=1)
+        updates, invalid = [], []
+        for update_data in update_list:
+            if not isinstance(update_data, dict):
+                invalid.append({'id': None, 'errors': {'non_field_errors': ['Expected an object.']}})
+                continue
+            try:
+                obj_id = id_field.run_validation(update_data.get('id', empty))
+            except ValidationError as e:
+                invalid.append({'id': update_data.get('id'), 'errors': {'id': e.detail}})
+                continue
+            updates.append((obj_id, update_data))
         
         with transaction.atomic():
-            for update_data in updates:
-                obj_id = update_data.pop('id', None)
-                
-                if not obj_id:
+            objects = CanvasObject.objects.select_for_update().order_by('id').in_bulk(
+                [obj_id for obj_id, _ in updates]
+            )
+            editable = self._whiteboards_with_permission(
+                {obj.whiteboard_id for obj in objects.values()}, 'edit'
+            )
+            
+            updated, forbidden, not_found, locked = {}, [], [], []
+            changed, changed_fields = {}, set()
+            for obj_id, update_data in updates:
+                obj = objects.get(obj_id)
+                if obj is None:
+                    not_found.append(obj_id)
+                    continue
+                if obj.whiteboard_id not in editable:
+                    forbidden.append(obj_id)
                     continue
                 
-                try:
-                    obj = CanvasObject.objects.get(id=obj_id)
-                    
-                    if not self._check_whiteboard_permission(obj.whiteboard.id, 'edit'):
-                        continue
-                    
-                    if obj.locked_by and obj.locked_by != request.user.id:
-                        continue
-                    
-                    serializer = CanvasObjectUpdateSerializer(
-                        obj,
-                        data=update_data,
-                        partial=True
-                    )
-                    
-                    if serializer.is_valid():
-                        serializer.save()
-                        updated_objects.append(obj)
-                
-                except CanvasObject.DoesNotExist:
+                fields = {name: value for name, value in update_data.items() if name != 'id'}
+                serializer = CanvasObjectUpdateSerializer(
+                    obj,
+                    data=fields,
+                    partial=True,
+                    context={'request': request}
+                )
+                if not serializer.is_valid():
+                    invalid.append({'id': obj_id, 'errors': serializer.errors})
                     continue
+                
+                if obj.locked_by and obj.locked_by != request.user.id and obj_id not in updated:
+                    locked.append(obj_id)
+                won = serializer.merge(obj, serializer.validated_data)
+                if won:
+                    changed[obj_id] = obj
+                    changed_fields.update(won)
+                    if GEOMETRY_FIELDS.intersection(won):
+                        obj.update_bounds()
+                        changed_fields.update(BOUNDS_FIELDS)
+                    obj.updated_at = timezone.now()
+                updated[obj_id] = obj
+            
+            if changed:
+                CanvasObject.objects.bulk_update(
+                    list(changed.values()),
+                    [*changed_fields, 'versions', 'updated_at']
+                )
         
         return Response(
-            CanvasObjectSerializer(updated_objects, many=True).data,
+            {
+                'updated': CanvasObjectSerializer(list(updated.values()), many=True).data,
+                'forbidden': forbidden,
+                'not_found': not_found,
+                'invalid': invalid,
+                'locked': locked,
+            },
             status=status.HTTP_200_OK
         )
     
@@ -267,33 +364,50 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         {
             "ids": [1, 2, 3, 4]
         }
+        
+        Permission is resolved once per whiteboard and the allowed objects
+        are removed with a single DELETE.
+        
+        Response:
+        {
+            "deleted": [ids],
+            "forbidden": [ids on whiteboards the caller cannot edit],
+            "not_found": [ids]
+        }
         """
         ids = request.data.get('ids', [])
-        deleted_count = 0
+        
+        if not isinstance(ids, list) or not all(
+            isinstance(obj_id, int) and not isinstance(obj_id, bool) for obj_id in ids
+        ):
+            return Response(
+                {'error': 'ids must be a list of integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         with transaction.atomic():
-            for obj_id in ids:
-                try:
-                    obj = CanvasObject.objects.get(id=obj_id)
-                    
-                    if not self._check_whiteboard_permission(obj.whiteboard.id, 'edit'):
-                        continue
-                    
-                    obj.delete()
-                    deleted_count += 1
-                
-                except CanvasObject.DoesNotExist:
-                    continue
+            targets = dict(
+                CanvasObject.objects.filter(id__in=ids).values_list('id', 'whiteboard_id')
+            )
+            editable = self._whiteboards_with_permission(set(targets.values()), 'edit')
+            deleted = [obj_id for obj_id, whiteboard_id in targets.items() if whiteboard_id in editable]
+            if deleted:
+                CanvasObject.objects.filter(id__in=deleted).delete()
         
         return Response(
-            {'deleted': deleted_count},
+            {
+                'deleted': deleted,
+                'forbidden': [obj_id for obj_id, whiteboard_id in targets.items() if whiteboard_id not in editable],
+                'not_found': [obj_id for obj_id in ids if obj_id not in targets],
+            },
             status=status.HTTP_200_OK
         )
     
     @action(detail=True, methods=['post'])
     def lock(self, request, pk=None):
         """
-        Lock an object for editing
+        Mark an object as being edited by the caller. Advisory only: edits
+        from others are still accepted and merged by version.
         
         POST /api/canvas/objects/<id>/lock/
         """
@@ -307,7 +421,7 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         
         obj.locked_by = request.user.id
         obj.locked_at = timezone.now()
-        obj.save()
+        obj.save(update_fields=['locked_by', 'locked_at'])
         
         return Response(
             CanvasObjectSerializer(obj).data,
@@ -331,7 +445,7 @@ class CanvasObjectViewSet(viewsets.ModelViewSet):
         
         obj.locked_by = None
         obj.locked_at = None
-        obj.save()
+        obj.save(update_fields=['locked_by', 'locked_at'])
         
         return Response(
             CanvasObjectSerializer(obj).data,
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from presence import CURSOR_EVENTS
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Frames a view-only user may still send: heartbeat replies and their cursor.
+VIEWER_EVENTS = {"pong"} | CURSOR_EVENTS
+
+
+def can_edit(level: Optional[str]) -> bool:
+    return level in ("owner", "admin", "edit")
+
+
+class BoardAcl:
+    __slots__ = ("owner_id", "is_public", "grants")
+
+    def __init__(self, owner_id: int, is_public: bool, grants: Dict[int, str]):
+        self.owner_id = owner_id
+        self.is_public = is_public
+        self.grants = grants
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BoardAcl":
+        return cls(
+            int(data["owner_id"]),
+            bool(data.get("is_public")),
+            {int(user_id): level for user_id, level in data.get("permissions", {}).items()},
+        )
+
+    def level_for(self, user_id: int) -> Optional[str]:
+        if user_id == self.owner_id:
+            return "owner"
+        level = self.grants.get(user_id)
+        if level is None and self.is_public:
+            return "view"
+        return level
+
+
+class AclCache:
+    """
+    Local cache of board access lists used to authorize socket joins.
+
+    A miss does not call board-service straight away: every board missed in
+    the same `batch_window` is fetched in one request, and concurrent joins
+    for a board share that fetch, so a reconnect storm costs a handful of
+    requests instead of one per socket. Boards that do not exist are cached
+    too, but only for `missing_ttl` seconds, in case board-service's
+    invalidation of a new board is lost. Other entries live for `ttl`
+    seconds, and board-service drops them early through invalidate() when
+    a board is created or a grant changes. A fetch that was already in
+    flight when its board was invalidated is not cached.
+    """
+
+    def __init__(self, fetch: Callable[[Iterable[int]], Awaitable[Dict[int, dict]]],
+                 ttl: float = 60.0, max_boards: int = 10_000, batch_window: float = 0.005,
+                 clock: Callable[[], float] = time.monotonic, missing_ttl: float = 5.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_boards = max_boards
+        self.batch_window = batch_window
+        self.clock = clock
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._fetching: Set[int] = set()
+        self._stale: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    async def level_for(self, whiteboard_id: int, user_id: int) -> Optional[str]:
+        """Permission level of the user on the board, or None if they may not join."""
+        acl = await self.get(whiteboard_id)
+        return acl.level_for(user_id) if acl else None
+
+    async def get(self, whiteboard_id: int) -> Optional[BoardAcl]:
+        entry = self._entries.get(whiteboard_id)
+        if entry is not None:
+            expires_at, acl = entry
+            if self.clock() < expires_at:
+                self._entries.move_to_end(whiteboard_id)
+                self.hits += 1
+                return acl
+            del self._entries[whiteboard_id]
+
+        self.misses += 1
+        future = self._waiting.get(whiteboard_id)
+        if future is None:
+            future = self._waiting[whiteboard_id] = asyncio.get_running_loop().create_future()
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_later())
+        return await asyncio.shield(future)
+
+    def invalidate(self, whiteboard_id: int):
+        self._entries.pop(whiteboard_id, None)
+        if whiteboard_id in self._fetching:
+            self._stale.add(whiteboard_id)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window)
+        waiting, self._waiting, self._flush_task = self._waiting, {}, None
+        self._fetching.update(waiting)
+
+        self.fetches += 1
+        try:
+            boards = await self.fetch(list(waiting))
+        except Exception as e:
+            self._fetching.difference_update(waiting)
+            self._stale.difference_update(waiting)
+            logger.warning("Loading access lists for %d boards failed: %s", len(waiting), e)
+            for future in waiting.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        now = self.clock()
+        for board, future in waiting.items():
+            data = boards.get(board)
+            acl = BoardAcl.from_dict(data) if data else None
+            expires_at = now + (self.ttl if acl else self.missing_ttl)
+            self._fetching.discard(board)
+            if board in self._stale:
+                self._stale.discard(board)
+            else:
+                self._entries[board] = (expires_at, acl)
+                self._entries.move_to_end(board)
+            if not future.done():
+                future.set_result(acl)
+
+        while len(self._entries) > self.max_boards:
+            self._entries.popitem(last=False)
@@ -0,0 +1,184 @@
+from typing import Callable, Awaitable, List, Optional, Set
+import asyncio
+import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "whiteboard"
+PRESENCE_TTL = 60
+
+
+def board_channel(whiteboard_id: int) -> str:
+    return f"{CHANNEL_PREFIX}:{whiteboard_id}"
+
+
+def presence_key(whiteboard_id: int, node_id: str) -> str:
+    return f"{CHANNEL_PREFIX}:{whiteboard_id}:presence:{node_id}"
+
+
+def nodes_key(whiteboard_id: int) -> str:
+    return f"{CHANNEL_PREFIX}:{whiteboard_id}:nodes"
+
+
+class RedisBackplane:
+    """
+    Redis pub/sub relay between realtime-service nodes.
+
+    Every board has its own channel. A node subscribes only to boards it has
+    local sockets for, publishes each broadcast once, and relays what other
+    nodes publish to its local sockets. Presence is kept per node in a Redis
+    hash (user_id -> socket count) that expires unless refreshed, so a crashed
+    node's users disappear after PRESENCE_TTL seconds.
+
+    A message that cannot be read or relayed is logged and skipped, and the
+    listener is restarted should it ever fail, so one bad message never
+    cuts the node off. Redis errors while publishing or updating presence
+    are logged rather than raised into the socket that caused them;
+    presence heals through the TTL refresh.
+
+    `redis` is any `redis.asyncio.Redis`-compatible client, which includes
+    `fakeredis.aioredis.FakeRedis` for local testing.
+    """
+
+    def __init__(self, redis, node_id: Optional[str] = None, presence_ttl: int = PRESENCE_TTL):
+        self.redis = redis
+        self.node_id = node_id or uuid.uuid4().hex[:12]
+        self.presence_ttl = presence_ttl
+        self.pubsub = None
+        self.boards: Set[int] = set()
+        self._listener: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._on_message: Optional[Callable[[int, str, Optional[int]], Awaitable[None]]] = None
+        self.publish_failures = 0
+        self.bad_messages = 0
+
+    async def start(self, on_message: Callable[[int, str, Optional[int]], Awaitable[None]]):
+        self._on_message = on_message
+        self.pubsub = self.redis.pubsub()
+        # Keep the pub/sub connection open even while no board is subscribed.
+        await self.pubsub.subscribe(f"{CHANNEL_PREFIX}:nodes")
+        self._start_listener()
+        self._refresher = asyncio.create_task(self._refresh_presence())
+
+    def _start_listener(self):
+        self._listener = asyncio.create_task(self._listen())
+        self._listener.add_done_callback(self._listener_done)
+
+    def _listener_done(self, task: asyncio.Task):
+        if task.cancelled() or task is not self._listener:
+            return
+        logger.error("Backplane listener failed; restarting", exc_info=task.exception())
+        self._start_listener()
+
+    async def stop(self):
+        listener, self._listener = self._listener, None
+        for task in (listener, self._refresher):
+            if task:
+                task.cancel()
+        for whiteboard_id in list(self.boards):
+            await self.redis.delete(presence_key(whiteboard_id, self.node_id))
+            await self.redis.srem(nodes_key(whiteboard_id), self.node_id)
+        if self.pubsub:
+            await self.pubsub.close()
+
+    async def join(self, whiteboard_id: int, user_id: int):
+        try:
+            if whiteboard_id not in self.boards:
+                await self.pubsub.subscribe(board_channel(whiteboard_id))
+                self.boards.add(whiteboard_id)
+                await self.redis.sadd(nodes_key(whiteboard_id), self.node_id)
+
+            key = presence_key(whiteboard_id, self.node_id)
+            await self.redis.hincrby(key, str(user_id), 1)
+            await self.redis.expire(key, self.presence_ttl)
+        except Exception as e:
+            logger.warning("Backplane join of board %s failed: %s", whiteboard_id, e)
+
+    async def leave(self, whiteboard_id: int, user_id: int, room_empty: bool):
+        key = presence_key(whiteboard_id, self.node_id)
+        try:
+            if await self.redis.hincrby(key, str(user_id), -1) <= 0:
+                await self.redis.hdel(key, str(user_id))
+
+            if room_empty and whiteboard_id in self.boards:
+                self.boards.discard(whiteboard_id)
+                await self.pubsub.unsubscribe(board_channel(whiteboard_id))
+                await self.redis.delete(key)
+                await self.redis.srem(nodes_key(whiteboard_id), self.node_id)
+        except Exception as e:
+            logger.warning("Backplane leave of board %s failed: %s", whiteboard_id, e)
+
+    async def publish(self, whiteboard_id: int, data: str, exclude_user: Optional[int] = None):
+        envelope = json.dumps({
+            "node": self.node_id,
+            "exclude_user": exclude_user,
+            "data": data,
+        })
+        try:
+            await self.redis.publish(board_channel(whiteboard_id), envelope)
+        except Exception as e:
+            # Local sockets already have it; only other nodes miss this one.
+            self.publish_failures += 1
+            logger.warning("Backplane publish to board %s failed: %s", whiteboard_id, e)
+
+    async def get_online_users(self, whiteboard_id: int) -> List[int]:
+        users: Set[int] = set()
+        stale = []
+        for node in await self.redis.smembers(nodes_key(whiteboard_id)):
+            node = node.decode() if isinstance(node, bytes) else node
+            counts = await self.redis.hgetall(presence_key(whiteboard_id, node))
+            if not counts and node != self.node_id:
+                stale.append(node)
+            users.update(int(uid) for uid in counts)
+        if stale:
+            await self.redis.srem(nodes_key(whiteboard_id), *stale)
+        return sorted(users)
+
+    async def _listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Backplane receive failed: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            try:
+                await self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.bad_messages += 1
+                logger.exception("Backplane message on %r could not be relayed", message.get("channel"))
+
+    async def _handle(self, message: dict):
+        channel = message["channel"]
+        channel = channel.decode() if isinstance(channel, bytes) else channel
+        whiteboard_id = int(channel.rsplit(":", 1)[1])
+        envelope = json.loads(message["data"])
+        if not isinstance(envelope, dict) or not isinstance(envelope.get("data"), str):
+            raise ValueError("envelope must be an object with a string \"data\"")
+
+        if envelope.get("node") == self.node_id:
+            return
+
+        exclude_user = envelope.get("exclude_user")
+        if not isinstance(exclude_user, int):
+            exclude_user = None
+        await self._on_message(whiteboard_id, envelope["data"], exclude_user)
+
+    async def _refresh_presence(self):
+        while True:
+            await asyncio.sleep(self.presence_ttl / 3)
+            for whiteboard_id in list(self.boards):
+                try:
+                    await self.redis.expire(presence_key(whiteboard_id, self.node_id), self.presence_ttl)
+                except Exception:
+                    pass
@@ -0,0 +1,103 @@
+"""
+Connect latency with the board ACL check, against a stub board-service.
+
+The stub answers /api/boards/internal/acl/ after --rtt-ms and counts
+requests. Three cases join --sockets sockets at once (a reconnect storm)
+across --boards boards:
+
+- per-connect: one ACL request per join, the naive approach
+- cache cold: AclCache with nothing cached, misses batched per window
+- cache warm: the same cache after the storm
+
+    python benchmarks/bench_acl.py [--sockets 500] [--boards 20] [--rtt-ms 5]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import FakeWebSocket, percentile, print_table
+from acl import AclCache, BoardAcl
+from board_client import BoardServiceClient
+from websocket_manager import ConnectionManager
+
+
+def stub_board_service(rtt):
+    calls = {"requests": 0}
+
+    async def handler(request):
+        calls["requests"] += 1
+        await asyncio.sleep(rtt)
+        ids = [int(i) for i in request.url.params["ids"].split(",")]
+        return httpx.Response(200, json=[
+            {"id": board, "owner_id": 1, "is_public": False,
+             "permissions": {str(user): "edit" for user in range(2, 60)}}
+            for board in ids
+        ])
+
+    return httpx.MockTransport(handler), calls
+
+
+async def storm(sockets, boards, authorize):
+    manager = ConnectionManager()
+    latencies = []
+
+    async def join(i):
+        whiteboard_id, user_id = i % boards + 1, i % 50 + 2
+        start = time.perf_counter()
+        assert await authorize(whiteboard_id, user_id)
+        await manager.connect(FakeWebSocket(), whiteboard_id, user_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(join(i) for i in range(sockets)))
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return latencies
+
+
+async def run_case(name, sockets, boards, rtt, cache_mode):
+    transport, calls = stub_board_service(rtt)
+    client = BoardServiceClient("http://board-service", transport=transport, max_connections=100)
+
+    if cache_mode is None:
+        async def authorize(whiteboard_id, user_id):
+            acls = await client.get_acls([whiteboard_id])
+            return BoardAcl.from_dict(acls[whiteboard_id]).level_for(user_id)
+        latencies = await storm(sockets, boards, authorize)
+    else:
+        cache = AclCache(client.get_acls)
+        if cache_mode == "warm":
+            await storm(sockets, boards, cache.level_for)
+            calls["requests"] = 0
+        latencies = await storm(sockets, boards, cache.level_for)
+
+    await client.close()
+    return [
+        name,
+        f"{percentile(latencies, 50):.2f}",
+        f"{percentile(latencies, 99):.2f}",
+        calls["requests"],
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sockets", type=int, default=500)
+    parser.add_argument("--boards", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rtt = args.rtt_ms / 1000
+    rows = [
+        await run_case("per-connect", args.sockets, args.boards, rtt, None),
+        await run_case("cache cold", args.sockets, args.boards, rtt, "cold"),
+        await run_case("cache warm", args.sockets, args.boards, rtt, "warm"),
+    ]
+    print(f"{args.sockets} concurrent joins over {args.boards} boards, board-service rtt {args.rtt_ms} ms")
+    print_table(["case", "p50 ms", "p99 ms", "ACL requests"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
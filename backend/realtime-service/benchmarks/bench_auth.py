@@ -0,0 +1,97 @@
+"""
+Auth overhead per request with and without the shared verified-token cache.
+
+Measures python-jose decoding on the realtime connect path and
+SharedJWTAuthentication on the board-service REST path, each cold (full
+verification every time) and warm (cache hit).
+
+    python benchmarks/bench_auth.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import print_table
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(SERVICE_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "shared"))
+
+from jose import jwt
+from token_cache import TokenCache
+
+SECRET = os.environ["JWT_SECRET"]
+
+
+def make_token():
+    now = int(time.time())
+    return jwt.encode(
+        {"token_type": "access", "exp": now + 3600, "iat": now, "jti": "bench", "user_id": 6},
+        SECRET, algorithm="HS256",
+    )
+
+
+def per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def realtime_rows(token, iterations):
+    def verify(t):
+        return jwt.decode(t, SECRET, algorithms=["HS256"])
+
+    cache = TokenCache()
+    cold = per_call(lambda: verify(token), iterations)
+    warm = per_call(lambda: cache.get_or_verify(token, verify), iterations)
+    return [
+        ["realtime jose.decode", f"{cold:.2f}", "0%"],
+        ["realtime cached", f"{warm:.2f}", f"{cache.hit_rate * 100:.1f}%"],
+    ]
+
+
+def board_rows(token, iterations):
+    sys.path.insert(0, os.path.join(BACKEND_DIR, "board-service"))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "board_service.settings")
+    import django
+    django.setup()
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.request import Request
+    from boards.authentication import SharedJWTAuthentication, token_cache
+
+    factory = APIRequestFactory()
+    request = Request(factory.get("/api/canvas/objects/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+    auth = SharedJWTAuthentication()
+
+    def cold():
+        token_cache.clear()
+        auth.authenticate(request)
+
+    cold_us = per_call(cold, iterations)
+    token_cache.hits = token_cache.misses = 0
+    warm_us = per_call(lambda: auth.authenticate(request), iterations)
+    return [
+        ["board SharedJWTAuthentication", f"{cold_us:.2f}", "0%"],
+        ["board cached", f"{warm_us:.2f}", f"{token_cache.hit_rate * 100:.1f}%"],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    token = make_token()
+    rows = realtime_rows(token, args.iterations)
+    try:
+        rows += board_rows(token, args.iterations)
+    except ImportError as e:
+        print(f"skipping board-service path: {e}")
+
+    print_table(["path", "us/request", "hit rate"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cross-node relay through the Redis backplane.
+
+Starts two in-process "nodes" (ConnectionManager + RedisBackplane) on the
+same board, checks that presence is merged and measures how long a broadcast
+on node A takes to reach the sockets on node B.
+
+Runs against fakeredis by default; pass --redis-url to use a real server.
+
+    python benchmarks/bench_backplane.py [--events 500] [--redis-url redis://localhost:6379]
+"""
+import argparse
+import asyncio
+import time
+
+from common import FakeWebSocket, percentile, print_table
+from backplane import RedisBackplane
+from websocket_manager import ConnectionManager
+
+
+def make_clients(redis_url):
+    if redis_url:
+        import redis.asyncio as aioredis
+        return aioredis.from_url(redis_url), aioredis.from_url(redis_url)
+
+    import fakeredis
+    server = fakeredis.FakeServer()
+    return (
+        fakeredis.aioredis.FakeRedis(server=server),
+        fakeredis.aioredis.FakeRedis(server=server),
+    )
+
+
+async def make_node(redis, node_id):
+    manager = ConnectionManager(backplane=RedisBackplane(redis, node_id=node_id))
+    await manager.backplane.start(manager.relay_remote)
+    return manager
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    redis_a, redis_b = make_clients(args.redis_url)
+    node_a = await make_node(redis_a, "node-a")
+    node_b = await make_node(redis_b, "node-b")
+    board = 9001
+
+    sender = FakeWebSocket()
+    await node_a.connect(sender, board, 1)
+    remote = []
+    for user_id in range(2, args.clients + 2):
+        ws = FakeWebSocket()
+        await node_b.connect(ws, board, user_id)
+        remote.append(ws)
+    # Same user on a second node must count once.
+    await node_b.connect(FakeWebSocket(), board, 1)
+    await asyncio.sleep(0.1)
+
+    users = await node_a.backplane.get_online_users(board)
+    assert users == list(range(1, args.clients + 2)), users
+
+    latencies = []
+    for i in range(args.events):
+        marks = [len(ws.sent) for ws in remote]
+        start = time.perf_counter()
+        await node_a.broadcast(board, {"type": "object_updated", "payload": {"id": i, "x": i}}, exclude_user=1)
+        while any(len(ws.sent) <= mark for ws, mark in zip(remote, marks)):
+            await asyncio.sleep(0)
+        latencies.extend(ws.sent[mark][0] - start for ws, mark in zip(remote, marks))
+
+    print(f"presence merged across nodes: {len(users)} users")
+    print_table(
+        ["events", "remote sockets", "p50 ms", "p99 ms"],
+        [[args.events, len(remote),
+          f"{percentile(latencies, 50) * 1000:.3f}", f"{percentile(latencies, 99) * 1000:.3f}"]],
+    )
+
+    for node in (node_a, node_b):
+        await node.backplane.stop()
+        for connections in node.active_connections.values():
+            for connection in connections:
+                connection.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Fan-out latency of ConnectionManager.broadcast with one stalled client.
+
+Measures the time from a broadcast call until each healthy socket has the
+frame written, for rooms of 10/100/500 sockets, and compares it with the old
+sequential `await send_text(json.dumps(...))` loop.
+
+    python benchmarks/bench_broadcast.py [--events 300] [--stall-ms 20]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import FakeWebSocket, percentile, print_table
+from websocket_manager import ConnectionManager
+
+MESSAGE = {
+    "type": "object_updated",
+    "payload": {"id": 42, "x": 120.5, "y": 88.25, "width": 200, "height": 150},
+}
+
+
+async def sequential_broadcast(sockets, message):
+    for websocket in sockets:
+        await websocket.send_text(json.dumps(message))
+
+
+async def run_sequential(room_size, events, stall):
+    sockets = [FakeWebSocket() for _ in range(room_size - 1)]
+    sockets.insert(0, FakeWebSocket(delay=stall))
+    latencies = []
+    for _ in range(events):
+        start = time.perf_counter()
+        marks = [len(ws.sent) for ws in sockets]
+        await sequential_broadcast(sockets, MESSAGE)
+        for ws, mark in zip(sockets[1:], marks[1:]):
+            latencies.append(ws.sent[mark][0] - start)
+    return latencies, 0
+
+
+async def run_queued(room_size, events, stall):
+    manager = ConnectionManager()
+    stalled = FakeWebSocket(delay=stall)
+    await manager.connect(stalled, 1, 0)
+    healthy = []
+    for user_id in range(1, room_size):
+        ws = FakeWebSocket()
+        await manager.connect(ws, 1, user_id)
+        healthy.append(ws)
+        # Let writers drain the join burst of online_users frames.
+        await asyncio.sleep(0.001)
+    await asyncio.sleep(0.05)
+
+    latencies = []
+    for _ in range(events):
+        marks = [len(ws.sent) for ws in healthy]
+        start = time.perf_counter()
+        await manager.broadcast(1, MESSAGE)
+        while any(len(ws.sent) <= mark for ws, mark in zip(healthy, marks)):
+            await asyncio.sleep(0)
+        latencies.extend(ws.sent[mark][0] - start for ws, mark in zip(healthy, marks))
+
+    dropped = manager.dropped_connections
+    for connection in manager.active_connections.get(1, []):
+        connection.stop()
+    return latencies, dropped
+
+
+def summarize(latencies):
+    return [f"{percentile(latencies, p) * 1000:.3f}" for p in (50, 99)]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--stall-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    stall = args.stall_ms / 1000
+
+    rows = []
+    for room_size in (10, 100, 500):
+        seq, _ = await run_sequential(room_size, args.events, stall)
+        queued, dropped = await run_queued(room_size, args.events, stall)
+        rows.append([room_size, *summarize(seq), *summarize(queued), dropped])
+
+    print(f"{args.events} broadcasts per room, one client stalled {args.stall_ms:g} ms per frame")
+    print_table(
+        ["sockets", "seq p50 ms", "seq p99 ms", "queued p50 ms", "queued p99 ms", "dropped"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""
+Frames per second delivered to peers during a drag-heavy session, with and
+without per-room coalescing of object_updated events.
+
+By default a session is synthesised: --draggers users each drag an object
+with 120 Hz mouse moves while also creating and deleting a shape every half
+second. A recorded session can be replayed instead with --trace, one JSON
+object per line: {"t": <seconds>, "user": <id>, "message": {...}}.
+
+    python benchmarks/bench_coalescing.py [--seconds 3] [--peers 10] [--trace session.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, print_table
+from protocol import Frame, JSON
+from websocket_manager import ConnectionManager
+
+BOARD = 1
+
+
+def synthesize(seconds, draggers, rate_hz=120):
+    rng = random.Random(7)
+    events = []
+    for user in range(1, draggers + 1):
+        x, y = rng.uniform(0, 800), rng.uniform(0, 600)
+        for i in range(int(seconds * rate_hz)):
+            x += rng.uniform(-4, 4)
+            y += rng.uniform(-4, 4)
+            t = i / rate_hz + rng.uniform(0, 0.002)
+            events.append({"t": t, "user": user, "message": {
+                "type": "object_updated", "payload": {"id": user, "x": round(x, 2), "y": round(y, 2)},
+            }})
+        for i in range(int(seconds * 2)):
+            shape_id = 1000 * user + i
+            t = i / 2 + 0.25
+            events.append({"t": t, "user": user, "message": {
+                "type": "object_created", "payload": {"id": shape_id, "object_type": "rectangle", "x": 0, "y": 0},
+            }})
+            events.append({"t": t + 0.1, "user": user, "message": {"type": "object_deleted", "id": shape_id}})
+    return sorted(events, key=lambda e: e["t"])
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def count_messages(frames):
+    total = 0
+    for _, data in frames:
+        message = json.loads(data)
+        total += len(message["messages"]) if message["type"] == "batch" else 1
+    return total
+
+
+async def replay(events, peers, window_ms):
+    manager = ConnectionManager(batch_window_ms=window_ms)
+    senders = sorted({e["user"] for e in events})
+    for user in senders:
+        await manager.connect(FakeWebSocket(), BOARD, user)
+    watchers = []
+    for user in range(10_000, 10_000 + peers):
+        ws = FakeWebSocket()
+        await manager.connect(ws, BOARD, user)
+        watchers.append(ws)
+    await asyncio.sleep(0.1)
+    for ws in watchers:
+        ws.sent.clear()
+
+    start = time.perf_counter()
+    for event in events:
+        delay = event["t"] - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await manager.relay(BOARD, Frame.from_encoded(JSON, json.dumps(event["message"])), event["user"])
+    await asyncio.sleep(0.1)
+    elapsed = events[-1]["t"] if events else 1
+
+    frames = sum(len(ws.sent) for ws in watchers)
+    messages = sum(count_messages(ws.sent) for ws in watchers)
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return frames / elapsed, messages / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--draggers", type=int, default=3)
+    parser.add_argument("--peers", type=int, default=10)
+    parser.add_argument("--trace", default=None)
+    args = parser.parse_args()
+
+    events = load_trace(args.trace) if args.trace else synthesize(args.seconds, args.draggers)
+    inbound = len(events) / max(events[-1]["t"], 1e-9)
+
+    rows = []
+    baseline = None
+    for window in (0, 16, 33, 50):
+        frames, messages = await replay(events, args.peers, window)
+        baseline = baseline or frames
+        rows.append([
+            window or "off", f"{frames:.0f}", f"{messages:.0f}", f"{(1 - frames / baseline) * 100:.1f}%",
+        ])
+
+    print(f"{len(events)} client events ({inbound:.0f}/s), {args.peers} watching peers")
+    print_table(["window ms", "frames/s to peers", "events/s to peers", "frame reduction"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
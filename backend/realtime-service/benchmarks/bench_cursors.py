@@ -0,0 +1,87 @@
+"""
+Cursor traffic in one busy room: per-message relay vs the aggregated channel.
+
+--users clients each move their cursor at --hz for --seconds. The relay
+mode fans every cursor frame out to all peers, the way object events are
+relayed. The aggregated mode sends cursors through ConnectionManager.relay,
+which merges them into one `cursors` frame per room tick. Reports socket
+writes, bytes and event-loop CPU per second.
+
+    python benchmarks/bench_cursors.py [--users 100] [--hz 20] [--seconds 3] [--tick-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, print_table
+from protocol import Frame, JSON
+from websocket_manager import ConnectionManager
+
+BOARD = 1
+
+
+async def run(users, hz, seconds, tick_ms, aggregated):
+    manager = ConnectionManager(max_queue=100_000, cursor_tick_ms=tick_ms)
+    sockets = []
+    for user in range(1, users + 1):
+        websocket = FakeWebSocket()
+        sockets.append(websocket)
+        await manager.connect(websocket, BOARD, user)
+    await asyncio.sleep(0.05)
+    for websocket in sockets:
+        websocket.sent.clear()
+
+    rng = random.Random(1)
+    deadline = time.perf_counter() + seconds
+
+    async def client(user):
+        await asyncio.sleep(rng.uniform(0, 1 / hz))
+        while time.perf_counter() < deadline:
+            raw = json.dumps({"type": "cursor", "payload": {"x": rng.uniform(0, 1920), "y": rng.uniform(0, 1080)}})
+            frame = Frame.from_encoded(JSON, raw)
+            if aggregated:
+                await manager.relay(BOARD, frame, user)
+            else:
+                await manager.relay_local(BOARD, frame, user)
+            await asyncio.sleep(1 / hz)
+
+    cpu = time.process_time()
+    await asyncio.gather(*(client(user) for user in range(1, users + 1)))
+    await asyncio.sleep(tick_ms / 1000 * 2)
+    cpu = time.process_time() - cpu
+
+    writes = sum(len(websocket.sent) for websocket in sockets)
+    sent_bytes = sum(len(data) for websocket in sockets for _, data in websocket.sent)
+    manager.cursors.cancel()
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return writes / seconds, sent_bytes / seconds, cpu / seconds
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--hz", type=float, default=20)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--tick-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    rows = []
+    for aggregated in (False, True):
+        writes, sent_bytes, cpu = await run(args.users, args.hz, args.seconds, args.tick_ms, aggregated)
+        rows.append([
+            f"aggregated ({args.tick_ms:g} ms tick)" if aggregated else "relay per message",
+            f"{writes:,.0f}",
+            f"{sent_bytes / 1024:,.0f}",
+            f"{cpu * 100:.0f}%",
+        ])
+
+    print(f"{args.users} users moving cursors at {args.hz:g} Hz")
+    print_table(["mode", "socket writes/s", "KiB/s", "CPU"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
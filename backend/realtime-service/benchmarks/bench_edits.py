@@ -0,0 +1,201 @@
+"""
+Edit-to-visible latency: REST lock/PATCH/unlock versus versioned operations.
+
+--editors clients share a room and keep editing a few hot objects
+(--objects), each edit after an exponential think time. board-service is
+simulated: every request costs --rtt-ms plus --write-ms under the row lock.
+Sockets are the real ConnectionManager with a --rtt-ms/2 hop each way.
+
+  locks  POST lock (retried every --retry-ms on 423), PATCH, broadcast,
+         POST unlock: the old frontend flow with the lock endpoints.
+  ops    stamp [counter, actor], broadcast at once, PATCH with the stamp in
+         the background; peers and board-service merge with shared/lww.py.
+
+Reports how long peers wait to see an edit, the requests and row writes
+per edit, and for ops whether every peer and the stored rows converged.
+
+    python benchmarks/bench_edits.py [--editors 2,5,10,20] [--objects 5] [--duration 5]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, percentile, print_table
+from lww import STAMP_KEY, merge, next_stamp
+from protocol import Frame, JSON
+from websocket_manager import ConnectionManager
+
+BOARD = 1
+FIELDS = ("x", "y")
+
+
+class BoardService:
+    """A stand-in for board-service's canvas endpoints."""
+
+    def __init__(self, objects, rtt, write):
+        self.rtt = rtt
+        self.write = write
+        self.rows = {key: {"x": 0.0, "y": 0.0} for key in range(objects)}
+        self.versions = {key: {} for key in range(objects)}
+        self.locked_by = {key: None for key in range(objects)}
+        self.row_locks = {key: asyncio.Lock() for key in range(objects)}
+        self.requests = 0
+        self.writes = 0
+
+    async def _request(self, key, change):
+        self.requests += 1
+        await asyncio.sleep(self.rtt / 2)
+        async with self.row_locks[key]:
+            status = change()
+            if status < 400:
+                await asyncio.sleep(self.write)
+                self.writes += 1
+        await asyncio.sleep(self.rtt / 2)
+        return status
+
+    async def lock(self, key, user):
+        def change():
+            if self.locked_by[key] not in (None, user):
+                return 423
+            self.locked_by[key] = user
+            return 200
+        return await self._request(key, change)
+
+    async def unlock(self, key, user):
+        def change():
+            self.locked_by[key] = None
+            return 200
+        return await self._request(key, change)
+
+    async def patch(self, key, fields, stamp=None):
+        def change():
+            merge(self.rows[key], self.versions[key], fields, stamp or next_stamp(self.versions[key]))
+            return 200
+        return await self._request(key, change)
+
+
+class Editor:
+    def __init__(self, user_id, objects):
+        self.user_id = user_id
+        self.actor = random.Random(user_id).randrange(1, 2**31)
+        self.clock = 0
+        self.websocket = FakeWebSocket()
+        self.rows = {key: {"x": 0.0, "y": 0.0} for key in range(objects)}
+        self.versions = {key: {} for key in range(objects)}
+
+
+async def run(mode, editors_count, args):
+    rng = random.Random(editors_count)
+    board = BoardService(args.objects, args.rtt_ms / 1000, args.write_ms / 1000)
+    manager = ConnectionManager(max_queue=100_000)
+    editors = [Editor(user, args.objects) for user in range(1, editors_count + 1)]
+    for editor in editors:
+        await manager.connect(editor.websocket, BOARD, editor.user_id)
+
+    started_at = {}
+    retries = [0]
+    background = set()
+    stop_at = time.perf_counter() + args.duration
+    hop = args.rtt_ms / 2000
+
+    async def send(editor, message):
+        await asyncio.sleep(hop)
+        await manager.relay(BOARD, Frame.from_encoded(JSON, json.dumps(message)), editor.user_id)
+
+    async def edit(editor, edit_id):
+        key = rng.randrange(args.objects)
+        fields = {"x": round(rng.uniform(0, 1600), 1), "y": round(rng.uniform(0, 900), 1)}
+        started_at[edit_id] = time.perf_counter()
+        payload = {"id": key, **fields, "edit": edit_id}
+
+        if mode == "locks":
+            while await board.lock(key, editor.user_id) == 423:
+                retries[0] += 1
+                await asyncio.sleep(args.retry_ms / 1000)
+            await board.patch(key, fields)
+            await send(editor, {"type": "object_updated", "payload": payload})
+            await board.unlock(key, editor.user_id)
+        else:
+            editor.clock += 1
+            stamp = (editor.clock, editor.actor)
+            merge(editor.rows[key], editor.versions[key], fields, stamp)
+            payload[STAMP_KEY] = list(stamp)
+            task = asyncio.create_task(board.patch(key, fields, stamp))
+            background.add(task)
+            task.add_done_callback(background.discard)
+            await send(editor, {"type": "object_updated", "payload": payload})
+
+    async def editor_loop(editor):
+        edit_id = editor.user_id * 1_000_000
+        await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+        while time.perf_counter() < stop_at:
+            edit_id += 1
+            await edit(editor, edit_id)
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+    await asyncio.gather(*(editor_loop(editor) for editor in editors))
+    await asyncio.gather(*background)
+    await asyncio.sleep(0.2)
+
+    visible = []
+    for editor in editors:
+        for sent_at, data in editor.websocket.sent:
+            message = json.loads(data)
+            if message.get("type") != "object_updated":
+                continue
+            payload = message["payload"]
+            visible.append((sent_at + hop - started_at[payload["edit"]]) * 1000)
+            if STAMP_KEY in payload:
+                fields = {name: payload[name] for name in FIELDS}
+                merge(editor.rows[payload["id"]], editor.versions[payload["id"]], fields, tuple(payload[STAMP_KEY]))
+        editor.websocket.sent.clear()
+
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+
+    edits = len(started_at)
+    converged = all(editor.rows == board.rows for editor in editors) if mode == "ops" else None
+    return {
+        "edits": edits,
+        "p50": percentile(visible, 50),
+        "p99": percentile(visible, 99),
+        "requests": board.requests / edits,
+        "writes": board.writes / edits,
+        "retries": retries[0] / edits,
+        "converged": converged,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--editors", default="2,5,10,20")
+    parser.add_argument("--objects", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--think-ms", type=float, default=250)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--write-ms", type=float, default=2)
+    parser.add_argument("--retry-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    rows = []
+    for editors in (int(n) for n in args.editors.split(",")):
+        for mode in ("locks", "ops"):
+            result = await run(mode, editors, args)
+            rows.append([
+                editors, mode, result["edits"],
+                f"{result['p50']:.1f}", f"{result['p99']:.1f}",
+                f"{result['requests']:.2f}", f"{result['writes']:.2f}", f"{result['retries']:.2f}",
+                "-" if result["converged"] is None else ("yes" if result["converged"] else "NO"),
+            ])
+
+    print(f"{args.objects} hot objects, rtt {args.rtt_ms:g} ms, row write {args.write_ms:g} ms, "
+          f"think {args.think_ms:g} ms")
+    print_table(["editors", "mode", "edits", "visible p50 ms", "visible p99 ms",
+                 "requests/edit", "writes/edit", "423s/edit", "converged"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+"""
+Append throughput and memory of the Redis Streams event log.
+
+Writes --events frames spread over --boards streams in three ways:
+
+  xadd      one awaited XADD per event, as if relay() wrote synchronously.
+  pipeline  RedisEventLog: append() buffers, a background task writes
+            --batch events per pipelined round trip.
+  consume   reads everything back through an EventLogConsumer group and
+            acknowledges it.
+
+With --redis-url the numbers come from a real server, and memory per
+million events is what MEMORY USAGE reports for the streams. Without it the
+benchmark runs fakeredis behind a local TCP socket, which has real round
+trips but no Redis memory accounting, so memory is only the entries'
+payload bytes, a lower bound.
+
+    python benchmarks/bench_event_log.py [--events 20000] [--boards 20] [--batch 500] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+import redis.asyncio as aioredis
+
+from common import print_table
+from event_log import STREAMS_KEY, EventLogConsumer, RedisEventLog, stream_key
+
+
+def fake_server():
+    import fakeredis
+
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"redis://{host}:{port}/0"
+
+
+def make_events(count, boards, seed=1):
+    rng = random.Random(seed)
+    events = []
+    for index in range(count):
+        payload = {"id": rng.randrange(10_000), "x": round(rng.uniform(0, 1600), 1),
+                   "y": round(rng.uniform(0, 900), 1), "v": [index + 1, rng.randrange(1, 2**31)]}
+        events.append((rng.randrange(boards), json.dumps({"type": "object_updated", "payload": payload}),
+                       rng.randrange(1, 50)))
+    return events
+
+
+async def reset(redis, boards):
+    await redis.delete(STREAMS_KEY, *(stream_key(board) for board in range(boards)))
+
+
+async def stream_memory(redis, boards, events, real):
+    if real:
+        total = 0
+        for board in range(boards):
+            total += await redis.memory_usage(stream_key(board), samples=0) or 0
+        return total, "MEMORY USAGE"
+    # Field names, values and ids as stored; listpack overhead not included.
+    return sum(len(data) + len(str(sender)) + 2 + 16 for _, data, sender in events), "payload bytes"
+
+
+async def run_xadd(redis, events, maxlen):
+    started = time.perf_counter()
+    for board, data, sender in events:
+        await redis.xadd(stream_key(board), {"d": data, "u": sender}, maxlen=maxlen, approximate=True)
+        await redis.zadd(STREAMS_KEY, {stream_key(board): time.time()})
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+async def run_pipeline(redis, events, maxlen, batch):
+    log = RedisEventLog(redis, maxlen, flush_interval=0.01, max_batch=batch)
+    log.start()
+    started = time.perf_counter()
+    caller = 0.0
+    for index, (board, data, sender) in enumerate(events):
+        before = time.perf_counter()
+        log.append(board, data, sender)
+        caller += time.perf_counter() - before
+        if index % batch == batch - 1:
+            # Let the writer run, as the event loop would between socket reads.
+            await asyncio.sleep(0)
+    await log.stop()
+    return time.perf_counter() - started, caller
+
+
+async def run_consume(redis, events, batch):
+    seen = [0]
+
+    async def handler(whiteboard_id, entries):
+        seen[0] += len(entries)
+
+    consumer = EventLogConsumer(redis, "bench", "bench-1", handler, count=batch, block=0.01)
+    started = time.perf_counter()
+    await consumer.discover()
+    while seen[0] < len(events):
+        if not await consumer.poll():
+            break
+    return time.perf_counter() - started, seen[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--boards", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--redis-url", default="")
+    args = parser.parse_args()
+
+    server = None
+    url = args.redis_url
+    if not url:
+        server, url = fake_server()
+    redis = aioredis.Redis.from_url(url)
+    events = make_events(args.events, args.boards)
+    # Keep every event so memory is measured over all of them.
+    maxlen = args.events
+
+    rows = []
+    try:
+        await reset(redis, args.boards)
+        elapsed, caller = await run_xadd(redis, events, maxlen)
+        rows.append(["xadd", f"{len(events) / elapsed:,.0f}", f"{caller / len(events) * 1e6:.1f}"])
+
+        await reset(redis, args.boards)
+        elapsed, caller = await run_pipeline(redis, events, maxlen, args.batch)
+        rows.append(["pipeline", f"{len(events) / elapsed:,.0f}", f"{caller / len(events) * 1e6:.2f}"])
+        memory, source = await stream_memory(redis, args.boards, events, bool(args.redis_url))
+
+        elapsed, seen = await run_consume(redis, events, args.batch)
+        rows.append(["consume", f"{seen / elapsed:,.0f}", "-"])
+        await reset(redis, args.boards)
+    finally:
+        await redis.aclose()
+        if server:
+            server.shutdown()
+
+    print(f"{args.events:,} events over {args.boards} boards, batch {args.batch}, "
+          f"{'redis ' + args.redis_url if args.redis_url else 'fakeredis over TCP'}")
+    print_table(["mode", "events/s", "caller us/event"], rows)
+    print(f"memory: {memory / len(events) * 1_000_000 / 2**20:,.0f} MiB per million events ({source})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
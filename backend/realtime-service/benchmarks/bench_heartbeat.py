@@ -0,0 +1,124 @@
+"""
+What half-open sockets cost before the heartbeat reaper removes them.
+
+--rooms rooms each hold --live answering sockets and --zombies sockets whose
+writes never complete (a peer that vanished without a FIN). After
+--broadcasts frames per room, which stays under the send queue limit so the
+slow-consumer check never fires, one heartbeat pass runs past the timeout.
+Reports memory held (tracemalloc), relay CPU per broadcast, and what the
+reaper counted, before and after the pass. "stuck KiB" counts a frame once
+per queue holding it; the room's zombies share one copy of each frame, which
+is what the traced memory shows being freed.
+
+    python benchmarks/bench_heartbeat.py [--rooms 5] [--live 40] [--zombies 10] [--broadcasts 200]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from common import FakeWebSocket, print_table
+from heartbeat import HeartbeatReaper
+from protocol import Frame, JSON
+from websocket_manager import ConnectionManager
+
+
+def held_memory(manager):
+    # FakeWebSocket records what it "sent"; a real socket keeps none of it.
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.websocket.sent.clear()
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class Clock:
+    def __init__(self):
+        self.now = time.monotonic()
+
+    def __call__(self):
+        return self.now
+
+
+async def relay_round(manager, rooms, frames):
+    elapsed = 0.0
+    for message in frames:
+        # A fresh string per frame, like receive_text gives the server, so
+        # the queues are what keeps it alive.
+        raw = json.dumps(message)
+        start = time.process_time()
+        for whiteboard_id in rooms:
+            await manager.relay(whiteboard_id, Frame.from_encoded(JSON, raw), 0)
+        elapsed += time.process_time() - start
+        # Let the live writers drain so only the zombies fall behind.
+        await asyncio.sleep(0)
+    return elapsed / (len(frames) * len(rooms))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--live", type=int, default=40)
+    parser.add_argument("--zombies", type=int, default=10)
+    parser.add_argument("--broadcasts", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(2)
+    frames = [{"type": "object_updated", "payload": {
+        "id": i % 20, "x": round(rng.uniform(0, 900), 2), "y": round(rng.uniform(0, 600), 2),
+        "data": {"points": [round(rng.uniform(-50, 50), 1) for _ in range(50)]},
+    }} for i in range(args.broadcasts)]
+
+    tracemalloc.start()
+    manager = ConnectionManager()
+    clock = Clock()
+    reaper = HeartbeatReaper(manager, interval=15, timeout=45, clock=clock)
+    rooms = list(range(1, args.rooms + 1))
+    for whiteboard_id in rooms:
+        for user in range(1, args.live + 1):
+            await manager.connect(FakeWebSocket(), whiteboard_id, user)
+        for user in range(args.live + 1, args.live + args.zombies + 1):
+            await manager.connect(FakeWebSocket(stalled=True), whiteboard_id, user)
+    await asyncio.sleep(0.05)
+
+    before_cpu = await relay_round(manager, rooms, frames)
+    await asyncio.sleep(0.05)
+    before_mem = held_memory(manager)
+
+    # Time passes; live clients answered the pings, zombies did not.
+    clock.now += reaper.timeout + 1
+    for room in manager.active_connections.values():
+        for connection in room:
+            if not connection.websocket.stalled:
+                connection.last_seen = clock.now
+    await reaper.beat()
+    await asyncio.sleep(0.05)
+
+    after_mem = held_memory(manager)
+    after_cpu = await relay_round(manager, rooms, frames)
+    tracemalloc.stop()
+
+    zombies = args.rooms * args.zombies
+    print(f"{args.rooms} rooms x ({args.live} live + {args.zombies} zombies), {args.broadcasts} broadcasts per room")
+    print_table(["", "before reap", "after reap"], [
+        ["sockets", args.rooms * (args.live + args.zombies),
+         sum(len(room) for room in manager.active_connections.values())],
+        ["traced memory KiB", f"{before_mem / 1024:,.0f}", f"{after_mem / 1024:,.0f}"],
+        ["us per broadcast", f"{before_cpu * 1e6:.1f}", f"{after_cpu * 1e6:.1f}"],
+    ])
+    print()
+    print_table(["reaped", "stuck frames", "stuck KiB", "KiB per zombie (freed)"], [[
+        reaper.reaped, reaper.reaped_frames, f"{reaper.reaped_bytes / 1024:,.0f}",
+        f"{(before_mem - after_mem) / 1024 / max(1, zombies):,.1f}",
+    ]])
+
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Sustained ingest of the room_events journal.
+
+  row      one INSERT and commit per event, awaited in a thread: what
+           writing from relay() without batching would cost.
+  journal  EventJournal at each offered rate in --rates: events are
+           appended from the event loop every millisecond for --duration
+           seconds while the writer flushes in the background.
+
+For the journal, reports the rate it kept up with (committed events/s), the
+worst batch lag (append to commit), how late the loop's 1 ms sleeps woke
+up, and what was still buffered at the end. Runs on a temporary
+SQLite file unless --database-url points at Postgres, where the journal
+uses COPY.
+
+    python benchmarks/bench_journal.py [--rates 1000,5000,20000] [--duration 5] [--database-url postgresql+psycopg2://...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import delete, insert
+
+from common import percentile, print_table
+from database import get_engine, init_db
+from journal import COLUMNS, EventJournal
+from models import RoomEvent
+
+
+def make_frame(rng, index):
+    payload = {"id": rng.randrange(10_000), "x": round(rng.uniform(0, 1600), 1),
+               "y": round(rng.uniform(0, 900), 1), "v": [index + 1, rng.randrange(1, 2**31)]}
+    return json.dumps({"type": "object_updated", "payload": payload})
+
+
+def clear(engine):
+    with engine.begin() as connection:
+        connection.execute(delete(RoomEvent))
+
+
+async def run_rows(engine, count):
+    rng = random.Random(1)
+    journal = EventJournal(engine)
+
+    def write_one(row):
+        with engine.begin() as connection:
+            connection.execute(insert(RoomEvent), dict(zip(COLUMNS, row)))
+
+    started = time.perf_counter()
+    for index in range(count):
+        journal.append(rng.randrange(50), make_frame(rng, index), rng.randrange(1, 50), "object_updated")
+        _, row = journal.pending.pop()
+        await asyncio.to_thread(write_one, row)
+    return count / (time.perf_counter() - started)
+
+
+async def run_journal(engine, rate, duration, flush_ms, max_batch):
+    rng = random.Random(rate)
+    journal = EventJournal(engine, flush_ms / 1000, max_batch)
+    journal.start()
+    lags, stalls = [], []
+    appended = 0
+    frames = [make_frame(rng, index) for index in range(10_000)]
+    started = time.perf_counter()
+    now = started
+    while now - started < duration:
+        due = int((now - started) * rate) - appended
+        for _ in range(due):
+            journal.append(appended % 50, frames[appended % len(frames)], appended % 49 + 1, "object_updated")
+            appended += 1
+        written = journal.written
+        wake_at = time.perf_counter() + 0.001
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append(max(0.0, now - wake_at) * 1000)
+        if journal.written != written:
+            lags.append(journal.lag * 1000)
+    elapsed = time.perf_counter() - started
+    written, backlog = journal.written, len(journal.pending)
+    await journal.stop()
+    return {
+        "offered": appended / elapsed,
+        "written": written / elapsed,
+        "lag_max": max(lags, default=0.0),
+        "stall_p99": percentile(stalls, 99),
+        "stall_max": max(stalls, default=0.0),
+        "backlog": backlog,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", default="1000,5000,20000")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--row-events", type=int, default=2000)
+    parser.add_argument("--flush-ms", type=float, default=200)
+    parser.add_argument("--max-batch", type=int, default=1000)
+    parser.add_argument("--database-url", default="")
+    args = parser.parse_args()
+
+    workdir = None
+    url = args.database_url
+    if not url:
+        workdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(workdir.name, 'journal.db')}"
+    engine = get_engine(url)
+    init_db(engine)
+    try:
+        clear(engine)
+        row_rate = await run_rows(engine, args.row_events)
+        rows = [["row", "-", f"{row_rate:,.0f}", "-", "-", "-", "-"]]
+        for rate in (int(n) for n in args.rates.split(",")):
+            clear(engine)
+            result = await run_journal(engine, rate, args.duration, args.flush_ms, args.max_batch)
+            rows.append([
+                "journal", f"{result['offered']:,.0f}", f"{result['written']:,.0f}",
+                f"{result['lag_max']:.0f}", f"{result['stall_p99']:.2f}", f"{result['stall_max']:.1f}",
+                f"{result['backlog']:,}",
+            ])
+        clear(engine)
+    finally:
+        engine.dispose()
+        if workdir:
+            workdir.cleanup()
+
+    print(f"{engine.dialect.name}, flush every {args.flush_ms:g} ms or {args.max_batch} events, "
+          f"{args.duration:g} s per rate")
+    print_table(["mode", "offered/s", "committed/s", "lag max ms", "loop stall p99 ms",
+                 "loop stall max ms", "backlog"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
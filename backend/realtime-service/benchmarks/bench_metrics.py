@@ -0,0 +1,103 @@
+"""
+Cost of the /metrics instrumentation on the relay path.
+
+Relays the same frames through a room with the real counters and histogram,
+then with no-op stand-ins swapped into the metrics module, and reports the
+CPU per relay call for both. The no-op runs still pay for the two clock
+reads and the per-recipient byte count, which are the rest of the cost.
+Runs are interleaved and the best of --repeat is kept to keep noise out of
+a difference this small.
+
+    python benchmarks/bench_metrics.py [--messages 20000] [--peers 10,50] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, print_table
+from protocol import Frame, JSON
+from websocket_manager import ConnectionManager
+import metrics
+
+BOARD = 1
+SENDER = 1
+
+
+class NoOp:
+    def inc(self, *args):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+def sample_frames(count):
+    rng = random.Random(7)
+    return [json.dumps({"type": "object_updated", "payload": {
+        "id": i % 7, "x": round(rng.uniform(0, 900), 2), "y": round(rng.uniform(0, 600), 2),
+    }}) for i in range(count)]
+
+
+async def make_room(peers):
+    manager = ConnectionManager(max_queue=1_000_000)
+    await manager.connect(FakeWebSocket(stalled=True), BOARD, SENDER)
+    for user in range(2, peers + 2):
+        await manager.connect(FakeWebSocket(stalled=True), BOARD, user)
+    return manager
+
+
+async def relay_cpu(manager, frames):
+    start = time.process_time()
+    for raw in frames:
+        await manager.relay(BOARD, Frame.from_encoded(JSON, raw), SENDER)
+    return (time.process_time() - start) / len(frames)
+
+
+async def measure(peers, frames, repeat):
+    real = {name: getattr(metrics, name) for name in ("MESSAGES_OUT", "BYTES_OUT", "BROADCAST_SECONDS")}
+    noop = {name: NoOp() for name in real}
+    best = {"off": float("inf"), "on": float("inf")}
+
+    for _ in range(repeat):
+        for mode, objects in (("off", noop), ("on", real)):
+            for name, obj in objects.items():
+                setattr(metrics, name, obj)
+            manager = await make_room(peers)
+            best[mode] = min(best[mode], await relay_cpu(manager, frames))
+            for room in manager.active_connections.values():
+                for connection in room:
+                    connection.stop()
+            await asyncio.sleep(0)
+
+    for name, obj in real.items():
+        setattr(metrics, name, obj)
+    return best
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--peers", default="10,50")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = sample_frames(args.messages)
+    rows = []
+    for peers in (int(p) for p in args.peers.split(",")):
+        best = await measure(peers, frames, args.repeat)
+        overhead = best["on"] - best["off"]
+        rows.append([
+            peers,
+            f"{best['off'] * 1e6:.2f}",
+            f"{best['on'] * 1e6:.2f}",
+            f"{overhead * 1e6:+.2f}",
+            f"{overhead / best['off'] * 100:+.1f}%",
+        ])
+
+    print_table(["peers", "us/relay no metrics", "us/relay metrics", "overhead us", "overhead"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
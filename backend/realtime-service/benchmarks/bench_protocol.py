@@ -0,0 +1,90 @@
+"""
+Wire size and encode/decode throughput, JSON vs MessagePack.
+
+Payloads mirror what the frontend sends: shapes from the seed data and
+freehand strokes whose `data.points` is the flat, stroke-relative list built
+by useCanvasDrawing.
+
+    python benchmarks/bench_protocol.py [--seconds 0.5]
+"""
+import argparse
+import random
+import time
+
+from common import print_table
+from protocol import JSON, MSGPACK
+
+
+def freehand(points, rng):
+    x = y = 0.0
+    flat = []
+    for _ in range(points):
+        x += rng.uniform(-3, 3)
+        y += rng.uniform(-3, 3)
+        flat.extend((round(x, 2), round(y, 2)))
+    return {"type": "object_created", "payload": {
+        "id": rng.randint(1, 10**6), "whiteboard": 5, "object_type": "freehand",
+        "x": 512.5, "y": 300.25, "width": None, "height": None,
+        "color": "#EC4899", "stroke_width": 2, "z_index": 1,
+        "data": {"points": flat}, "created_by": 6,
+        "created_at": "2025-11-26T16:34:00.000000Z", "updated_at": "2025-11-26T16:34:00.000000Z",
+        "locked_by": None, "locked_at": None,
+    }}
+
+
+def payloads():
+    rng = random.Random(3)
+    return {
+        "object_updated (drag)": {"type": "object_updated", "payload": {"id": 42, "x": 431.5, "y": 218.25}},
+        "object_created (sticky note)": {"type": "object_created", "payload": {
+            "id": 7, "whiteboard": 5, "object_type": "sticky_note", "x": 150, "y": 200,
+            "width": 200, "height": 150, "color": "#FBBF24", "stroke_width": 2, "z_index": 2,
+            "data": {"content": "This is a sticky note!\n\nYou can add ideas here.", "noteColor": "#FEF3C7"},
+            "created_by": 6, "locked_by": None, "locked_at": None,
+        }},
+        "freehand 50 pts": freehand(50, rng),
+        "freehand 500 pts": freehand(500, rng),
+        "freehand 2000 pts": freehand(2000, rng),
+    }
+
+
+def throughput(fn, arg, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(20):
+            fn(arg)
+        count += 20
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rows = []
+    for name, message in payloads().items():
+        as_json = JSON.encode(message)
+        as_msgpack = MSGPACK.encode(message)
+        json_size = len(as_json.encode())
+        rows.append([
+            name,
+            json_size,
+            len(as_msgpack),
+            f"{len(as_msgpack) / json_size * 100:.0f}%",
+            f"{throughput(JSON.encode, message, args.seconds):,.0f}",
+            f"{throughput(MSGPACK.encode, message, args.seconds):,.0f}",
+            f"{throughput(JSON.decode, as_json, args.seconds):,.0f}",
+            f"{throughput(MSGPACK.decode, as_msgpack, args.seconds):,.0f}",
+        ])
+
+    print_table(
+        ["payload", "json B", "msgpack B", "size", "json enc/s", "mp enc/s", "json dec/s", "mp dec/s"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Latency of quiet rooms while one room on the same node is flooded.
+
+One client in the flooded room sends freehand object_created frames as fast
+as the event loop lets it (a buggy client in a paste loop). Clients in
+--quiet-rooms other rooms drag objects at 30 Hz, and the time from a drag
+frame entering the receive loop to a peer's socket write is recorded. Each
+socket write burns SEND_COST of CPU, as a real one would. The run is
+repeated without and with the default RateLimits.
+
+    python benchmarks/bench_ratelimit.py [--seconds 5] [--quiet-rooms 5] [--clients 10]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, percentile, print_table
+from protocol import Frame, JSON
+from ratelimit import RateLimiter, RateLimits
+from websocket_manager import ConnectionManager
+
+FLOODED = 1
+FLOOD_PEERS = 30
+# CPU a real socket write costs (framing, syscall); FakeWebSocket's is ~0.
+SEND_COST = 20e-6
+
+
+class BusyWebSocket(FakeWebSocket):
+    async def _send(self, data):
+        end = time.perf_counter() + SEND_COST
+        while time.perf_counter() < end:
+            pass
+        await super()._send(data)
+
+
+def flood_frame(rng, i):
+    points = [round(rng.uniform(-200, 200), 2) for _ in range(400)]
+    return json.dumps({"type": "object_created", "payload": {
+        "id": i, "object_type": "freehand", "x": 10.5, "y": 20.25,
+        "color": "#EC4899", "stroke_width": 2, "data": {"points": points},
+    }})
+
+
+async def receive_loop(manager, limiter, websocket, whiteboard_id, user_id, frames, deadline, interval=0.0):
+    """What main.websocket_endpoint does per frame, minus the socket read."""
+    connection_limiter = limiter.connection(whiteboard_id) if limiter else None
+    sent = 0
+    if interval:
+        await asyncio.sleep(random.uniform(0, interval))
+    try:
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(interval)
+            raw = frames(sent)
+            frame = Frame.from_encoded(JSON, raw)
+            if connection_limiter and not await connection_limiter.admit(frame.message_type):
+                await manager.disconnect(websocket, whiteboard_id, user_id)
+                return sent, True
+            await manager.relay(whiteboard_id, frame, user_id)
+            sent += 1
+    finally:
+        if connection_limiter:
+            connection_limiter.close()
+    return sent, False
+
+
+async def run(seconds, quiet_rooms, clients, limited):
+    rng = random.Random(3)
+    manager = ConnectionManager()
+    limiter = RateLimiter(RateLimits()) if limited else None
+
+    flooder = BusyWebSocket()
+    await manager.connect(flooder, FLOODED, 1)
+    for user in range(2, FLOOD_PEERS + 2):
+        await manager.connect(BusyWebSocket(), FLOODED, user)
+    quiet = {}
+    for room in range(2, quiet_rooms + 2):
+        for user in range(1, clients + 1):
+            websocket = BusyWebSocket()
+            quiet[(room, user)] = websocket
+            await manager.connect(websocket, room, user)
+    await asyncio.sleep(0.05)
+    for websocket in quiet.values():
+        websocket.sent.clear()
+
+    payloads = [flood_frame(rng, i) for i in range(50)]
+
+    def drag(room, user):
+        def frames(i):
+            return json.dumps({"type": "object_updated", "payload": {
+                "id": user, "x": i, "y": i, "t": time.perf_counter(),
+            }})
+        return frames
+
+    deadline = time.perf_counter() + seconds
+    tasks = [receive_loop(manager, limiter, flooder, FLOODED, 1, lambda i: payloads[i % 50], deadline)]
+    for (room, user), websocket in quiet.items():
+        tasks.append(receive_loop(manager, limiter, websocket, room, user, drag(room, user), deadline, 1 / 30))
+    results = await asyncio.gather(*tasks)
+    await asyncio.sleep(0.1)
+
+    latencies = []
+    for websocket in quiet.values():
+        for delivered_at, data in websocket.sent:
+            message = json.loads(data)
+            if message.get("type") == "object_updated":
+                latencies.append((delivered_at - message["payload"]["t"]) * 1000)
+
+    flood_sent, flooder_cut = results[0]
+    quiet_sent = sum(sent for sent, _ in results[1:])
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return {
+        "flood/s": flood_sent / seconds,
+        "flooder disconnected": flooder_cut,
+        "quiet frames/s": quiet_sent / seconds,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "dropped sockets": manager.dropped_connections,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--quiet-rooms", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    for limited in (False, True):
+        result = await run(args.seconds, args.quiet_rooms, args.clients, limited)
+        rows.append([
+            "rate limited" if limited else "unlimited",
+            f"{result['flood/s']:.0f}",
+            "yes" if result["flooder disconnected"] else "no",
+            f"{result['quiet frames/s']:.0f}",
+            f"{result['p50']:.2f}",
+            f"{result['p99']:.2f}",
+            result["dropped sockets"],
+        ])
+
+    print(f"1 flooded room ({FLOOD_PEERS} peers), {args.quiet_rooms} quiet rooms x {args.clients} clients at 30 Hz")
+    print_table(["mode", "flood frames/s", "flooder cut", "quiet frames/s",
+                 "quiet p50 ms", "quiet p99 ms", "dropped sockets"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
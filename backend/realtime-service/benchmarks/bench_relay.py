@@ -0,0 +1,120 @@
+"""
+CPU per relayed message: decode + re-encode vs forwarding the client's bytes.
+
+The forwarding path goes through receive_frame(). The service decodes
+edits (DECODED_EVENTS) as they arrive, since room state and the persister
+read them; the "undecoded" row shows the same frames relayed on the sniffed
+type alone, as any other event type would be.
+
+Relays the same frames through a busy room both ways and reports the process
+CPU spent in the relay call itself (routing, codec work and enqueueing to
+every peer). Socket writes cost the same on both paths and are left out.
+Pass --profile to dump a cProfile of the zero-reparse path.
+
+    python benchmarks/bench_relay.py [--messages 5000] [--peers 50] [--profile]
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import pstats
+import random
+import time
+
+from common import FakeWebSocket, print_table
+from protocol import receive_frame
+from websocket_manager import ConnectionManager, DECODED_EVENTS
+
+BOARD = 1
+SENDER = 1
+
+
+def sample_frames(count):
+    rng = random.Random(11)
+    frames = []
+    for i in range(count):
+        if i % 20 == 0:
+            points = [round(rng.uniform(-200, 200), 2) for _ in range(400)]
+            message = {"type": "object_created", "payload": {
+                "id": i, "object_type": "freehand", "x": 10.5, "y": 20.25,
+                "color": "#EC4899", "stroke_width": 2, "data": {"points": points},
+            }}
+        else:
+            message = {"type": "object_updated", "payload": {
+                "id": i % 7, "x": round(rng.uniform(0, 900), 2), "y": round(rng.uniform(0, 600), 2),
+            }}
+        frames.append(json.dumps(message))
+    return frames
+
+
+async def make_room(peers):
+    manager = ConnectionManager()
+    await manager.connect(FakeWebSocket(), BOARD, SENDER)
+    for user in range(2, peers + 2):
+        await manager.connect(FakeWebSocket(), BOARD, user)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    return manager
+
+
+async def reparse_path(manager, raw):
+    await manager.broadcast(BOARD, json.loads(raw), exclude_user=SENDER)
+
+
+async def zero_reparse_path(manager, raw):
+    frame = receive_frame({"type": "websocket.receive", "text": raw}, DECODED_EVENTS)
+    await manager.relay(BOARD, frame, SENDER)
+
+
+async def undecoded_path(manager, raw):
+    await manager.relay(BOARD, receive_frame({"type": "websocket.receive", "text": raw}), SENDER)
+
+
+async def measure(path, frames, peers):
+    manager = await make_room(peers)
+    elapsed = 0.0
+    for raw in frames:
+        start = time.process_time()
+        await path(manager, raw)
+        elapsed += time.process_time() - start
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    assert manager.dropped_connections == 0
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return elapsed / len(frames)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    frames = sample_frames(args.messages)
+    reparse = await measure(reparse_path, frames, args.peers)
+    relay = await measure(zero_reparse_path, frames, args.peers)
+    undecoded = await measure(undecoded_path, frames, args.peers)
+
+    print(f"{args.messages} messages (5% freehand strokes), {args.peers} peers")
+    print_table(
+        ["path", "CPU us/msg", "relative"],
+        [
+            ["decode + re-encode", f"{reparse * 1e6:.1f}", "100%"],
+            ["zero-reparse", f"{relay * 1e6:.1f}", f"{relay / reparse * 100:.0f}%"],
+            ["undecoded", f"{undecoded * 1e6:.1f}", f"{undecoded / reparse * 100:.0f}%"],
+        ],
+    )
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        await measure(zero_reparse_path, frames, args.peers)
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
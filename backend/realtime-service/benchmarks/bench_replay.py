@@ -0,0 +1,127 @@
+"""
+Reconnect cost on a large board: full reload vs ?since= replay.
+
+A board holds --objects objects (a mix of shapes and 100-point freehand
+strokes) and a client drops while --missed events happen. It reconnects:
+
+- REST reload: what GET /api/canvas/objects/ has to serialize and the
+  client has to parse for the whole board (the database query is left out)
+- snapshot: realtime room state is on, so the reconnect gets a snapshot frame
+- replay: the reconnect passes since/epoch and gets only the missed events
+
+Times run from the reconnect to the client having parsed everything it was
+sent.
+
+    python benchmarks/bench_replay.py [--objects 50000] [--missed 200]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from common import FakeWebSocket, print_table
+from protocol import Frame, JSON, sniff_type
+from replay import ReplayLog
+from room_state import RoomStateStore
+from websocket_manager import ConnectionManager
+
+BOARD = 1
+
+
+def make_board(count):
+    rng = random.Random(13)
+    objects = []
+    for i in range(1, count + 1):
+        obj = {
+            "id": i, "whiteboard": BOARD, "object_type": "rectangle",
+            "x": rng.uniform(0, 5000), "y": rng.uniform(0, 5000),
+            "width": 120.0, "height": 80.0, "rotation": 0.0,
+            "color": "#3B82F6", "stroke_width": 2, "fill_color": None,
+            "z_index": i, "data": {}, "created_by": 1 + i % 5,
+            "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z",
+            "is_locked": False, "locked_by": None,
+        }
+        if i % 3 == 0:
+            obj.update(object_type="freehand", width=None, height=None,
+                       data={"points": [round(rng.uniform(-100, 100), 1) for _ in range(100)]})
+        objects.append(obj)
+    return objects
+
+
+def missed_events(count, objects):
+    rng = random.Random(17)
+    return [json.dumps({"type": "object_updated", "payload": {
+        "id": rng.randint(1, objects), "x": rng.uniform(0, 5000), "y": rng.uniform(0, 5000),
+    }}) for _ in range(count)]
+
+
+async def received(websocket):
+    """Wait for the sync frame that ends a catch-up."""
+    while not any(sniff_type(data) in ("sync", "resync") for _, data in websocket.sent):
+        await asyncio.sleep(0)
+    return sum(len(data) for _, data in websocket.sent)
+
+
+async def reconnect(objects, missed, with_state, with_since):
+    async def fetch(whiteboard_id, token):
+        return objects
+
+    manager = ConnectionManager(replay=ReplayLog())
+    if with_state:
+        manager.room_state = RoomStateStore(fetch, max_objects=len(objects) * 2)
+
+    editor = FakeWebSocket()
+    await manager.connect(editor, BOARD, 1)
+    epoch, seq = manager.replay.head(BOARD)
+    for raw in missed:
+        await manager.relay(BOARD, Frame.from_encoded(JSON, raw), 1)
+
+    websocket = FakeWebSocket()
+    start = time.perf_counter()
+    if with_since:
+        await manager.connect(websocket, BOARD, 2, since=seq, epoch=epoch)
+    else:
+        await manager.connect(websocket, BOARD, 2)
+    sent_bytes = await received(websocket)
+    for _, data in websocket.sent:
+        json.loads(data)
+    elapsed = time.perf_counter() - start
+
+    for room in manager.active_connections.values():
+        for connection in room:
+            connection.stop()
+    return elapsed, sent_bytes
+
+
+def rest_reload(objects):
+    start = time.perf_counter()
+    body = json.dumps(objects)
+    json.loads(body)
+    return time.perf_counter() - start, len(body)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=50_000)
+    parser.add_argument("--missed", type=int, default=200)
+    args = parser.parse_args()
+
+    objects = make_board(args.objects)
+    missed = missed_events(args.missed, args.objects)
+
+    rows = []
+    for name, result in (
+        ("REST reload (no DB)", rest_reload(objects)),
+        ("snapshot", await reconnect(objects, missed, True, False)),
+        ("replay ?since=", await reconnect(objects, missed, False, True)),
+    ):
+        elapsed, sent_bytes = result
+        rows.append([name, f"{elapsed * 1000:.2f}", f"{sent_bytes / 1024:,.1f}"])
+
+    print(f"{args.objects} objects, {args.missed} events missed")
+    print_table(["reconnect", "ms", "KiB sent"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
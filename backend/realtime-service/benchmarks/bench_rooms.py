@@ -0,0 +1,102 @@
+"""
+Join/leave latency and memory of the room index.
+
+1. Latency: 100k join/leave cycles against a room that already holds
+   --resident sockets, old list rebuild vs Room.
+2. Memory: 100k connect/disconnect cycles on distinct boards through the
+   real ConnectionManager, vs the old dict-of-lists that never freed rooms.
+
+    python benchmarks/bench_rooms.py [--cycles 100000] [--resident 1000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from common import FakeWebSocket, print_table
+from websocket_manager import ConnectionManager, Room
+
+
+def list_cycles(cycles, resident):
+    room = [(object(), uid % 50) for uid in range(resident)]
+    start = time.perf_counter()
+    for i in range(cycles):
+        websocket = object()
+        room.append((websocket, i % 50))
+        room = [(ws, uid) for ws, uid in room if ws != websocket]
+    return time.perf_counter() - start
+
+
+def room_cycles(cycles, resident):
+    room = Room()
+    for uid in range(resident):
+        room.add(SimpleNamespace(websocket=object(), user_id=uid % 50))
+    start = time.perf_counter()
+    for i in range(cycles):
+        connection = SimpleNamespace(websocket=object(), user_id=i % 50)
+        room.add(connection)
+        room.remove(connection.websocket)
+    assert len(room.users()) == 50
+    return time.perf_counter() - start
+
+
+def legacy_memory(cycles):
+    active_connections = {}
+    tracemalloc.start()
+    for board in range(cycles):
+        websocket = object()
+        active_connections.setdefault(board, []).append((websocket, 1))
+        active_connections[board] = [
+            (ws, uid) for ws, uid in active_connections[board] if ws != websocket
+        ]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(active_connections)
+
+
+async def manager_memory(cycles):
+    manager = ConnectionManager()
+    tracemalloc.start()
+    for board in range(cycles):
+        websocket = FakeWebSocket()
+        await manager.connect(websocket, board, 1)
+        await manager.disconnect(websocket, board, 1)
+        # Let the cancelled writer task unwind, as the event loop would.
+        await asyncio.sleep(0)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(manager.active_connections)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=100_000)
+    parser.add_argument("--resident", type=int, default=1000)
+    args = parser.parse_args()
+
+    list_time = list_cycles(args.cycles, args.resident)
+    room_time = room_cycles(args.cycles, args.resident)
+    print(f"{args.cycles} join/leave cycles, {args.resident} resident sockets")
+    print_table(
+        ["structure", "total s", "us/cycle"],
+        [
+            ["list rebuild", f"{list_time:.3f}", f"{list_time / args.cycles * 1e6:.2f}"],
+            ["Room", f"{room_time:.3f}", f"{room_time / args.cycles * 1e6:.2f}"],
+        ],
+    )
+
+    legacy_bytes, legacy_rooms = legacy_memory(args.cycles)
+    room_bytes, live_rooms = asyncio.run(manager_memory(args.cycles))
+    print(f"\n{args.cycles} connect/disconnect cycles on distinct boards")
+    print_table(
+        ["manager", "rooms left", "retained KiB"],
+        [
+            ["dict of lists", legacy_rooms, f"{legacy_bytes / 1024:.0f}"],
+            ["ConnectionManager", live_rooms, f"{room_bytes / 1024:.0f}"],
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput of serve.py from 1 to N worker processes.
+
+For each worker count, starts `serve.py --workers N` and drives it with
+--generators loadgen processes that split the rooms between them. The
+offered load stays the same for every count, so the numbers show what extra
+cores buy: frames delivered per second, fan-out latency, and the server's
+CPU use across the front process and its workers. Pick a load that
+saturates one worker, and enough generators to keep their own CPU under
+about 80%, otherwise this measures the generators. A worker count of 0 runs
+plain `uvicorn main:app` for comparison.
+
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--generators 2] [--rooms 40] [--clients 10] [--rate 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import print_table
+from loadgen import process_tree, spawn_server
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def cpu_seconds(pid):
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except OSError:
+            pass
+    return total / CLOCK_TICKS
+
+
+def run_generators(args, url, workdir):
+    per_generator = -(-args.rooms // args.generators)
+    processes, outputs = [], []
+    for index in range(args.generators):
+        rooms = min(per_generator, args.rooms - index * per_generator)
+        if rooms <= 0:
+            break
+        output = os.path.join(workdir, f"gen{index}.json")
+        outputs.append(output)
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(SERVICE_DIR, "benchmarks", "loadgen.py"),
+            "--url", url, "--secret", args.secret,
+            "--rooms", str(rooms), "--room-offset", str(index * per_generator),
+            "--clients", str(args.clients), "--rate", str(args.rate),
+            "--duration", str(args.duration), "--warmup", str(args.warmup),
+            "--json", output,
+        ], cwd=SERVICE_DIR, stdout=subprocess.DEVNULL))
+    for process in processes:
+        process.wait()
+    results = []
+    for output in outputs:
+        with open(output) as f:
+            results.append(json.load(f))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default=",".join(str(n) for n in range(1, (os.cpu_count() or 1) + 1)))
+    parser.add_argument("--generators", type=int, default=1)
+    parser.add_argument("--rooms", type=int, default=40)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--secret", default=os.environ.get("JWT_SECRET", "benchmark-secret-not-for-production"))
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores; {args.rooms} rooms x {args.clients} clients at {args.rate}/s each, "
+          f"{args.generators} generator(s)")
+    rows = []
+    for workers in (int(n) for n in args.workers.split(",")):
+        process, url = spawn_server(args.secret, workers)
+        try:
+            with tempfile.TemporaryDirectory() as workdir:
+                cpu_before, started = cpu_seconds(process.pid), time.perf_counter()
+                results = run_generators(args, url, workdir)
+                server_cpu = (cpu_seconds(process.pid) - cpu_before) / (time.perf_counter() - started)
+        finally:
+            process.terminate()
+            process.wait()
+
+        delivered = sum(result["received_per_s"] for result in results)
+        rows.append([
+            workers or "uvicorn",
+            f"{sum(result['sent_per_s'] for result in results):,.0f}",
+            f"{delivered:,.0f}",
+            f"{max(result['fanout_ms']['p50'] for result in results):.1f}",
+            f"{max(result['fanout_ms']['p99'] for result in results):.1f}",
+            f"{server_cpu * 100:.0f}%",
+            f"{max(result['loadgen_cpu_pct'] for result in results):.0f}%",
+            sum(result["errors"] for result in results),
+        ])
+
+    print_table(["workers", "sent/s", "delivered/s", "fanout p50 ms", "fanout p99 ms",
+                 "server cpu", "loadgen cpu", "errors"], rows)
+
+
+if __name__ == "__main__":
+    main()
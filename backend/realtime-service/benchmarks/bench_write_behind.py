@@ -0,0 +1,95 @@
+"""
+Board-service write load for a simulated 20-user session: one PATCH per
+edit (current REST path) vs the realtime write-behind buffer.
+
+Each user alternates one second of dragging one of their objects (30
+object_updated events/s) with a second of idling, and deletes an object
+every ten seconds. The session runs on a simulated clock against a fake
+board-service client that counts bulk requests and rows.
+
+    python benchmarks/bench_write_behind.py [--users 20] [--seconds 60] [--flush-ms 500]
+"""
+import argparse
+import asyncio
+import random
+
+from common import print_table
+from persister import WriteBehindBuffer
+
+
+class CountingBoardClient:
+    def __init__(self):
+        self.requests = 0
+        self.rows = 0
+
+    async def bulk_update(self, updates, user_id):
+        self.requests += 1
+        self.rows += len(updates)
+        return {"updated": updates}
+
+    async def bulk_delete(self, ids, user_id):
+        self.requests += 1
+        self.rows += len(ids)
+        return {"deleted": ids}
+
+
+def session(users, seconds, rate_hz=30):
+    rng = random.Random(5)
+    events = []
+    for user in range(1, users + 1):
+        offset = rng.uniform(0, 1)
+        for second in range(seconds):
+            if (second + user) % 2:
+                continue
+            obj = user * 100 + rng.randint(0, 4)
+            for i in range(rate_hz):
+                events.append((second + offset + i / rate_hz, user, {
+                    "type": "object_updated",
+                    "payload": {"id": obj, "x": rng.uniform(0, 900), "y": rng.uniform(0, 600)},
+                }))
+            if second % 10 == 0:
+                events.append((second + offset + 0.99, user, {"type": "object_deleted", "id": user * 100 + 9}))
+    return sorted(events, key=lambda e: e[0])
+
+
+async def run(events, flush_interval, max_batch):
+    client = CountingBoardClient()
+    buffer = WriteBehindBuffer(client, flush_interval, max_batch)
+    next_flush = flush_interval
+    for t, user, message in events:
+        while t >= next_flush:
+            await buffer.flush()
+            next_flush += flush_interval
+        buffer.record(1, user, message)
+        if buffer.pending >= max_batch:
+            await buffer.flush()
+    await buffer.stop()
+    return client
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--flush-ms", type=int, default=500)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    events = session(args.users, args.seconds)
+    rest_qps = len(events) / args.seconds
+
+    rows = [["REST per edit", f"{rest_qps:.1f}", f"{rest_qps:.1f}"]]
+    for flush_ms in sorted({args.flush_ms, 250, 1000}):
+        client = await run(events, flush_ms / 1000, args.max_batch)
+        rows.append([
+            f"write-behind {flush_ms} ms",
+            f"{client.requests / args.seconds:.1f}",
+            f"{client.rows / args.seconds:.1f}",
+        ])
+
+    print(f"{args.users} users, {args.seconds} s, {len(events)} socket edits")
+    print_table(["mode", "write requests/s", "rows written/s"], rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
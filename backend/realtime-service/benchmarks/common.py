@@ -0,0 +1,60 @@
+"""Shared helpers for the realtime-service micro-benchmarks."""
+import asyncio
+import os
+import sys
+import time
+
+# Benchmarks are run from the service directory: `python benchmarks/<name>.py`
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+# Code shared between services, as main.py sets up.
+sys.path.append(os.path.join(os.path.dirname(SERVICE_DIR), "shared"))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-not-for-production")
+
+
+class FakeWebSocket:
+    """Stands in for a Starlette WebSocket; records when each frame was sent."""
+
+    def __init__(self, delay: float = 0.0, stalled: bool = False):
+        self.delay = delay
+        self.stalled = stalled
+        self.sent = []
+        self.closed = False
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        await self._send(data)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def _send(self, data):
+        if self.stalled:
+            await asyncio.Event().wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.sent.append((time.perf_counter(), data))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+        self.close_code = code
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).rjust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).rjust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,357 @@
+"""
+WebSocket load generator for realtime-service.
+
+Opens --rooms x --clients sockets against a running server (or one it
+starts itself with --spawn), each authenticated with a JWT minted from
+JWT_SECRET. Every client replays a mix of drags (object_updated), shape
+creates and freehand strokes at --rate messages/s. Each message carries its
+send time, so receivers on the same host measure fan-out latency directly.
+
+Reports connect latency, fan-out latency percentiles, messages/s in and out,
+the server's RSS (sampled from /proc, so --spawn or --server-pid on Linux)
+and the generator's own CPU use; near 100% it is measuring itself, so
+split the rooms over several generators with --room-offset. --json writes
+the results for later runs to --compare against.
+
+    python benchmarks/loadgen.py --spawn --rooms 10 --clients 20 --duration 20
+    python benchmarks/loadgen.py --url ws://localhost:8002 --server-pid 1234 --json run.json
+    python benchmarks/loadgen.py --spawn --compare run.json
+
+--spawn starts `uvicorn main:app` (or `serve.py --workers N` with --workers)
+with the ACL check and rate limits off, since no board-service is running
+and the point is to push the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+from jose import jwt
+
+from common import percentile, print_table
+from protocol import MSGPACK, SUBPROTOCOL_JSON, SUBPROTOCOL_MSGPACK
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OBJECT_EVENTS = {"object_created", "object_updated", "object_deleted"}
+DEFAULT_MIX = "updated=0.8,created=0.15,freehand=0.05"
+
+
+def mint_token(secret, user_id, lifetime=3600):
+    now = int(time.time())
+    return jwt.encode(
+        {"token_type": "access", "exp": now + lifetime, "iat": now, "jti": f"load-{user_id}", "user_id": user_id},
+        secret, algorithm="HS256",
+    )
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    return list(mix), list(mix.values())
+
+
+def make_message(kind, rng, user_id, seq):
+    sent_at = time.time()
+    if kind == "updated":
+        return {"type": "object_updated", "payload": {
+            "id": user_id * 1000 + rng.randint(0, 9),
+            "x": round(rng.uniform(0, 1600), 2), "y": round(rng.uniform(0, 900), 2),
+            "sent_at": sent_at, "sender": user_id,
+        }}
+    if kind == "created":
+        return {"type": "object_created", "payload": {
+            "id": user_id * 1_000_000 + seq, "object_type": rng.choice(["rectangle", "circle", "text"]),
+            "x": round(rng.uniform(0, 1600), 2), "y": round(rng.uniform(0, 900), 2),
+            "width": 120, "height": 80, "color": "#3B82F6", "stroke_width": 2,
+            "sent_at": sent_at, "sender": user_id,
+        }}
+    if kind == "freehand":
+        return {"type": "object_created", "payload": {
+            "id": user_id * 1_000_000 + seq, "object_type": "freehand",
+            "x": round(rng.uniform(0, 1600), 2), "y": round(rng.uniform(0, 900), 2),
+            "color": "#EC4899", "stroke_width": 2,
+            "data": {"points": [round(rng.uniform(-150, 150), 1) for _ in range(200)]},
+            "sent_at": sent_at, "sender": user_id,
+        }}
+    raise ValueError(f"unknown message kind {kind!r}")
+
+
+class Stats:
+    def __init__(self):
+        self.connect_ms = []
+        self.fanout_ms = []
+        self.sent = 0
+        self.received = 0
+        self.bytes_in = 0
+        self.errors = 0
+        self.measuring = False
+
+
+def record_frame(stats, data, binary):
+    stats.bytes_in += len(data)
+    message = MSGPACK.decode(data) if binary else json.loads(data)
+    if message.get("type") == "ping":
+        return "ping"
+    messages = message.get("messages", []) if message.get("type") == "batch" else [message]
+    now = time.time()
+    for message in messages:
+        if message.get("type") not in OBJECT_EVENTS:
+            continue
+        payload = message.get("payload") or {}
+        stats.received += 1
+        if stats.measuring and "sent_at" in payload:
+            stats.fanout_ms.append((now - payload["sent_at"]) * 1000)
+
+
+async def client(args, stats, room, user_id, start_event, stop_at, kinds, weights):
+    rng = random.Random(user_id)
+    token = mint_token(args.secret, user_id)
+    url = f"{args.url}/ws/{room}?token={token}"
+    subprotocol = SUBPROTOCOL_MSGPACK if args.msgpack else SUBPROTOCOL_JSON
+
+    started = time.perf_counter()
+    try:
+        websocket = await websockets.connect(url, subprotocols=[subprotocol], max_size=None)
+    except Exception:
+        stats.errors += 1
+        return
+    stats.connect_ms.append((time.perf_counter() - started) * 1000)
+
+    pong = MSGPACK.encode({"type": "pong"}) if args.msgpack else json.dumps({"type": "pong"})
+
+    async def reader():
+        async for data in websocket:
+            if record_frame(stats, data, isinstance(data, bytes)) == "ping":
+                await websocket.send(pong)
+
+    reader_task = asyncio.create_task(reader())
+    try:
+        await start_event.wait()
+        await asyncio.sleep(rng.uniform(0, 1 / args.rate))
+        seq = 0
+        while time.perf_counter() < stop_at[0]:
+            message = make_message(rng.choices(kinds, weights)[0], rng, user_id, seq)
+            data = MSGPACK.encode(message) if args.msgpack else json.dumps(message)
+            await websocket.send(data)
+            stats.sent += 1
+            seq += 1
+            await asyncio.sleep(1 / args.rate)
+    except websockets.ConnectionClosed:
+        stats.errors += 1
+    finally:
+        await asyncio.sleep(0.5)
+        reader_task.cancel()
+        await websocket.close()
+
+
+def process_tree(pid):
+    """pid and its descendants, so a serve.py front counts its workers too."""
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as children:
+                pids.extend(int(child) for child in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def read_rss(pid):
+    total = None
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total = (total or 0) + int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+async def sample_rss(pid, samples, stop):
+    while not stop.is_set():
+        rss = read_rss(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(0.5)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(secret, workers=0):
+    port = free_port()
+    env = {
+        **os.environ,
+        "JWT_SECRET": secret,
+        "ACL_CHECK_ENABLED": "False",
+        "RATE_LIMIT_ENABLED": "False",
+    }
+    if workers:
+        command = ["serve.py", "--workers", str(workers)]
+    else:
+        command = ["-m", "uvicorn", "main:app"]
+    process = subprocess.Popen(
+        [sys.executable, *command, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIR, env=env,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process, f"ws://127.0.0.1:{port}"
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("the server did not come up")
+
+
+async def run(args):
+    kinds, weights = parse_mix(args.mix)
+    stats = Stats()
+    start_event = asyncio.Event()
+    stop_at = [float("inf")]
+
+    rss_samples = []
+    rss_stop = asyncio.Event()
+    rss_task = asyncio.create_task(sample_rss(args.server_pid, rss_samples, rss_stop)) if args.server_pid else None
+    rss_idle = read_rss(args.server_pid) if args.server_pid else None
+
+    tasks = []
+    for room in range(1, args.rooms + 1):
+        for index in range(args.clients):
+            user_id = room * 10_000 + index + 1
+            tasks.append(asyncio.create_task(
+                client(args, stats, args.room_offset + room, user_id, start_event, stop_at, kinds, weights)
+            ))
+            if args.connect_rate:
+                await asyncio.sleep(1 / args.connect_rate)
+
+    # Let the joins and their presence broadcasts settle before measuring.
+    await asyncio.sleep(1.0)
+    rss_connected = read_rss(args.server_pid) if args.server_pid else None
+    stop_at[0] = time.perf_counter() + args.warmup + args.duration
+    start_event.set()
+    await asyncio.sleep(args.warmup)
+    stats.measuring = True
+    sent_before, received_before, bytes_before = stats.sent, stats.received, stats.bytes_in
+    cpu_before = time.process_time()
+    await asyncio.sleep(args.duration)
+    loadgen_cpu = (time.process_time() - cpu_before) / args.duration
+    stats.measuring = False
+    sent, received, bytes_in = stats.sent - sent_before, stats.received - received_before, stats.bytes_in - bytes_before
+
+    await asyncio.gather(*tasks)
+    if rss_task:
+        rss_stop.set()
+        await rss_task
+
+    mib = 1024 * 1024
+    return {
+        "config": {
+            "rooms": args.rooms, "clients_per_room": args.clients, "rate_per_client": args.rate,
+            "duration_s": args.duration, "mix": args.mix, "codec": "msgpack" if args.msgpack else "json",
+        },
+        "connections": len(stats.connect_ms),
+        "errors": stats.errors,
+        "connect_ms": {p: round(percentile(stats.connect_ms, q), 3) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "fanout_ms": {p: round(percentile(stats.fanout_ms, q), 3) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "sent_per_s": round(sent / args.duration, 1),
+        "received_per_s": round(received / args.duration, 1),
+        "mib_in_per_s": round(bytes_in / args.duration / mib, 3),
+        # Near 100% means the generator, not the server, is the bottleneck.
+        "loadgen_cpu_pct": round(loadgen_cpu * 100, 1),
+        "server_rss_mib": {
+            "idle": round(rss_idle / mib, 1) if rss_idle else None,
+            "connected": round(rss_connected / mib, 1) if rss_connected else None,
+            "peak": round(max(rss_samples) / mib, 1) if rss_samples else None,
+        },
+    }
+
+
+def flatten(result, prefix=""):
+    rows = {}
+    for key, value in result.items():
+        if key == "config":
+            continue
+        if isinstance(value, dict):
+            rows.update(flatten(value, f"{prefix}{key}."))
+        else:
+            rows[f"{prefix}{key}"] = value
+    return rows
+
+
+def report(result, baseline=None):
+    current = flatten(result)
+    previous = flatten(baseline) if baseline else {}
+    rows = []
+    for key, value in current.items():
+        row = [key, "-" if value is None else value]
+        if baseline:
+            before = previous.get(key)
+            row.append("-" if before is None else before)
+            row.append(f"{(value - before) / before * 100:+.1f}%" if before and value is not None else "-")
+        rows.append(row)
+    headers = ["metric", "value"] + (["baseline", "change"] if baseline else [])
+    print(json.dumps(result["config"]))
+    print_table(headers, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8002")
+    parser.add_argument("--spawn", action="store_true", help="start a local uvicorn main:app for the run")
+    parser.add_argument("--workers", type=int, default=0, help="with --spawn, run serve.py with this many workers")
+    parser.add_argument("--server-pid", type=int, help="pid to sample RSS from (children included)")
+    parser.add_argument("--secret", default=os.environ.get("JWT_SECRET"))
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=10, help="clients per room")
+    parser.add_argument("--rate", type=float, default=10, help="messages/s per client")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--connect-rate", type=float, default=200, help="new sockets/s, 0 for all at once")
+    parser.add_argument("--room-offset", type=int, default=0, help="first whiteboard id - 1")
+    parser.add_argument("--msgpack", action="store_true")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to diff against")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("JWT_SECRET or --secret is required")
+
+    process = None
+    if args.spawn:
+        process, args.url = spawn_server(args.secret, args.workers)
+        args.server_pid = process.pid
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
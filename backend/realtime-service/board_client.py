@@ -0,0 +1,78 @@
+from typing import Dict, Iterable, List, Optional
+import httpx
+
+
+class BoardServiceError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        # HTTP status board-service answered with; None if it never answered.
+        self.status = status
+
+
+class BoardServiceClient:
+    """
+    Pooled async HTTP client for board-service.
+
+    One instance is shared by the whole process so connections are reused
+    across joins instead of being opened per request.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 5.0, max_connections: int = 20,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, service_token: str = ""):
+        self.service_token = service_token
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+
+    async def get_objects(self, whiteboard_id: int, token: str) -> List[dict]:
+        response = await self.http.get(
+            "/api/canvas/objects/",
+            params={"whiteboard": whiteboard_id},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        if response.status_code != 200:
+            raise BoardServiceError(
+                f"Loading objects for whiteboard {whiteboard_id} failed: {response.status_code}", response.status_code,
+            )
+        return response.json()
+
+    def _acting_as(self, user_id: int) -> dict:
+        """Headers for a call made on a user's behalf with the service token."""
+        return {"X-Service-Token": self.service_token, "X-Acting-User": str(user_id)}
+
+    async def bulk_update(self, updates: List[dict], user_id: int) -> dict:
+        response = await self.http.post(
+            "/api/canvas/objects/bulk_update/",
+            json={"updates": updates},
+            headers=self._acting_as(user_id),
+        )
+        if response.status_code != 200:
+            raise BoardServiceError(f"Bulk update failed: {response.status_code}", response.status_code)
+        return response.json()
+
+    async def bulk_delete(self, ids: List[int], user_id: int) -> dict:
+        response = await self.http.post(
+            "/api/canvas/objects/bulk_delete/",
+            json={"ids": ids},
+            headers=self._acting_as(user_id),
+        )
+        if response.status_code != 200:
+            raise BoardServiceError(f"Bulk delete failed: {response.status_code}", response.status_code)
+        return response.json()
+
+    async def get_acls(self, whiteboard_ids: Iterable[int]) -> Dict[int, dict]:
+        """Access lists of the given boards, keyed by id; unknown boards are left out."""
+        response = await self.http.get(
+            "/api/boards/internal/acl/",
+            params={"ids": ",".join(str(board) for board in whiteboard_ids)},
+            headers={"X-Service-Token": self.service_token},
+        )
+        if response.status_code != 200:
+            raise BoardServiceError(f"Loading access lists failed: {response.status_code}", response.status_code)
+        return {board["id"]: board for board in response.json()}
+
+    async def close(self):
+        await self.http.aclose()
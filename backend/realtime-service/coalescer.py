@@ -0,0 +1,136 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+from protocol import Frame
+from lww import STAMP_KEY, parse_stamp, supersedes
+import asyncio
+
+MIN_WINDOW_MS = 16
+MAX_WINDOW_MS = 50
+
+
+def clamp_window(window_ms: float) -> float:
+    if window_ms <= 0:
+        return 0
+    return max(MIN_WINDOW_MS, min(MAX_WINDOW_MS, window_ms))
+
+
+def object_id(message: dict):
+    """The id of the object an event is about, or None if it has no usable one."""
+    payload = message.get("payload")
+    if isinstance(payload, dict) and "id" in payload:
+        key = payload["id"]
+    else:
+        key = message.get("id")
+    # Ids key dicts here and in room state and write-behind; anything else
+    # (a list, an object) would not even hash.
+    if isinstance(key, (int, str)) and not isinstance(key, bool):
+        return key
+    return None
+
+
+def update_payload(message: dict) -> Optional[dict]:
+    """The payload of an object_updated message, or None if it has none to merge."""
+    payload = message.get("payload")
+    return payload if isinstance(payload, dict) else None
+
+
+def _edited_fields(payload: dict) -> dict:
+    return {key: value for key, value in payload.items() if key not in ("id", STAMP_KEY)}
+
+
+class PendingEvent:
+    __slots__ = ("frame", "exclude_user", "merged")
+
+    def __init__(self, frame: Frame, exclude_user: Optional[int]):
+        self.frame = frame
+        self.exclude_user = exclude_user
+        self.merged = False
+
+    def can_absorb(self, message: dict) -> bool:
+        """
+        Unversioned updates always merge. A versioned one only replaces a
+        pending update it fully supersedes, since a merged frame has a
+        single stamp and must not date older fields as newer.
+        """
+        old = self.frame.get_message()["payload"]
+        new = message["payload"]
+        old_stamp, new_stamp = parse_stamp(old.get(STAMP_KEY)), parse_stamp(new.get(STAMP_KEY))
+        if old_stamp is None and new_stamp is None:
+            return True
+        if old_stamp is None or new_stamp is None:
+            return False
+        return supersedes(_edited_fields(new), new_stamp, _edited_fields(old), old_stamp)
+
+    def merge(self, frame: Frame, message: dict, exclude_user: Optional[int]):
+        if STAMP_KEY in message["payload"]:
+            # The older edit is dropped, so only the newer one's sender can be skipped.
+            self.frame, self.merged, self.exclude_user = frame, False, exclude_user
+            return
+        if not self.merged:
+            # Copy before the first merge; until then the original bytes are relayed.
+            original = self.frame.get_message()
+            self.frame = Frame({**original, "payload": dict(original["payload"])})
+            self.merged = True
+        self.frame.message["payload"].update(message["payload"])
+        if self.exclude_user != exclude_user:
+            # Several senders touched it; everyone needs the merge.
+            self.exclude_user = None
+
+
+class UpdateCoalescer:
+    """
+    Collects one room's client events for a short window and hands them to
+    `flush` as a single ordered batch.
+
+    Successive object_updated events for the same object are merged field by
+    field into the first pending entry, so peers only see the latest values.
+    Versioned edits (see shared/lww.py) only replace an entry they fully
+    supersede and are otherwise queued after it.
+    Any other event (create, delete, ...) is kept in place, undecoded, and
+    ends every merge run, so no update is ever moved across it.
+    """
+
+    def __init__(self, window_ms: float, flush: Callable[[List[PendingEvent]], Awaitable[None]]):
+        self.window = window_ms / 1000
+        self.flush = flush
+        self.pending: List[PendingEvent] = []
+        self.latest: Dict[object, PendingEvent] = {}
+        self.received = 0
+        self._timer: Optional[asyncio.Task] = None
+
+    def add(self, frame: Frame, exclude_user: Optional[int] = None):
+        self.received += 1
+        event = None
+
+        if frame.message_type == "object_updated":
+            message = frame.get_message()
+            # Updates without a payload dict are relayed as they are, never merged.
+            key = object_id(message) if update_payload(message) is not None else None
+            if key is not None:
+                event = self.latest.get(key)
+                if event is not None and event.can_absorb(message):
+                    event.merge(frame, message, exclude_user)
+                    return
+
+                event = PendingEvent(frame, exclude_user)
+                self.latest[key] = event
+
+        if event is None:
+            event = PendingEvent(frame, exclude_user)
+            self.latest.clear()
+
+        self.pending.append(event)
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        events, self.pending, self.latest = self.pending, [], {}
+        if events:
+            await self.flush(events)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.pending, self.latest = [], {}
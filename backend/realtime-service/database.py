@@ -0,0 +1,31 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase
+from decouple import config
+
+DB_HOST = config("DB_HOST", default="localhost")
+DB_PORT = config("DB_PORT", default=5432, cast=int)
+DB_NAME = config("DB_NAME", default="realtime_db")
+DB_USER = config("DB_USER", default="postgres")
+DB_PASSWORD = config("DB_PASSWORD", default="postgres")
+DATABASE_URL = config(
+    "DATABASE_URL",
+    default=f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+def get_engine(url: str = DATABASE_URL) -> Engine:
+    if url.startswith("postgresql"):
+        # Only the journal writer thread and occasional reads use it.
+        return create_engine(url, pool_size=2, max_overflow=2, pool_pre_ping=True)
+    return create_engine(url)
+
+
+def init_db(engine: Engine):
+    """Create missing tables; the journal is append-only, so there are no migrations yet."""
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    Base.metadata.create_all(engine)
@@ -0,0 +1,267 @@
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "whiteboard"
+# Sorted set of every board stream, scored by the time of its last append.
+STREAMS_KEY = f"{STREAM_PREFIX}:streams"
+EVENT_LOG_MAXLEN = 10_000
+# Failed appends of the same event before it is dead-lettered.
+MAX_ATTEMPTS = 3
+
+# (whiteboard_id, frame JSON, sender, failed attempts)
+Pending = Tuple[int, str, int, int]
+
+
+def stream_key(whiteboard_id: int) -> str:
+    return f"{STREAM_PREFIX}:{whiteboard_id}:events"
+
+
+def board_of(key) -> int:
+    key = key.decode() if isinstance(key, bytes) else key
+    return int(key.split(":")[1])
+
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _entry(entry_id, fields) -> Tuple[str, str, int]:
+    # Field names are bytes unless the client was made with decode_responses=True.
+    data = fields.get(b"d", fields.get("d"))
+    sender = fields.get(b"u", fields.get("u"))
+    return _text(entry_id), _text(data), int(sender)
+
+
+class RedisEventLog:
+    """
+    Appends every relayed room event to a capped Redis Stream per board.
+
+    append() only buffers, so the broadcast path never waits on Redis. A
+    background task writes the buffer every `flush_interval` seconds, or as
+    soon as `max_batch` events are waiting, in one pipelined round trip.
+    Each entry is {"d": frame JSON, "u": sender}. The stream is trimmed to
+    about `maxlen` entries (MAXLEN ~, so Redis trims whole nodes), and the
+    board is recorded in STREAMS_KEY for consumers to find. If Redis is
+    unreachable, the buffer keeps at most `max_pending` events and the
+    oldest are dropped and counted.
+
+    The pipeline reports each command's outcome, so an event Redis itself
+    rejects (a key of the wrong type, a full instance refusing writes) is
+    retried alone, and after MAX_ATTEMPTS it is dead-lettered: logged,
+    counted and kept in `dead_letters` (the latest `max_dead_letters`).
+    The events around it are appended as usual.
+
+    `redis` is any `redis.asyncio.Redis`-compatible client, which includes
+    `fakeredis.aioredis.FakeRedis` for local testing.
+    """
+
+    def __init__(self, redis, maxlen: int = EVENT_LOG_MAXLEN, flush_interval: float = 0.05,
+                 max_batch: int = 500, max_pending: int = 100_000, max_dead_letters: int = 1000):
+        self.redis = redis
+        self.maxlen = maxlen
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending: List[Pending] = []
+        self.appended = 0
+        self.dropped = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.dead_letters: deque = deque(maxlen=max_dead_letters)
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            # Let a pipeline already sent finish rather than cancel it and
+            # append the same events again.
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def append(self, whiteboard_id: int, data: str, sender: Optional[int] = None):
+        self.pending.append((whiteboard_id, data, sender or 0, 0))
+        self._trim()
+        if len(self.pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def _trim(self):
+        if len(self.pending) > self.max_pending:
+            overflow = len(self.pending) - self.max_pending
+            del self.pending[:overflow]
+            self.dropped += overflow
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self.pending:
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                try:
+                    failed = await self._write(batch)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning("Event log append failed (%s); %d events kept for retry", e, len(batch))
+                    self._retry(batch)
+                    return
+                self.appended += len(batch) - len(failed)
+                retry = []
+                for (whiteboard_id, data, sender, attempts), error in failed:
+                    if attempts + 1 >= MAX_ATTEMPTS:
+                        self._dead_letter(whiteboard_id, data, sender, error)
+                    else:
+                        retry.append((whiteboard_id, data, sender, attempts + 1))
+                if retry:
+                    self.failures += 1
+                    logger.warning("Event log append failed for %d events (%s); kept for retry",
+                                   len(retry), failed[0][1])
+                    self._retry(retry)
+                    return
+
+    def _retry(self, batch: List[Pending]):
+        # Older than anything appended since; put them back in front.
+        self.pending[:0] = batch
+        self._trim()
+
+    def _dead_letter(self, whiteboard_id: int, data: str, sender: int, error: Exception):
+        self.dead_lettered += 1
+        self.dead_letters.append((whiteboard_id, data, sender))
+        logger.error("Event log entry dead-lettered after %d attempts (%s): whiteboard %s, sender %s, frame %r",
+                     MAX_ATTEMPTS, error, whiteboard_id, sender, data[:200])
+
+    async def _write(self, batch: List[Pending]) -> List[Tuple[Pending, Exception]]:
+        """Append a batch; returns the events Redis rejected, with its error for each."""
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        boards = {}
+        for whiteboard_id, data, sender, _ in batch:
+            pipe.xadd(stream_key(whiteboard_id), {"d": data, "u": sender}, maxlen=self.maxlen, approximate=True)
+            boards[stream_key(whiteboard_id)] = now
+        pipe.zadd(STREAMS_KEY, boards)
+        *results, indexed = await pipe.execute(raise_on_error=False)
+        if isinstance(indexed, Exception):
+            logger.warning("Could not record event log streams in %s: %s", STREAMS_KEY, indexed)
+        return [(entry, result) for entry, result in zip(batch, results) if isinstance(result, Exception)]
+
+    async def read(self, whiteboard_id: int, after: str = "0-0", count: int = 1000) -> List[Tuple[str, str, int]]:
+        """Entries after stream id `after`, oldest first, as (id, frame JSON, sender)."""
+        entries = await self.redis.xrange(stream_key(whiteboard_id), min=f"({after}", count=count)
+        return [_entry(entry_id, fields) for entry_id, fields in entries]
+
+
+Handler = Callable[[int, List[Tuple[str, str, int]]], Awaitable[None]]
+
+
+class EventLogConsumer:
+    """
+    Reads every board's stream as one member of a consumer group.
+
+    Each downstream worker (persister, thumbnailer, ...) uses its own
+    `group`; processes sharing a group split the boards' entries between
+    them. `handler(whiteboard_id, entries)` gets entries in stream order as
+    (id, frame JSON, sender), and they are acknowledged once it returns.
+    Entries it raised on, or left pending by a consumer that died, are
+    claimed again after `claim_idle` seconds. A new group starts from the
+    oldest entry still in each stream.
+    """
+
+    def __init__(self, redis, group: str, consumer: str, handler: Handler,
+                 count: int = 500, block: float = 1.0, claim_idle: float = 60.0, rescan: float = 5.0):
+        self.redis = redis
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.count = count
+        self.block = block
+        self.claim_idle = claim_idle
+        self.rescan = rescan
+        self.streams: Dict[str, str] = {}
+        self.processed = 0
+        self._scanned = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def discover(self):
+        """Join the group on any board stream that appeared since the last scan."""
+        for key in await self.redis.zrange(STREAMS_KEY, 0, -1):
+            key = _text(key)
+            if key in self.streams:
+                continue
+            try:
+                await self.redis.xgroup_create(key, self.group, id="0", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self.streams[key] = ">"
+        self._scanned = time.monotonic()
+
+    async def _run(self):
+        while True:
+            try:
+                if time.monotonic() - self._scanned >= self.rescan:
+                    await self.discover()
+                    await self.claim_stale()
+                if not await self.poll():
+                    await asyncio.sleep(self.block)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event log consumer %s/%s failed; retrying", self.group, self.consumer)
+                await asyncio.sleep(self.block)
+
+    async def poll(self) -> int:
+        """Read and handle one round of new entries; returns how many."""
+        if not self.streams:
+            return 0
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, self.streams, count=self.count, block=int(self.block * 1000),
+        )
+        handled = 0
+        for key, entries in response or []:
+            handled += await self._handle(_text(key), entries)
+        return handled
+
+    async def claim_stale(self):
+        for key in list(self.streams):
+            _, entries, *_ = await self.redis.xautoclaim(
+                key, self.group, self.consumer, min_idle_time=int(self.claim_idle * 1000), count=self.count,
+            )
+            if entries:
+                await self._handle(key, entries)
+
+    async def _handle(self, key: str, entries) -> int:
+        entries = [entry for entry in entries if entry[1]]  # trimmed while pending
+        if not entries:
+            return 0
+        parsed = [_entry(entry_id, fields) for entry_id, fields in entries]
+        await self.handler(board_of(key), parsed)
+        await self.redis.xack(key, self.group, *(entry_id for entry_id, _, _ in parsed))
+        self.processed += len(parsed)
+        return len(parsed)
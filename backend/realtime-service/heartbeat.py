@@ -0,0 +1,84 @@
+from typing import Optional
+from protocol import Frame
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 15.0
+HEARTBEAT_TIMEOUT = 45.0
+
+
+def queued_bytes(connection) -> int:
+    # asyncio.Queue keeps its items in a deque; nothing public exposes them.
+    return sum(len(data) for data in connection.queue._queue)
+
+
+class HeartbeatReaper:
+    """
+    Server-driven heartbeats that evict sockets which stopped answering.
+
+    Every `interval` seconds each socket is sent {"type": "ping"} and must
+    send something back (clients answer with {"type": "pong"}, but any frame
+    counts). A socket silent for longer than `timeout` is taken out of its
+    room, closed in the background and presence is rebroadcast, so a
+    half-open TCP connection stops collecting broadcasts within `timeout`
+    instead of whenever the kernel gives up on it.
+
+    Reaped sockets are counted, along with the frames and bytes that were
+    stuck in their send queues, which is what a zombie costs until reaped.
+    """
+
+    def __init__(self, manager, interval: float = HEARTBEAT_INTERVAL, timeout: float = HEARTBEAT_TIMEOUT,
+                 clock=time.monotonic):
+        self.manager = manager
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self.reaped = 0
+        self.reaped_frames = 0
+        self.reaped_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.beat()
+            except Exception:
+                logger.exception("Heartbeat pass failed")
+
+    async def beat(self):
+        """Reap silent sockets and ping the rest; returns how many were reaped."""
+        now = self.clock()
+        ping = Frame({"type": "ping"})
+        dead = []
+
+        for whiteboard_id, room in self.manager.active_connections.items():
+            for connection in room:
+                if now - connection.last_seen > self.timeout:
+                    dead.append((whiteboard_id, connection))
+                else:
+                    connection.enqueue(ping.encode(connection.codec))
+
+        rooms = set()
+        for whiteboard_id, connection in dead:
+            self.reaped += 1
+            self.reaped_frames += connection.queue.qsize()
+            self.reaped_bytes += queued_bytes(connection)
+            await self.manager.disconnect(connection.websocket, whiteboard_id, connection.user_id)
+            asyncio.create_task(connection.close(code=1001, reason="Heartbeat timeout"))
+            rooms.add(whiteboard_id)
+
+        for whiteboard_id in rooms:
+            await self.manager.broadcast_presence(whiteboard_id)
+        return len(dead)
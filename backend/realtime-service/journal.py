@@ -0,0 +1,227 @@
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import asyncio
+import io
+import logging
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+
+from models import RoomEvent
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("whiteboard_id", "created_at", "sender", "event_type", "payload")
+# Failed writes of the same batch before its bad rows are looked for.
+MAX_ATTEMPTS = 3
+# Clients pick the type, so a longer one is cut to fit the column rather
+# than failing (and dead-lettering) the row on Postgres.
+EVENT_TYPE_LENGTH = RoomEvent.__table__.c.event_type.type.length
+
+Row = Tuple[int, datetime, Optional[int], Optional[str], str]
+
+
+def unavailable(error: Exception) -> bool:
+    """Whether a write failed because the database could not be used, not because of the rows."""
+    # SQLAlchemy's wrappers and the DB-API errors themselves (psycopg2's COPY
+    # path, sqlite3) share these names.
+    return type(error).__name__ in ("OperationalError", "InterfaceError") or isinstance(error, OSError)
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return "\\N"
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    # COPY's text format gives these characters a meaning of their own.
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class EventJournal:
+    """
+    Journals relayed room events into realtime-db's room_events table.
+
+    append() only buffers, so the broadcast path never waits on the
+    database. A background task hands the buffer to a worker thread every
+    `flush_interval` seconds, or as soon as `max_batch` events are waiting,
+    and writes it in one transaction: COPY on Postgres, one executemany INSERT
+    elsewhere. An event is therefore committed within about one flush
+    interval plus one write; `lag` is how long the oldest event of the last
+    batch waited. If the database is unreachable, the buffer keeps at most
+    `max_pending` events and the oldest are dropped and counted.
+
+    A batch the database rejects for its contents (say, a frame with a NUL
+    character, which Postgres text cannot hold) is retried MAX_ATTEMPTS
+    times and then split in halves until the rows that fail on their own
+    are found. Those are dead-lettered: logged, counted and kept in
+    `dead_letters` (the latest `max_dead_letters`), and the rest is
+    written, so one bad event never holds up the ones behind it.
+    """
+
+    def __init__(self, engine: Engine, flush_interval: float = 0.2, max_batch: int = 1000,
+                 max_pending: int = 100_000, max_dead_letters: int = 1000):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.use_copy = engine.dialect.name == "postgresql"
+        self.pending: List[Tuple[float, Row]] = []
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.dead_letters: deque = deque(maxlen=max_dead_letters)
+        self.lag = 0.0
+        # Consecutive failed writes of the batch at the head of `pending`.
+        self._attempts = 0
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            # Let a write already in its thread finish rather than cancel
+            # the wait for it and write the same rows again.
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def append(self, whiteboard_id: int, data: str, sender: Optional[int] = None,
+               event_type: Optional[str] = None):
+        if event_type is not None:
+            event_type = event_type[:EVENT_TYPE_LENGTH]
+        self.pending.append((time.monotonic(), (
+            whiteboard_id, datetime.now(timezone.utc), sender, event_type, data,
+        )))
+        if len(self.pending) > self.max_pending:
+            overflow = len(self.pending) - self.max_pending
+            del self.pending[:overflow]
+            self.dropped += overflow
+        if len(self.pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            while self.pending:
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                rows = [row for _, row in batch]
+                try:
+                    await asyncio.to_thread(self._write, rows)
+                except Exception as e:
+                    self.failures += 1
+                    if not unavailable(e):
+                        self._attempts += 1
+                    if unavailable(e) or self._attempts < MAX_ATTEMPTS:
+                        logger.warning("Journal write failed (%s); %d events kept for retry", e, len(batch))
+                        self._retry(batch)
+                        return
+                    if not await self._write_isolating(batch):
+                        return
+                else:
+                    self.written += len(batch)
+                self._attempts = 0
+                self.lag = time.monotonic() - batch[0][0]
+
+    async def _write_isolating(self, batch: List[Tuple[float, Row]]) -> bool:
+        """
+        Write a batch that keeps failing, bisecting it to dead-letter the rows
+        that fail on their own. Returns False if the database became
+        unreachable on the way; what was not written is then kept for retry.
+        """
+        done: List[Row] = []
+        bad: List[Row] = []
+        try:
+            await asyncio.to_thread(self._bisect, [row for _, row in batch], done, bad)
+        except Exception as e:
+            handled = {id(row) for row in done + bad}
+            logger.warning("Journal write failed (%s) while isolating bad events", e)
+            self._retry([entry for entry in batch if id(entry[1]) not in handled])
+            return False
+        finally:
+            for row in bad:
+                self._dead_letter(row)
+            self.written += len(done)
+        return True
+
+    def _bisect(self, rows: List[Row], done: List[Row], bad: List[Row]):
+        try:
+            self._write(rows)
+            done.extend(rows)
+            return
+        except Exception as e:
+            if unavailable(e):
+                raise
+            if len(rows) == 1:
+                bad.extend(rows)
+                return
+        middle = len(rows) // 2
+        self._bisect(rows[:middle], done, bad)
+        self._bisect(rows[middle:], done, bad)
+
+    def _dead_letter(self, row: Row):
+        whiteboard_id, created_at, sender, event_type, payload = row
+        self.dead_lettered += 1
+        self.dead_letters.append(row)
+        logger.error("Journal event dead-lettered: whiteboard %s, sender %s, %s at %s, payload %r",
+                     whiteboard_id, sender, event_type, created_at.isoformat(), payload[:200])
+
+    def _retry(self, batch: List[Tuple[float, Row]]):
+        # Older than anything appended since; put them back in front.
+        self.pending[:0] = batch
+        if len(self.pending) > self.max_pending:
+            overflow = len(self.pending) - self.max_pending
+            del self.pending[:overflow]
+            self.dropped += overflow
+
+    def _write(self, rows: List[Row]):
+        if self.use_copy:
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write("\t".join(_copy_field(value) for value in row))
+                buffer.write("\n")
+            buffer.seek(0)
+            connection = self.engine.raw_connection()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.copy_expert(
+                        f"COPY {RoomEvent.__tablename__} ({', '.join(COLUMNS)}) FROM STDIN", buffer,
+                    )
+                connection.commit()
+            finally:
+                connection.close()
+        else:
+            with self.engine.begin() as connection:
+                connection.execute(insert(RoomEvent), [dict(zip(COLUMNS, row)) for row in rows])
+
+    async def read(self, whiteboard_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   limit: int = 1000) -> List[Tuple[int, datetime, Optional[int], str]]:
+        """A board's events in [start, end), oldest first, as (id, created_at, sender, frame JSON)."""
+        query = select(RoomEvent.id, RoomEvent.created_at, RoomEvent.sender, RoomEvent.payload) \
+            .where(RoomEvent.whiteboard_id == whiteboard_id)
+        if start is not None:
+            query = query.where(RoomEvent.created_at >= start)
+        if end is not None:
+            query = query.where(RoomEvent.created_at < end)
+        query = query.order_by(RoomEvent.created_at, RoomEvent.id).limit(limit)
+
+        def run():
+            with self.engine.connect() as connection:
+                return [tuple(row) for row in connection.execute(query)]
+        return await asyncio.to_thread(run)
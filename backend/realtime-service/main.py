@@ -1,10 +1,37 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
 from jose import JWTError, jwt
 import os
-import json
-from websocket_manager import ConnectionManager
+import sys
+import hmac
+import time
+import asyncio
+import logging
+
+# Code shared between services lives in backend/shared (/shared in the containers).
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shared"))
+
+from token_cache import TokenCache
+from websocket_manager import ConnectionManager, DECODED_EVENTS
+from protocol import Frame, MalformedFrame, negotiate, receive_frame
+from backplane import RedisBackplane
+from board_client import BoardServiceClient
+from acl import AclCache, VIEWER_EVENTS, can_edit
+from ratelimit import RateLimiter, RateLimits
+from heartbeat import HeartbeatReaper
+import metrics
+from room_state import RoomStateStore
+from replay import ReplayLog, REPLAY_BUFFER_SIZE, REPLAY_BUFFER_BYTES, REPLAY_MAX_ROOMS, REPLAY_IDLE_TTL
+from event_log import RedisEventLog, EVENT_LOG_MAXLEN
+from database import get_engine, init_db
+from journal import EventJournal
+from persister import WriteBehindBuffer, PERSISTED_EVENTS
 from decouple import config
+import redis.asyncio as aioredis
+
+logger = logging.getLogger("realtime")
 
 app = FastAPI(title="Realtime Collaboration Service")
 
@@ -20,44 +47,313 @@ manager = ConnectionManager()
 
 JWT_SECRET = config("JWT_SECRET")
 ALGORITHM = "HS256"
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", default=10_000, cast=int)
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+def verify_token(token: str) -> dict:
+    return jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+
+# "redis" relays broadcasts between nodes; empty keeps everything in-process.
+BACKPLANE = config("REALTIME_BACKPLANE", default="")
+REDIS_HOST = config("REDIS_HOST", default="localhost")
+REDIS_PORT = config("REDIS_PORT", default=6379, cast=int)
+
+BOARD_SERVICE_URL = config("BOARD_SERVICE_URL", default="http://localhost:8001")
+# Keep an in-memory object map per room and send joiners a snapshot.
+ROOM_STATE_ENABLED = config("ROOM_STATE_ENABLED", default=False, cast=bool)
+ROOM_STATE_MAX_OBJECTS = config("ROOM_STATE_MAX_OBJECTS", default=200_000, cast=int)
+# How long a room too big to keep is served over REST before it is refetched.
+ROOM_STATE_SKIP_TTL = config("ROOM_STATE_SKIP_TTL", default=60, cast=float)
+
+# Treat socket edits as the source of truth and persist them in bulk.
+WRITE_BEHIND_ENABLED = config("WRITE_BEHIND_ENABLED", default=False, cast=bool)
+WRITE_BEHIND_FLUSH_MS = config("WRITE_BEHIND_FLUSH_MS", default=500, cast=int)
+WRITE_BEHIND_MAX_BATCH = config("WRITE_BEHIND_MAX_BATCH", default=500, cast=int)
+
+# Shared secret for service-to-service calls between board- and realtime-service.
+INTERNAL_SERVICE_TOKEN = config("INTERNAL_SERVICE_TOKEN", default="")
+# Only let users with access to a board join its room, and only editors
+# change it. Access lists are loaded with the service token, so the check
+# is on by default only when one is set.
+ACL_CHECK_ENABLED = config("ACL_CHECK_ENABLED", default=bool(INTERNAL_SERVICE_TOKEN), cast=bool)
+ACL_CACHE_TTL = config("ACL_CACHE_TTL", default=60, cast=float)
+if ACL_CHECK_ENABLED and not INTERNAL_SERVICE_TOKEN:
+    raise RuntimeError("ACL_CHECK_ENABLED needs INTERNAL_SERVICE_TOKEN to load access lists from board-service")
+if not ACL_CHECK_ENABLED:
+    logger.warning("ACL_CHECK_ENABLED is off: any user with a valid token can join and edit any board")
+
+board_client = BoardServiceClient(BOARD_SERVICE_URL, service_token=INTERNAL_SERVICE_TOKEN)
+
+acl_cache = AclCache(board_client.get_acls, ACL_CACHE_TTL) if ACL_CHECK_ENABLED else None
+
+# Frames/s clients may send; "fast" is drags and cursors, "structural" the rest.
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", default=True, cast=bool)
+rate_limiter = RateLimiter(RateLimits(
+    fast_rate=config("RATE_LIMIT_FAST_PER_SEC", default=60, cast=float),
+    fast_burst=config("RATE_LIMIT_FAST_BURST", default=120, cast=float),
+    structural_rate=config("RATE_LIMIT_STRUCTURAL_PER_SEC", default=20, cast=float),
+    structural_burst=config("RATE_LIMIT_STRUCTURAL_BURST", default=200, cast=float),
+    room_fast_rate=config("RATE_LIMIT_ROOM_FAST_PER_SEC", default=1000, cast=float),
+    room_fast_burst=config("RATE_LIMIT_ROOM_FAST_BURST", default=2000, cast=float),
+    room_structural_rate=config("RATE_LIMIT_ROOM_STRUCTURAL_PER_SEC", default=300, cast=float),
+    room_structural_burst=config("RATE_LIMIT_ROOM_STRUCTURAL_BURST", default=1000, cast=float),
+    max_strikes=config("RATE_LIMIT_MAX_STRIKES", default=50, cast=int),
+    strike_window=config("RATE_LIMIT_STRIKE_WINDOW", default=10, cast=float),
+)) if RATE_LIMIT_ENABLED else None
+
+if ROOM_STATE_ENABLED:
+    manager.room_state = RoomStateStore(board_client.get_objects, ROOM_STATE_MAX_OBJECTS, ROOM_STATE_SKIP_TTL)
+
+# Events kept per room for ?since= catch-up after a reconnect; 0 turns it off.
+# A room's buffer also stops at REPLAY_BUFFER_BYTES, outlives the room by
+# REPLAY_IDLE_TTL seconds, and at most REPLAY_MAX_ROOMS rooms are kept.
+REPLAY_BUFFER_SIZE = config("REPLAY_BUFFER_SIZE", default=REPLAY_BUFFER_SIZE, cast=int)
+REPLAY_BUFFER_BYTES = config("REPLAY_BUFFER_BYTES", default=REPLAY_BUFFER_BYTES, cast=int)
+REPLAY_MAX_ROOMS = config("REPLAY_MAX_ROOMS", default=REPLAY_MAX_ROOMS, cast=int)
+REPLAY_IDLE_TTL = config("REPLAY_IDLE_TTL", default=REPLAY_IDLE_TTL, cast=float)
+if REPLAY_BUFFER_SIZE > 0:
+    manager.replay = ReplayLog(REPLAY_BUFFER_SIZE, REPLAY_MAX_ROOMS, REPLAY_BUFFER_BYTES, REPLAY_IDLE_TTL)
+
+# Ping every socket this often and drop those silent for longer than the timeout.
+HEARTBEAT_INTERVAL = config("HEARTBEAT_INTERVAL", default=15, cast=float)
+HEARTBEAT_TIMEOUT = config("HEARTBEAT_TIMEOUT", default=45, cast=float)
+heartbeat = HeartbeatReaper(manager, HEARTBEAT_INTERVAL, HEARTBEAT_TIMEOUT) if HEARTBEAT_INTERVAL > 0 else None
+
+# Append every relayed event to a capped Redis Stream per board, for
+# downstream consumers (see event_log.EventLogConsumer).
+EVENT_LOG_ENABLED = config("EVENT_LOG_ENABLED", default=False, cast=bool)
+EVENT_LOG_MAXLEN = config("EVENT_LOG_MAXLEN", default=EVENT_LOG_MAXLEN, cast=int)
+EVENT_LOG_FLUSH_MS = config("EVENT_LOG_FLUSH_MS", default=50, cast=int)
+
+# Journal relayed events into realtime-db (room_events) in batches.
+JOURNAL_ENABLED = config("JOURNAL_ENABLED", default=False, cast=bool)
+JOURNAL_FLUSH_MS = config("JOURNAL_FLUSH_MS", default=200, cast=int)
+JOURNAL_MAX_BATCH = config("JOURNAL_MAX_BATCH", default=1000, cast=int)
+
+def report_unpersisted(whiteboard_id: int, user_id: int, reason: str, ids: list):
+    # The edits were relayed but will not be saved; the client reloads the board.
+    manager.send_to_user(whiteboard_id, user_id, {"type": "persist_failed", "reason": reason, "ids": ids})
+
+persister = None
+if WRITE_BEHIND_ENABLED:
+    if not INTERNAL_SERVICE_TOKEN:
+        raise RuntimeError("WRITE_BEHIND_ENABLED needs INTERNAL_SERVICE_TOKEN to write edits to board-service")
+    persister = WriteBehindBuffer(board_client, WRITE_BEHIND_FLUSH_MS / 1000, WRITE_BEHIND_MAX_BATCH,
+                                  on_rejected=report_unpersisted)
+    manager.write_behind = True
+
+@app.on_event("startup")
+async def start_backplane():
+    if BACKPLANE == "redis":
+        redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+        manager.backplane = RedisBackplane(redis)
+        await manager.backplane.start(manager.relay_remote)
+
+@app.on_event("startup")
+async def start_event_log():
+    if EVENT_LOG_ENABLED:
+        redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+        manager.event_log = RedisEventLog(redis, EVENT_LOG_MAXLEN, EVENT_LOG_FLUSH_MS / 1000)
+        manager.event_log.start()
+
+@app.on_event("startup")
+async def start_journal():
+    if JOURNAL_ENABLED:
+        engine = get_engine()
+        await asyncio.to_thread(init_db, engine)
+        manager.journal = EventJournal(engine, JOURNAL_FLUSH_MS / 1000, JOURNAL_MAX_BATCH)
+        manager.journal.start()
+
+@app.on_event("startup")
+async def start_persister():
+    if persister:
+        persister.start()
+
+@app.on_event("startup")
+async def start_heartbeat():
+    if heartbeat:
+        heartbeat.start()
+
+@app.on_event("shutdown")
+async def stop_heartbeat():
+    if heartbeat:
+        heartbeat.stop()
+
+@app.on_event("shutdown")
+async def stop_backplane():
+    if manager.backplane:
+        await manager.backplane.stop()
+
+@app.on_event("shutdown")
+async def stop_event_log():
+    if manager.event_log:
+        await manager.event_log.stop()
+
+@app.on_event("shutdown")
+async def stop_journal():
+    if manager.journal:
+        await manager.journal.stop()
+        manager.journal.engine.dispose()
+
+@app.on_event("shutdown")
+async def stop_persister():
+    # Flush whatever is still buffered before the HTTP client goes away.
+    if persister:
+        await persister.stop()
+    await board_client.close()
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "realtime-service"}
 
+def _connections():
+    for room in manager.active_connections.values():
+        yield from room
+
+metrics.Gauge("realtime_connections", "Open client sockets on this node.",
+              lambda: sum(len(room) for room in manager.active_connections.values()))
+metrics.Gauge("realtime_rooms", "Boards with at least one socket on this node.",
+              lambda: len(manager.active_connections))
+metrics.Gauge("realtime_send_queue_depth", "Frames waiting in all send queues.",
+              lambda: sum(connection.queue.qsize() for connection in _connections()))
+metrics.Gauge("realtime_send_queue_depth_max", "Frames waiting in the fullest send queue.",
+              lambda: max((connection.queue.qsize() for connection in _connections()), default=0))
+metrics.Gauge("realtime_slow_consumers_dropped_total", "Sockets closed because their send queue was full.",
+              lambda: manager.dropped_connections, kind="counter")
+metrics.Gauge("realtime_token_cache_hits_total", "Handshake tokens found in the verified-token cache.",
+              lambda: token_cache.hits, kind="counter")
+metrics.Gauge("realtime_token_cache_misses_total", "Handshake tokens that had to be verified.",
+              lambda: token_cache.misses, kind="counter")
+metrics.Gauge("realtime_token_cache_size", "Verified tokens cached.", lambda: token_cache.stats()["size"])
+if BACKPLANE == "redis":
+    metrics.Gauge("realtime_backplane_publish_failures_total", "Broadcasts other nodes missed because Redis failed.",
+                  lambda: manager.backplane.publish_failures if manager.backplane else 0, kind="counter")
+    metrics.Gauge("realtime_backplane_bad_messages_total", "Backplane messages that could not be relayed.",
+                  lambda: manager.backplane.bad_messages if manager.backplane else 0, kind="counter")
+if EVENT_LOG_ENABLED:
+    metrics.Gauge("realtime_event_log_appended_total", "Events written to the board event streams.",
+                  lambda: manager.event_log.appended if manager.event_log else 0, kind="counter")
+    metrics.Gauge("realtime_event_log_dropped_total", "Events dropped while Redis was unreachable.",
+                  lambda: manager.event_log.dropped if manager.event_log else 0, kind="counter")
+    metrics.Gauge("realtime_event_log_dead_lettered_total", "Events Redis kept rejecting and were set aside.",
+                  lambda: manager.event_log.dead_lettered if manager.event_log else 0, kind="counter")
+if JOURNAL_ENABLED:
+    metrics.Gauge("realtime_journal_written_total", "Events committed to the room_events journal.",
+                  lambda: manager.journal.written if manager.journal else 0, kind="counter")
+    metrics.Gauge("realtime_journal_dropped_total", "Events dropped while realtime-db was unreachable.",
+                  lambda: manager.journal.dropped if manager.journal else 0, kind="counter")
+    metrics.Gauge("realtime_journal_dead_lettered_total", "Events the journal kept failing to write and set aside.",
+                  lambda: manager.journal.dead_lettered if manager.journal else 0, kind="counter")
+    metrics.Gauge("realtime_journal_lag_seconds", "How long the oldest event of the last journal batch waited.",
+                  lambda: manager.journal.lag if manager.journal else 0)
+if heartbeat:
+    metrics.Gauge("realtime_heartbeat_reaped_total", "Sockets closed for not answering heartbeats.",
+                  lambda: heartbeat.reaped, kind="counter")
+    metrics.Gauge("realtime_heartbeat_reaped_bytes_total", "Bytes stuck in reaped sockets' send queues.",
+                  lambda: heartbeat.reaped_bytes, kind="counter")
+if rate_limiter:
+    metrics.Gauge("realtime_rate_limited_frames_total", "Frames delayed for going over a socket's budget.",
+                  lambda: rate_limiter.throttled, kind="counter")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+class AclInvalidation(BaseModel):
+    whiteboard_id: int
+
+@app.post("/internal/acl/invalidate")
+async def invalidate_acl(body: AclInvalidation, x_service_token: str = Header("")):
+    if not INTERNAL_SERVICE_TOKEN or not hmac.compare_digest(x_service_token, INTERNAL_SERVICE_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid service token")
+    if acl_cache:
+        acl_cache.invalidate(body.whiteboard_id)
+    return {"status": "ok"}
+
 @app.websocket("/ws/{whiteboard_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     whiteboard_id: int,
-    token: str = Query(None)
+    token: str = Query(None),
+    since: int = Query(None),
+    epoch: str = Query(None)
 ):
     if not token:
+        metrics.JWT_FAILURES.inc()
         await websocket.close(code=1008, reason="Missing token")
         return
 
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+        payload = token_cache.get_or_verify(token, verify_token)
         user_id = payload.get("user_id")
         if not user_id:
             raise JWTError()
     except JWTError as e:
+        metrics.JWT_FAILURES.inc()
         await websocket.close(code=1008, reason="Invalid token")
         return
 
-    await manager.connect(websocket, whiteboard_id, user_id)
+    level = None
+    if acl_cache:
+        try:
+            level = await acl_cache.level_for(whiteboard_id, user_id)
+        except Exception:
+            await websocket.close(code=1011, reason="Permission check failed")
+            return
+        if level is None:
+            await websocket.close(code=1008, reason="Access denied")
+            return
+
+    subprotocol = negotiate(websocket.headers.get("sec-websocket-protocol"))
+    connection = await manager.connect(websocket, whiteboard_id, user_id, subprotocol, token, since, epoch)
+
+    limiter = rate_limiter.connection(whiteboard_id) if rate_limiter else None
+    # Without the ACL check everyone who may join may edit.
+    read_only = acl_cache is not None and not can_edit(level)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            await manager.broadcast(whiteboard_id, message, exclude_user=user_id)
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            connection.last_seen = time.monotonic()
+            try:
+                frame, error = receive_frame(event, DECODED_EVENTS), None
+            except MalformedFrame as e:
+                frame, error = None, str(e)
+            message_type = frame.message_type if frame else None
+            metrics.MESSAGES_IN.inc(message_type)
+            metrics.BYTES_IN.inc(len(event.get("text") or event.get("bytes") or ""))
+            if message_type == "pong":
+                continue
+
+            if limiter and not await limiter.admit(message_type):
+                await manager.disconnect(websocket, whiteboard_id, user_id)
+                await websocket.close(code=1008, reason="Rate limit exceeded")
+                return
+
+            if frame is not None and read_only and message_type not in VIEWER_EVENTS:
+                frame, error = None, "View-only access"
+            if frame is None:
+                # Dropped rather than relayed; the sender is told why.
+                connection.enqueue(Frame({"type": "error", "reason": error}).encode(connection.codec))
+                continue
+
+            try:
+                await manager.relay(whiteboard_id, frame, user_id)
+            except MalformedFrame as e:
+                # Decoded or re-encoded on the way out and found unusable.
+                connection.enqueue(Frame({"type": "error", "reason": str(e)}).encode(connection.codec))
+                continue
+
+            if persister and frame.message_type in PERSISTED_EVENTS:
+                persister.record(whiteboard_id, user_id, frame.get_message())
     except WebSocketDisconnect:
-        manager.disconnect(websocket, whiteboard_id, user_id)
-
-        await manager.broadcast(
-            whiteboard_id,
-            {
-                "type": "online_users",
-                "users": manager.get_online_users(whiteboard_id)
-            }
-        )
\ No newline at end of file
+        pass
+    finally:
+        # Whatever ended the loop, the socket leaves its room.
+        if limiter:
+            limiter.close()
+        await manager.disconnect(websocket, whiteboard_id, user_id)
+        await manager.broadcast_presence(whiteboard_id)
@@ -0,0 +1,140 @@
+"""
+Minimal Prometheus text-format metrics for the realtime hot paths.
+
+Counters and histograms are plain Python numbers updated in place, without
+locks since everything runs on the event loop. A broadcast updates them
+once with its totals, not once per recipient. Gauges are computed by a
+callback when /metrics is scraped.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Label values for message types; anything else a client sends is "other",
+# so a client cannot blow up the number of series.
+MESSAGE_TYPES = {
+    "object_created", "object_updated", "object_deleted",
+    "cursor", "cursor_move", "cursors", "online_users",
+    "batch", "snapshot", "sync", "resync", "ping", "pong",
+}
+
+_REGISTRY: List["Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{value}"' for name, value in labels)
+    return "{" + inner + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        _REGISTRY.append(self)
+
+    def samples(self) -> Iterable[Tuple[str, Tuple[Tuple[str, str], ...], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, (), self.value
+
+
+class TypeCounter(Metric):
+    """Counter labelled by message type."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self.values: Dict[str, float] = {}
+
+    def inc(self, message_type: Optional[str], amount: float = 1):
+        if message_type not in MESSAGE_TYPES:
+            message_type = "other"
+        self.values[message_type] = self.values.get(message_type, 0) + amount
+
+    def samples(self):
+        for message_type, value in sorted(self.values.items()):
+            yield self.name, (("type", message_type),), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float]):
+        super().__init__(name, documentation)
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", (("le", f"{bound:g}"),), cumulative
+        yield f"{self.name}_bucket", (("le", "+Inf"),), self.count
+        yield f"{self.name}_sum", (), self.sum
+        yield f"{self.name}_count", (), self.count
+
+
+class Gauge(Metric):
+    """
+    A value read from `callback` at scrape time. kind="counter" exposes a
+    total that some other object already keeps.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        yield self.name, (), self.callback()
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+MESSAGES_IN = TypeCounter("realtime_messages_in_total", "Frames received from clients.")
+MESSAGES_OUT = TypeCounter("realtime_messages_out_total", "Frames queued to client sockets.")
+BYTES_IN = Counter("realtime_bytes_in_total", "Bytes received from clients.")
+BYTES_OUT = Counter("realtime_bytes_out_total", "Bytes queued to client sockets.")
+BROADCAST_SECONDS = Histogram(
+    "realtime_broadcast_duration_seconds",
+    "Time to fan one frame or batch out to a room's local sockets.",
+    (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+JWT_FAILURES = Counter("realtime_jwt_failures_total", "Socket connects refused for a missing or invalid token.")
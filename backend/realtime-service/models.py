@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base
+
+
+class RoomEvent(Base):
+    """One relayed room event, as the frame JSON the sender's peers received."""
+
+    __tablename__ = "room_events"
+
+    # BIGINT on Postgres; SQLite only autoincrements INTEGER primary keys.
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    whiteboard_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    sender: Mapped[Optional[int]] = mapped_column(Integer)
+    event_type: Mapped[Optional[str]] = mapped_column(String(32))
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+
+    __table_args__ = (
+        # Per-board time-range reads; id breaks ties within a flush.
+        Index("room_events_board_time", "whiteboard_id", "created_at", "id"),
+    )
@@ -0,0 +1,237 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from board_client import BoardServiceError
+from coalescer import object_id
+from lww import STAMP_KEY, merge, parse_stamps
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERSISTED_EVENTS = {"object_updated", "object_deleted"}
+MAX_ATTEMPTS = 3
+
+# Columns CanvasObjectUpdateSerializer accepts.
+UPDATABLE_FIELDS = {"x", "y", "width", "height", "color", "stroke_width", "z_index", "data"}
+
+# (whiteboard_id, user_id)
+BatchKey = Tuple[int, int]
+# Called as on_rejected(whiteboard_id, user_id, reason, ids) for edits that
+# will never be written.
+RejectedCallback = Callable[[int, int, str, List[int]], None]
+
+
+class UserBatch:
+    __slots__ = ("updates", "versions", "deletes", "attempts")
+
+    def __init__(self):
+        self.updates: Dict[int, dict] = {}
+        # Per object, the stamp of each versioned field in `updates`.
+        self.versions: Dict[int, Dict[str, list]] = {}
+        self.deletes: Set[int] = set()
+        self.attempts = 0
+
+    def item(self, key: int) -> dict:
+        item = {"id": key, **self.updates[key]}
+        if self.versions.get(key):
+            item[STAMP_KEY] = self.versions[key]
+        return item
+
+    def ids(self) -> List[int]:
+        return [*self.updates, *self.deletes]
+
+    def __len__(self):
+        return len(self.updates) + len(self.deletes)
+
+
+def _retryable(error: Exception) -> bool:
+    # No answer, a timeout, throttling or a server error may pass; any other
+    # 4xx (bad service token, malformed batch) will fail the same way again.
+    status = getattr(error, "status", None)
+    return not isinstance(error, BoardServiceError) or status is None or status in (408, 429) or status >= 500
+
+
+class WriteBehindBuffer:
+    """
+    Buffers socket edits and writes them to board-service in bulk.
+
+    Updates to the same object are merged until the next flush, versioned
+    fields last-writer-wins with their own stamps (see shared/lww.py), and a
+    delete discards that object's pending updates. Batches are grouped per
+    whiteboard and user and sent with the internal service token on that
+    user's behalf, so board-service still enforces each user's own
+    permissions however long ago they connected. A flush happens every
+    `flush_interval` seconds, as soon as `max_batch` objects are pending,
+    and on stop(). A batch that failed for a reason that may pass is merged
+    back under newer edits and retried up to MAX_ATTEMPTS times.
+
+    Edits that will never be written are logged and handed to
+    `on_rejected`: ids board-service reports as forbidden, not found or
+    invalid, whole batches it refused, and batches out of attempts.
+
+    Creates still go through REST, which is where object ids are assigned.
+    """
+
+    def __init__(self, client, flush_interval: float = 0.5, max_batch: int = 500,
+                 on_rejected: Optional[RejectedCallback] = None):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.on_rejected = on_rejected
+        self.batches: Dict[BatchKey, UserBatch] = {}
+        self.pending = 0
+        self.requests = 0
+        self.rows = 0
+        self.failures = 0
+        self.rejected = 0
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                # A flush cut short puts its unwritten batches back first.
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, whiteboard_id: int, user_id: int, message: dict):
+        key = object_id(message)
+        if key is None:
+            return
+
+        batch = self.batches.get((whiteboard_id, user_id))
+        if batch is None:
+            batch = self.batches[(whiteboard_id, user_id)] = UserBatch()
+        before = len(batch)
+
+        if message.get("type") == "object_deleted":
+            batch.updates.pop(key, None)
+            batch.versions.pop(key, None)
+            batch.deletes.add(key)
+        elif key not in batch.deletes:
+            payload = message.get("payload")
+            if not isinstance(payload, dict):
+                return
+            fields = {k: v for k, v in payload.items() if k in UPDATABLE_FIELDS}
+            if fields:
+                updates = batch.updates.setdefault(key, {})
+                stamps = parse_stamps(payload.get(STAMP_KEY))
+                if stamps is None:
+                    updates.update(fields)
+                    # Unstamped values get a fresh stamp from board-service.
+                    versions = batch.versions.get(key, {})
+                    for name in fields:
+                        versions.pop(name, None)
+                else:
+                    merge(updates, batch.versions.setdefault(key, {}), fields, stamps)
+
+        self.pending += len(batch) - before
+        if self.pending >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            batches, self.batches, self.pending = list(self.batches.items()), {}, 0
+            try:
+                while batches:
+                    key, batch = batches[0]
+                    await self._write(key, batch)
+                    batches.pop(0)
+            except asyncio.CancelledError:
+                # Stopped mid-flush: keep what was not written for the final drain.
+                for key, batch in batches:
+                    self._requeue(key, batch)
+                raise
+
+    async def _write(self, key: BatchKey, batch: UserBatch):
+        whiteboard_id, user_id = key
+        try:
+            if batch.updates:
+                result = await self.client.bulk_update([batch.item(obj) for obj in batch.updates], user_id)
+                self.requests += 1
+                self.rows += len(batch.updates)
+                # Written; a retry of the deletes must not send these again.
+                batch.updates, batch.versions = {}, {}
+                self._report(key, result, ("forbidden", "not_found", "invalid"))
+            if batch.deletes:
+                result = await self.client.bulk_delete(list(batch.deletes), user_id)
+                self.requests += 1
+                self.rows += len(batch.deletes)
+                batch.deletes = set()
+                self._report(key, result, ("forbidden", "not_found"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            batch.attempts += 1
+            if not _retryable(e):
+                logger.error("Write-behind flush for user %s on whiteboard %s refused (%s); %d objects dropped",
+                             user_id, whiteboard_id, e, len(batch))
+                self._reject(key, "refused", batch.ids())
+                return
+            if batch.attempts >= MAX_ATTEMPTS:
+                logger.error("Write-behind flush for user %s on whiteboard %s failed %d times (%s); "
+                             "%d objects dropped", user_id, whiteboard_id, batch.attempts, e, len(batch))
+                self._reject(key, "unavailable", batch.ids())
+                return
+            logger.warning("Write-behind flush for user %s on whiteboard %s failed (%s); retrying",
+                           user_id, whiteboard_id, e)
+            self._requeue(key, batch)
+
+    def _report(self, key: BatchKey, result, reasons: Iterable[str]):
+        if not isinstance(result, dict):
+            return
+        for reason in reasons:
+            ids = [item["id"] if isinstance(item, dict) else item for item in result.get(reason) or []]
+            if ids:
+                logger.warning("Write-behind: %d objects of user %s on whiteboard %s not written (%s): %s",
+                               len(ids), key[1], key[0], reason, ids[:20])
+                self._reject(key, reason, ids)
+
+    def _reject(self, key: BatchKey, reason: str, ids: List[int]):
+        self.rejected += len(ids)
+        if self.on_rejected:
+            self.on_rejected(key[0], key[1], reason, ids)
+
+    def _requeue(self, key: BatchKey, failed: UserBatch):
+        batch = self.batches.get(key)
+        if batch is None:
+            batch = self.batches[key] = UserBatch()
+        before = len(batch)
+        batch.attempts = max(batch.attempts, failed.attempts)
+
+        for obj, fields in failed.updates.items():
+            if obj in batch.deletes:
+                continue
+            newer = batch.updates.setdefault(obj, {})
+            versions = batch.versions.setdefault(obj, {})
+            stamps = failed.versions.get(obj, {})
+            for name, value in fields.items():
+                if name in newer and name not in versions:
+                    continue  # a newer unstamped value, stamped on arrival
+                if name in stamps:
+                    merge(newer, versions, {name: value}, tuple(stamps[name]))
+                elif name not in newer:
+                    newer[name] = value
+        for obj in failed.deletes:
+            batch.updates.pop(obj, None)
+            batch.versions.pop(obj, None)
+            batch.deletes.add(obj)
+
+        self.pending += len(batch) - before
@@ -0,0 +1,61 @@
+from typing import Awaitable, Callable, Dict, Optional
+from protocol import Frame
+import asyncio
+
+# Client -> server: {"type": "cursor", "payload": {"x": .., "y": .., ...}}
+CURSOR_EVENTS = {"cursor", "cursor_move"}
+# Server -> client: {"type": "cursors", "cursors": {"<user_id>": {...} | null}}
+CURSORS_FRAME = "cursors"
+
+CURSOR_TICK_MS = 50
+
+
+class CursorAggregator:
+    """
+    Lossy, latest-value-wins channel for live cursors.
+
+    Cursor frames are not relayed one by one. Each room keeps the latest
+    cursor of every user that moved since the last tick, and once per tick
+    the room gets one `cursors` frame with all of them, so a room of N
+    moving users costs N sockets x 1 frame per tick instead of N x N
+    messages. A user who left is sent as null so clients can drop the
+    cursor. Nothing here is ordered, coalesced with object events or
+    persisted; a frame that does not fit a socket's queue is skipped.
+    """
+
+    def __init__(self, send: Callable[[int, Frame], Awaitable[None]], tick_ms: float = CURSOR_TICK_MS):
+        self.send = send
+        self.tick = tick_ms / 1000
+        self.pending: Dict[int, Dict[int, Optional[dict]]] = {}
+        self.frames_sent = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, whiteboard_id: int, user_id: int, cursor: Optional[dict]):
+        self.pending.setdefault(whiteboard_id, {})[user_id] = cursor
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def remove(self, whiteboard_id: int, user_id: int):
+        self.update(whiteboard_id, user_id, None)
+
+    def drop_room(self, whiteboard_id: int):
+        self.pending.pop(whiteboard_id, None)
+
+    async def _run(self):
+        try:
+            while self.pending:
+                await asyncio.sleep(self.tick)
+                pending, self.pending = self.pending, {}
+                for whiteboard_id, cursors in pending.items():
+                    frame = Frame({
+                        "type": CURSORS_FRAME,
+                        "cursors": {str(user_id): cursor for user_id, cursor in cursors.items()},
+                    })
+                    self.frames_sent += 1
+                    await self.send(whiteboard_id, frame)
+        finally:
+            self._task = None
+
+    def cancel(self):
+        if self._task:
+            self._task.cancel()
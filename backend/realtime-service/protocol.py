@@ -0,0 +1,348 @@
+from array import array
+from typing import Collection, Dict, List, Optional, Union
+import json
+import re
+import sys
+
+import msgpack
+
+SUBPROTOCOL_JSON = "whiteboard.json"
+SUBPROTOCOL_MSGPACK = "whiteboard.msgpack"
+
+# MessagePack extension type for a packed little-endian float32 array.
+POINTS_EXT = 1
+
+
+def _pack_points(points):
+    packed = array("f", points)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return msgpack.ExtType(POINTS_EXT, packed.tobytes())
+
+
+def _unpack_points(code, data):
+    if code != POINTS_EXT:
+        raise ValueError(f"Unknown extension type {code}")
+    points = array("f")
+    points.frombytes(data)
+    if sys.byteorder != "little":
+        points.byteswap()
+    return points.tolist()
+
+
+def _json_map(pairs):
+    """
+    object_pairs_hook for decoded msgpack maps. Frames are re-encoded as JSON
+    for JSON peers, the event log, the journal and the backplane, so only
+    values JSON can carry are accepted: string keys and no raw bytes.
+    """
+    for key, value in pairs:
+        if not isinstance(key, str):
+            raise ValueError(f"Map key {key!r} is not a string")
+        if isinstance(value, bytes):
+            raise ValueError(f"Binary value for {key!r}")
+    return dict(pairs)
+
+
+def _json_array(items):
+    for item in items:
+        if isinstance(item, bytes):
+            raise ValueError("Binary value in array")
+    return items
+
+
+def _with_packed_points(message: dict) -> dict:
+    """Swap a flat numeric `payload.data.points` list for a packed array."""
+    payload = message.get("payload")
+    if not isinstance(payload, dict):
+        return message
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        return message
+    points = data.get("points")
+    if not isinstance(points, list) or not points or not isinstance(points[0], (int, float)):
+        return message
+    try:
+        packed = _pack_points(points)
+    except TypeError:
+        # Nested [[x, y], ...] points are sent as they are.
+        return message
+    return {**message, "payload": {**payload, "data": {**data, "points": packed}}}
+
+
+class JsonCodec:
+    name = "json"
+    subprotocol = SUBPROTOCOL_JSON
+    binary = False
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    subprotocol = SUBPROTOCOL_MSGPACK
+    binary = True
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(_with_packed_points(message))
+
+    def decode(self, data: bytes) -> dict:
+        return msgpack.unpackb(
+            data, ext_hook=_unpack_points, strict_map_key=False,
+            object_pairs_hook=_json_map, list_hook=_json_array,
+        )
+
+
+JSON = JsonCodec()
+MSGPACK = MsgpackCodec()
+
+CODECS = {
+    SUBPROTOCOL_JSON: JSON,
+    SUBPROTOCOL_MSGPACK: MSGPACK,
+}
+
+
+def negotiate(offered: Optional[str]) -> Optional[str]:
+    """
+    Pick a subprotocol from a Sec-WebSocket-Protocol header value.
+
+    MessagePack wins when offered; clients that offer nothing get plain JSON
+    and no subprotocol in the handshake response, exactly as before.
+    """
+    if not offered:
+        return None
+    choices = [p.strip() for p in offered.split(",")]
+    for subprotocol in (SUBPROTOCOL_MSGPACK, SUBPROTOCOL_JSON):
+        if subprotocol in choices:
+            return subprotocol
+    return None
+
+
+def codec_for(subprotocol: Optional[str]):
+    return CODECS.get(subprotocol, JSON)
+
+
+_JSON_TYPE = re.compile(r'\s*\{\s*"type"\s*:\s*"([A-Za-z0-9_]*)"')
+_MSGPACK_TYPE_KEY = b"\xa4type"
+
+
+def sniff_type(data: Union[str, bytes]) -> Optional[str]:
+    """
+    Read the message type from the start of an encoded frame without
+    decoding the rest. Returns None unless "type" is the first key, in which
+    case the caller has to fall back to a full decode.
+    """
+    if isinstance(data, str):
+        match = _JSON_TYPE.match(data)
+        return match.group(1) if match else None
+
+    if not data:
+        return None
+    if 0x80 <= data[0] <= 0x8f:
+        offset = 1
+    elif data[0] == 0xde:
+        offset = 3
+    else:
+        return None
+    if data[offset:offset + 5] != _MSGPACK_TYPE_KEY or len(data) <= offset + 5:
+        return None
+    header = data[offset + 5]
+    if not 0xa0 <= header <= 0xbf:
+        return None
+    start = offset + 6
+    try:
+        return data[start:start + (header & 0x1f)].decode()
+    except UnicodeDecodeError:
+        return None
+
+
+def _append_json_field(data: str, key: str, value) -> Optional[str]:
+    body = data.rstrip()
+    if not body.endswith("}"):
+        return None
+    body = body[:-1].rstrip()
+    separator = "" if body.endswith("{") else ", "
+    return f"{body}{separator}{json.dumps(key)}: {json.dumps(value)}}}"
+
+
+def _append_msgpack_field(data: bytes, key: str, value) -> Optional[bytes]:
+    if not data:
+        return None
+    header = data[0]
+    if 0x80 <= header <= 0x8e:
+        head, body = bytes([header + 1]), data[1:]
+    elif header == 0x8f:
+        head, body = b"\xde\x00\x10", data[1:]
+    elif header == 0xde and len(data) >= 3 and data[1:3] != b"\xff\xff":
+        head, body = b"\xde" + (int.from_bytes(data[1:3], "big") + 1).to_bytes(2, "big"), data[3:]
+    else:
+        return None
+    return head + body + msgpack.packb(key) + msgpack.packb(value)
+
+
+class MalformedFrame(ValueError):
+    """A client frame that is not an encoded object with a string "type"."""
+
+
+def receive_frame(event: dict, decode: Collection[str] = ()) -> "Frame":
+    """
+    Wrap an ASGI websocket.receive event. Frames whose type is in `decode`
+    are decoded and checked straight away; the rest are only checked as far
+    as Frame.validate can without decoding them.
+    """
+    if event.get("bytes") is not None:
+        frame = Frame.from_encoded(MSGPACK, event["bytes"])
+    else:
+        frame = Frame.from_encoded(JSON, event.get("text") or "")
+    frame.validate(decode)
+    return frame
+
+
+def _one_type_key(data: Union[str, bytes]) -> bool:
+    """
+    Whether a frame with a sniffed type can have no other "type" key, so the
+    type a peer decodes is the sniffed one. JSON escapes could spell the key
+    some other way, so a frame with any is not trusted either.
+    """
+    if isinstance(data, str):
+        return data.count('"type"') == 1 and "\\u" not in data and data.rstrip().endswith("}")
+    return data.count(_MSGPACK_TYPE_KEY) == 1
+
+
+class Frame:
+    """
+    A message and its wire encodings.
+
+    Each codec encodes the message at most once however many sockets in the
+    room use it. A frame received from a client keeps its original bytes, so
+    relaying it to peers on the same codec needs no re-encode, and it is
+    only decoded if something needs the message itself.
+    """
+
+    __slots__ = ("message", "_encoded", "_type")
+
+    def __init__(self, message: Optional[dict] = None, encoded: Optional[Dict[str, Union[str, bytes]]] = None):
+        self.message = message
+        self._encoded = encoded or {}
+        self._type = None
+
+    @classmethod
+    def from_encoded(cls, codec, data: Union[str, bytes]) -> "Frame":
+        return cls(encoded={codec.name: data})
+
+    @property
+    def message_type(self) -> Optional[str]:
+        if self._type is None:
+            if self.message is None:
+                self._type = sniff_type(next(iter(self._encoded.values())))
+            if self._type is None:
+                self._type = self.get_message()["type"]
+        return self._type
+
+    def validate(self, decode: Collection[str] = ()):
+        """
+        Raise MalformedFrame unless the frame is an object with a string
+        "type". A type sniffed from the first key is enough for the frame to
+        be relayed as it is, when no other "type" key could override it; any
+        other frame, or one whose type is in `decode`, is decoded now.
+        Frames relayed undecoded are decoded, and may still fail, if a peer
+        on another codec or a coalescing room needs the message.
+        """
+        data = next(iter(self._encoded.values()))
+        sniffed = sniff_type(data)
+        if sniffed is not None and sniffed not in decode and _one_type_key(data):
+            self._type = sniffed
+            return
+        self._type = self.get_message()["type"]
+
+    def get_message(self) -> dict:
+        if self.message is None:
+            name, data = next(iter(self._encoded.items()))
+            try:
+                message = CODECS_BY_NAME[name].decode(data)
+            except Exception as e:
+                raise MalformedFrame(f"Undecodable frame: {e}") from None
+            if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+                raise MalformedFrame('Frame must be an object with a string "type"')
+            self.message = message
+        return self.message
+
+    def encode(self, codec) -> Union[str, bytes]:
+        data = self._encoded.get(codec.name)
+        if data is None:
+            try:
+                data = codec.encode(self.get_message())
+            except (TypeError, ValueError, OverflowError) as e:
+                # e.g. a JSON integer too large for MessagePack.
+                raise MalformedFrame(f"Frame cannot be sent as {codec.name}: {e}") from None
+            self._encoded[codec.name] = data
+        return data
+
+    def size(self) -> int:
+        """Length of the encodings made so far, at least one of them."""
+        if not self._encoded:
+            self.encode(JSON)
+        return sum(len(data) for data in self._encoded.values())
+
+    def with_field(self, key: str, value) -> "Frame":
+        """
+        A copy with one top-level field set. Encodings are extended in place
+        rather than re-encoded; the field goes last, so it wins over a
+        client-sent key of the same name.
+        """
+        encoded = {}
+        for name, data in self._encoded.items():
+            append = _append_msgpack_field if CODECS_BY_NAME[name].binary else _append_json_field
+            spliced = append(data, key, value)
+            if spliced is not None:
+                encoded[name] = spliced
+
+        message = None
+        if self.message is not None or not encoded:
+            message = {**self.get_message(), key: value}
+        frame = Frame(message, encoded)
+        frame._type = self._type
+        return frame
+
+
+class BatchFrame(Frame):
+    """
+    A {"type": "batch", "messages": [...]} frame spliced together from the
+    child frames' own encodings, so relayed children are never re-encoded.
+    """
+
+    __slots__ = ("frames",)
+
+    def __init__(self, frames: List[Frame]):
+        super().__init__()
+        self.frames = frames
+        self._type = "batch"
+
+    def get_message(self) -> dict:
+        if self.message is None:
+            self.message = {"type": "batch", "messages": [f.get_message() for f in self.frames]}
+        return self.message
+
+    def encode(self, codec) -> Union[str, bytes]:
+        data = self._encoded.get(codec.name)
+        if data is not None:
+            return data
+
+        parts = [frame.encode(codec) for frame in self.frames]
+        if codec.binary:
+            data = (
+                b"\x82\xa4type\xa5batch\xa8messages"
+                + msgpack.Packer().pack_array_header(len(parts))
+                + b"".join(parts)
+            )
+        else:
+            data = '{"type": "batch", "messages": [' + ", ".join(parts) + "]}"
+        self._encoded[codec.name] = data
+        return data
+
+
+CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
@@ -0,0 +1,125 @@
+from typing import Callable, Dict, Optional, Tuple
+from presence import CURSOR_EVENTS
+import asyncio
+import time
+
+# High-rate events that clients stream while dragging or pointing.
+FAST_EVENTS = {"object_updated"} | CURSOR_EVENTS
+
+
+class TokenBucket:
+    """
+    Classic token bucket that may go into debt.
+
+    take() always takes a token and returns how long the caller should wait
+    for it, so several senders sharing a bucket are queued fairly instead of
+    racing for the next refill.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.updated = clock()
+
+    def take(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimits:
+    def __init__(self, fast_rate: float = 60, fast_burst: float = 120,
+                 structural_rate: float = 20, structural_burst: float = 200,
+                 room_fast_rate: float = 1000, room_fast_burst: float = 2000,
+                 room_structural_rate: float = 300, room_structural_burst: float = 1000,
+                 max_strikes: int = 50, strike_window: float = 10.0):
+        self.fast = (fast_rate, fast_burst)
+        self.structural = (structural_rate, structural_burst)
+        self.room_fast = (room_fast_rate, room_fast_burst)
+        self.room_structural = (room_structural_rate, room_structural_burst)
+        self.max_strikes = max_strikes
+        self.strike_window = strike_window
+
+
+class ConnectionLimiter:
+    """Budgets of one socket plus the shared budgets of its room."""
+
+    def __init__(self, limiter: "RateLimiter", whiteboard_id: int, room: Tuple[TokenBucket, TokenBucket]):
+        limits = limiter.limits
+        self.limiter = limiter
+        self.whiteboard_id = whiteboard_id
+        self.room_fast, self.room_structural = room
+        self.fast = TokenBucket(*limits.fast, clock=limiter.clock)
+        self.structural = TokenBucket(*limits.structural, clock=limiter.clock)
+        self.strikes = TokenBucket(limits.max_strikes / limits.strike_window, limits.max_strikes,
+                                   clock=limiter.clock)
+
+    async def admit(self, message_type: Optional[str]) -> bool:
+        """
+        Wait until the frame fits the budgets. Returns False once the socket
+        has been throttled more than max_strikes times in strike_window
+        seconds and should be disconnected.
+        """
+        if message_type in FAST_EVENTS:
+            own, room = self.fast, self.room_fast
+        else:
+            own, room = self.structural, self.room_structural
+
+        own_wait = own.take()
+        wait = max(own_wait, room.take())
+        if own_wait:
+            self.limiter.throttled += 1
+            if self.strikes.take():
+                self.limiter.disconnected += 1
+                return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+    def close(self):
+        self.limiter.release(self.whiteboard_id)
+
+
+class RateLimiter:
+    """
+    Token-bucket limits on frames clients send, per connection and per room.
+
+    Every socket has its own budget for fast events (FAST_EVENTS) and for
+    structural ones (creates, deletes and anything else), and every room has
+    a larger shared budget of each kind. A frame over budget is not dropped;
+    the receive loop waits until it fits, which pushes back on the client
+    through TCP and caps what one room can cost the event loop. Sockets that
+    stay over their own budget are disconnected.
+    """
+
+    def __init__(self, limits: RateLimits, clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self.rooms: Dict[int, Tuple[TokenBucket, TokenBucket]] = {}
+        self.room_refs: Dict[int, int] = {}
+        self.throttled = 0
+        self.disconnected = 0
+
+    def connection(self, whiteboard_id: int) -> ConnectionLimiter:
+        room = self.rooms.get(whiteboard_id)
+        if room is None:
+            room = self.rooms[whiteboard_id] = (
+                TokenBucket(*self.limits.room_fast, clock=self.clock),
+                TokenBucket(*self.limits.room_structural, clock=self.clock),
+            )
+        self.room_refs[whiteboard_id] = self.room_refs.get(whiteboard_id, 0) + 1
+        return ConnectionLimiter(self, whiteboard_id, room)
+
+    def release(self, whiteboard_id: int):
+        refs = self.room_refs.get(whiteboard_id, 0) - 1
+        if refs > 0:
+            self.room_refs[whiteboard_id] = refs
+        else:
+            self.room_refs.pop(whiteboard_id, None)
+            self.rooms.pop(whiteboard_id, None)
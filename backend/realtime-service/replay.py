@@ -0,0 +1,118 @@
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional, Tuple
+from protocol import Frame
+import time
+import uuid
+
+REPLAY_BUFFER_SIZE = 1024
+REPLAY_BUFFER_BYTES = 1 << 20
+REPLAY_MAX_ROOMS = 10_000
+REPLAY_IDLE_TTL = 300.0
+
+
+class RoomLog:
+    __slots__ = ("epoch", "seq", "events", "bytes")
+
+    def __init__(self):
+        # Sequence numbers are only comparable within one epoch; a new log
+        # (restart, eviction, another node) gets a new one.
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # (seq, sender, frame, size), oldest first.
+        self.events: deque = deque()
+        self.bytes = 0
+
+
+class ReplayLog:
+    """
+    Per-room sequence numbers plus a buffer of the latest events.
+
+    Every relayed event is stamped with the next `seq` of its room and kept
+    in a buffer of at most `size` events and `max_bytes` encoded bytes;
+    the oldest go first. A client that reconnects with the last seq (and
+    epoch) it saw gets just the events it missed from since(), or None when
+    they are no longer buffered and it has to resync from board-service.
+    A log outlives its room by `idle_ttl` seconds, so a client that was
+    alone in it can still catch up, and at most `max_rooms` logs are kept
+    (least recently used go first), so memory stays under about
+    max_rooms x max_bytes.
+    """
+
+    def __init__(self, size: int = REPLAY_BUFFER_SIZE, max_rooms: int = REPLAY_MAX_ROOMS,
+                 max_bytes: int = REPLAY_BUFFER_BYTES, idle_ttl: float = REPLAY_IDLE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self.rooms: "OrderedDict[int, RoomLog]" = OrderedDict()
+        # Rooms nobody is in, with the time the last socket left, oldest first.
+        self.idle: "OrderedDict[int, float]" = OrderedDict()
+
+    def _room(self, whiteboard_id: int) -> RoomLog:
+        self._expire()
+        self.idle.pop(whiteboard_id, None)
+        log = self.rooms.get(whiteboard_id)
+        if log is None:
+            log = self.rooms[whiteboard_id] = RoomLog()
+            while len(self.rooms) > self.max_rooms:
+                evicted, _ = self.rooms.popitem(last=False)
+                self.idle.pop(evicted, None)
+        self.rooms.move_to_end(whiteboard_id)
+        return log
+
+    def leave(self, whiteboard_id: int):
+        """The room's last socket on this node left; its log expires after idle_ttl."""
+        if whiteboard_id in self.rooms:
+            self.idle[whiteboard_id] = self.clock()
+            self.idle.move_to_end(whiteboard_id)
+        self._expire()
+
+    def _expire(self):
+        deadline = self.clock() - self.idle_ttl
+        while self.idle:
+            whiteboard_id, since = next(iter(self.idle.items()))
+            if since > deadline:
+                break
+            del self.idle[whiteboard_id]
+            self.rooms.pop(whiteboard_id, None)
+
+    def stamp(self, whiteboard_id: int, frame: Frame, sender: Optional[int]) -> Frame:
+        log = self._room(whiteboard_id)
+        log.seq += 1
+        stamped = frame.with_field("seq", log.seq)
+        size = stamped.size()
+        log.events.append((log.seq, sender, stamped, size))
+        log.bytes += size
+        while log.events and (len(log.events) > self.size or log.bytes > self.max_bytes):
+            log.bytes -= log.events.popleft()[3]
+        return stamped
+
+    def head(self, whiteboard_id: int) -> Tuple[str, int]:
+        log = self._room(whiteboard_id)
+        return log.epoch, log.seq
+
+    def since(self, whiteboard_id: int, seq: int, epoch: Optional[str],
+              user_id: Optional[int] = None) -> Optional[List[Frame]]:
+        """
+        Events after `seq`, leaving out the user's own (which were never
+        sent back to them), or None if the gap cannot be filled.
+        """
+        log = self._room(whiteboard_id)
+        if epoch != log.epoch or seq > log.seq:
+            return None
+        if seq == log.seq:
+            return []
+        oldest = log.events[0][0] if log.events else log.seq + 1
+        if seq + 1 < oldest:
+            return None
+
+        missed = []
+        for event_seq, sender, frame, _ in reversed(log.events):
+            if event_seq <= seq:
+                break
+            if sender is None or sender != user_id:
+                missed.append(frame)
+        missed.reverse()
+        return missed
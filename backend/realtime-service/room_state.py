@@ -0,0 +1,146 @@
+from typing import Awaitable, Callable, Dict, List, Optional
+from coalescer import object_id
+from lww import STAMP_KEY, merge, parse_stamps
+import asyncio
+import time
+
+STATE_EVENTS = {"object_created", "object_updated", "object_deleted"}
+
+
+class RoomState:
+    __slots__ = ("objects", "loaded", "lock", "pending", "connections")
+
+    def __init__(self):
+        self.objects: Dict[object, dict] = {}
+        self.loaded = False
+        self.lock = asyncio.Lock()
+        # Events seen while the initial load was in flight.
+        self.pending: List[dict] = []
+        self.connections = 0
+
+
+class RoomStateStore:
+    """
+    Authoritative in-memory object map per whiteboard.
+
+    A room is filled from board-service by its first joiner and then kept
+    current by the object events relayed through it, so later joiners get a
+    snapshot without a REST round trip. The state is dropped when the last
+    socket leaves: nothing keeps it current after that (REST-only edits,
+    the backplane subscription ends), so the next joiner loads it afresh.
+    A room that would take the total over `max_objects` is not kept, and
+    its joiners load over REST instead; for `skip_ttl` seconds after that
+    they do so without the store fetching the whole board again first.
+    """
+
+    def __init__(self, fetch: Callable[[int, str], Awaitable[List[dict]]], max_objects: int = 200_000,
+                 skip_ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.fetch = fetch
+        self.max_objects = max_objects
+        self.skip_ttl = skip_ttl
+        self.clock = clock
+        self.rooms: Dict[int, RoomState] = {}
+        # whiteboard_id -> when it may be fetched again, for rooms over the cap.
+        self.over_cap: Dict[int, float] = {}
+        self.total_objects = 0
+        self.skipped = 0
+
+    async def load(self, whiteboard_id: int, token: str) -> bool:
+        """Make sure the room is filled; returns False if it could not be."""
+        state = self.rooms.get(whiteboard_id)
+        if state is None:
+            state = self.rooms[whiteboard_id] = RoomState()
+        state.connections += 1
+        if state.loaded:
+            return True
+
+        async with state.lock:
+            if state.loaded:
+                return True
+            expires_at = self.over_cap.get(whiteboard_id)
+            if expires_at is not None:
+                if self.clock() < expires_at:
+                    self.skipped += 1
+                    state.pending.clear()
+                    return False
+                del self.over_cap[whiteboard_id]
+            try:
+                objects = await self.fetch(whiteboard_id, token)
+            except Exception:
+                state.pending.clear()
+                return False
+            if self.total_objects + len(objects) > self.max_objects:
+                self.skipped += 1
+                self._skip(whiteboard_id)
+                state.pending.clear()
+                return False
+
+            state.objects = {obj["id"]: obj for obj in objects if isinstance(obj, dict) and "id" in obj}
+            state.loaded = True
+            self.total_objects += len(state.objects)
+            for message in state.pending:
+                self._apply(state, message)
+            state.pending.clear()
+        return True
+
+    def _skip(self, whiteboard_id: int):
+        now = self.clock()
+        for key in [key for key, expires_at in self.over_cap.items() if expires_at <= now]:
+            del self.over_cap[key]
+        self.over_cap[whiteboard_id] = now + self.skip_ttl
+
+    def release(self, whiteboard_id: int):
+        state = self.rooms.get(whiteboard_id)
+        if state is None:
+            return
+        state.connections -= 1
+        if state.connections <= 0:
+            del self.rooms[whiteboard_id]
+            self.total_objects -= len(state.objects)
+
+    def snapshot(self, whiteboard_id: int) -> Optional[List[dict]]:
+        state = self.rooms.get(whiteboard_id)
+        if state is None or not state.loaded:
+            return None
+        return list(state.objects.values())
+
+    def apply(self, whiteboard_id: int, message: dict) -> bool:
+        """Track an object event; returns False for a versioned update that changed nothing."""
+        state = self.rooms.get(whiteboard_id)
+        if state is None:
+            return True
+        if not state.loaded:
+            if state.lock.locked():
+                state.pending.append(message)
+            return True
+        return self._apply(state, message)
+
+    def _apply(self, state: RoomState, message: dict) -> bool:
+        key = object_id(message)
+        if key is None:
+            return True
+
+        kind = message.get("type")
+        payload = message.get("payload")
+        if kind == "object_created":
+            # Frames without an object to store are relayed but not tracked.
+            if not isinstance(payload, dict):
+                return True
+            if key not in state.objects:
+                self.total_objects += 1
+            state.objects[key] = dict(payload)
+        elif kind == "object_updated":
+            obj = state.objects.get(key)
+            if obj is not None and isinstance(payload, dict):
+                stamps = parse_stamps(payload.get(STAMP_KEY))
+                if stamps is None:
+                    obj.update(payload)
+                else:
+                    fields = {k: v for k, v in payload.items() if k not in ("id", STAMP_KEY)}
+                    # Snapshots carry the versions, so joiners merge the same way.
+                    versions = obj.setdefault("versions", {})
+                    return bool(merge(obj, versions, fields, stamps))
+        elif kind == "object_deleted":
+            if state.objects.pop(key, None) is not None:
+                self.total_objects -= 1
+        return True
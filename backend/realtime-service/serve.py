@@ -0,0 +1,456 @@
+"""
+Production entry point: several uvicorn workers behind one port, with all of
+a whiteboard's sockets on the same worker.
+
+    python serve.py --host 0.0.0.0 --port 8002 --workers 4   # or REALTIME_WORKERS=4
+
+The front process accepts connections and peeks at the request line without
+reading it. A /ws/{whiteboard_id} socket is passed, as a file descriptor over
+a Unix socket, to the worker that owns the board on a consistent-hash ring.
+Frames never go through the front process, and a room's fan-out stays
+inside one worker without a backplane. POSTs under /internal/ (ACL
+invalidation) go to every worker, /metrics is merged from all of them with a
+worker label, and any other request goes to any worker.
+
+SIGTTIN adds a worker and SIGTTOU removes one. The old owners close the
+rooms that moved with 1012, and those clients reconnect to the new owner and
+catch up from a snapshot or a resync. A worker that dies is restarted in the
+same slot, so the ring does not change. Linux only (SCM_RIGHTS).
+"""
+from typing import Dict, List, Optional
+from ring import HashRing
+from decouple import config
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import re
+import signal
+import socket
+import sys
+
+logger = logging.getLogger("realtime.serve")
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# One worker unless asked for more: each worker keeps its own ACL cache,
+# room state, replay logs and buffers, and opens its own database and
+# board-service connections, so size this to the deployment, not the host.
+REALTIME_WORKERS = config("REALTIME_WORKERS", default=1, cast=int)
+
+WS_PATH = re.compile(rb"/ws/(\d+)")
+MAX_REQUEST_LINE = 8192
+MAX_REQUEST_HEAD = 65536
+REQUEST_TIMEOUT = 10.0
+WORKER_START_TIMEOUT = 60.0
+RESTART_DELAY = 1.0
+
+# Control messages between the front process and a worker, one per packet.
+MSG_SOCKET = b"S"  # front -> worker, with one client socket attached
+MSG_RING = b"R"    # front -> worker, followed by the JSON list of slots on the ring
+MSG_READY = b"K"   # worker -> front, once the app's startup events have run
+
+
+# ==================== WORKER ====================
+
+def _load_uvicorn():
+    import uvicorn
+
+    class WorkerServer(uvicorn.Server):
+        """A uvicorn server whose connections arrive over the control socket."""
+
+        def __init__(self, config, slot: int, control: socket.socket, manager):
+            super().__init__(config)
+            self.slot = slot
+            self.control = control
+            self.manager = manager
+
+        async def startup(self, sockets=None):
+            await super().startup(sockets=[])
+            if not self.started:
+                return
+            self.control.setblocking(False)
+            asyncio.get_running_loop().add_reader(self.control.fileno(), self._on_control)
+            self.control.send(MSG_READY)
+
+        async def shutdown(self, sockets=None):
+            asyncio.get_running_loop().remove_reader(self.control.fileno())
+            await super().shutdown(sockets=sockets)
+
+        def _protocol(self):
+            return self.config.http_protocol_class(
+                config=self.config, server_state=self.server_state, app_state=self.lifespan.state,
+            )
+
+        def _on_control(self):
+            loop = asyncio.get_running_loop()
+            while True:
+                try:
+                    message, fds, _, _ = socket.recv_fds(self.control, 65536, 16)
+                except BlockingIOError:
+                    return
+                if not message:
+                    # The front process is gone; nothing new can reach us.
+                    loop.remove_reader(self.control.fileno())
+                    self.should_exit = True
+                    return
+
+                kind = message[:1]
+                for fd in fds:
+                    sock = socket.socket(fileno=fd)
+                    if kind == MSG_SOCKET:
+                        loop.create_task(self._serve(sock))
+                    else:
+                        sock.close()
+                if kind == MSG_RING:
+                    loop.create_task(self._rebalance(json.loads(message[1:])))
+
+        async def _serve(self, sock: socket.socket):
+            sock.setblocking(False)
+            try:
+                await asyncio.get_running_loop().connect_accepted_socket(self._protocol, sock)
+            except OSError:
+                sock.close()
+
+        async def _rebalance(self, slots: List[int]):
+            ring = HashRing(slots)
+            moved = [wid for wid in list(self.manager.active_connections) if ring.owner(wid) != self.slot]
+            for whiteboard_id in moved:
+                await self.manager.close_room(whiteboard_id)
+            if moved:
+                logger.info("Worker %d handed off %d rooms", self.slot, len(moved))
+
+    return uvicorn, WorkerServer
+
+
+def run_worker(slot: int, control_fd: int, log_level: str):
+    uvicorn, WorkerServer = _load_uvicorn()
+    import main
+
+    control = socket.socket(fileno=control_fd)
+    server = WorkerServer(uvicorn.Config(main.app, log_level=log_level), slot, control, main.manager)
+    server.run()
+
+
+# ==================== FRONT PROCESS ====================
+
+class Worker:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.control: Optional[socket.socket] = None
+        self.ready = False
+        self.retired = False
+
+
+def add_worker_label(line: str, slot: int) -> str:
+    space = line.find(" ")
+    brace = line.find("{")
+    if 0 <= brace < space:
+        return f'{line[:brace]}{{worker="{slot}",{line[brace + 1:]}'
+    return f'{line[:space]}{{worker="{slot}"}}{line[space:]}'
+
+
+def merge_metrics(bodies: Dict[int, str]) -> str:
+    """Combine per-worker Prometheus text, keeping each metric's samples together."""
+    families: Dict[str, List[List[str]]] = {}
+    for slot, text in sorted(bodies.items()):
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                family = families.setdefault(line.split(" ", 3)[2], [[], []])
+                if line not in family[0]:
+                    family[0].append(line)
+            elif line and family is not None:
+                family[1].append(add_worker_label(line, slot))
+    return "".join("\n".join(head + samples) + "\n" for head, samples in families.values())
+
+
+def _status(response: bytes) -> int:
+    try:
+        return int(response.split(b" ", 2)[1])
+    except (IndexError, ValueError):
+        return 502
+
+
+def _http_response(status: str, body: bytes = b"", content_type: str = "text/plain") -> bytes:
+    return (
+        f"HTTP/1.1 {status}\r\ncontent-type: {content_type}\r\n"
+        f"content-length: {len(body)}\r\nconnection: close\r\n\r\n"
+    ).encode() + body
+
+
+class Front:
+    """Accepts connections and hands each one to a worker; see the module docstring."""
+
+    def __init__(self, host: str, port: int, workers: int, log_level: str):
+        self.host = host
+        self.port = port
+        self.initial_workers = max(1, workers)
+        self.log_level = log_level
+        self.ring = HashRing()
+        self.workers: Dict[int, Worker] = {}
+        self.scaling = asyncio.Lock()
+        self.closing = asyncio.Event()
+        self._round_robin = itertools.count()
+
+    # ---------- worker lifecycle ----------
+
+    async def _start(self, worker: Worker):
+        front, back = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        front.setblocking(False)
+        worker.control, worker.ready = front, False
+        worker.process = process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--worker", str(worker.slot),
+            "--control-fd", str(back.fileno()), "--log-level", self.log_level,
+            pass_fds=[back.fileno()], cwd=SERVICE_DIR,
+        )
+        back.close()
+
+        try:
+            message = await asyncio.wait_for(asyncio.get_running_loop().sock_recv(front, 16), WORKER_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            message = b""
+        if message != MSG_READY:
+            front.close()
+            if process.returncode is None:
+                process.kill()
+            raise RuntimeError(f"worker {worker.slot} failed to start")
+        worker.ready = True
+        asyncio.create_task(self._watch(worker, process))
+
+    async def _watch(self, worker: Worker, process):
+        code = await process.wait()
+        if worker.process is not process:
+            return
+        worker.ready = False
+        worker.control.close()
+
+        while not (worker.retired or self.closing.is_set()):
+            logger.warning("Worker %d exited with %s; restarting", worker.slot, code)
+            await asyncio.sleep(RESTART_DELAY)
+            if worker.retired or self.closing.is_set():
+                return
+            try:
+                await self._start(worker)
+                return
+            except RuntimeError:
+                code = worker.process.returncode
+
+    def _announce(self):
+        message = MSG_RING + json.dumps(self.ring.nodes).encode()
+        for worker in self.workers.values():
+            if worker.ready:
+                try:
+                    worker.control.send(message)
+                except OSError:
+                    logger.warning("Could not send the ring to worker %d", worker.slot)
+
+    async def add_worker(self):
+        async with self.scaling:
+            slot = max(self.workers, default=-1) + 1
+            worker = self.workers[slot] = Worker(slot)
+            try:
+                await self._start(worker)
+            except RuntimeError:
+                del self.workers[slot]
+                logger.exception("Could not add worker %d", slot)
+                return
+            self.ring.add(slot)
+            self._announce()
+            logger.info("Added worker %d; %d workers", slot, len(self.workers))
+
+    async def remove_worker(self):
+        async with self.scaling:
+            if len(self.workers) <= 1:
+                return
+            slot = max(self.workers)
+            self.ring.remove(slot)
+            worker = self.workers.pop(slot)
+            worker.retired = True
+            # uvicorn closes the worker's sockets on SIGTERM; those clients
+            # reconnect to the rooms' new owners.
+            if worker.process.returncode is None:
+                worker.process.terminate()
+            await worker.process.wait()
+            logger.info("Removed worker %d; %d workers", slot, len(self.workers))
+
+    # ---------- routing ----------
+
+    async def _request_line(self, client: socket.socket) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_TIMEOUT
+        while loop.time() < deadline:
+            try:
+                data = client.recv(MAX_REQUEST_LINE, socket.MSG_PEEK)
+            except BlockingIOError:
+                readable = loop.create_future()
+                loop.add_reader(client.fileno(), lambda: readable.done() or readable.set_result(None))
+                try:
+                    await asyncio.wait_for(readable, deadline - loop.time())
+                except asyncio.TimeoutError:
+                    return None
+                finally:
+                    loop.remove_reader(client.fileno())
+                continue
+            if not data:
+                return None
+            end = data.find(b"\r\n")
+            if end >= 0:
+                return data[:end]
+            if len(data) >= MAX_REQUEST_LINE:
+                return None
+            # Only part of the line has arrived and it stays readable; poll.
+            await asyncio.sleep(0.005)
+        return None
+
+    def _hand_off(self, client: socket.socket, worker: Optional[Worker]) -> bool:
+        if worker is None or not worker.ready:
+            return False
+        try:
+            socket.send_fds(worker.control, [MSG_SOCKET], [client.fileno()])
+            return True
+        except OSError:
+            return False
+
+    def _any_worker(self) -> Optional[Worker]:
+        ready = [worker for worker in self.workers.values() if worker.ready]
+        return ready[next(self._round_robin) % len(ready)] if ready else None
+
+    async def _ask(self, worker: Worker, request: bytes) -> bytes:
+        """Run one HTTP request on a worker through a socket pair; returns the raw response."""
+        ours, theirs = socket.socketpair()
+        try:
+            handed = self._hand_off(theirs, worker)
+        finally:
+            theirs.close()
+        if not handed:
+            ours.close()
+            return _http_response("503 Service Unavailable")
+        reader, writer = await asyncio.open_connection(sock=ours)
+        try:
+            writer.write(request)
+            return await asyncio.wait_for(reader.read(), REQUEST_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return _http_response("504 Gateway Timeout")
+        finally:
+            writer.close()
+
+    async def _fan_out(self, client: socket.socket, path: bytes):
+        reader, writer = await asyncio.open_connection(sock=client, limit=MAX_REQUEST_HEAD)
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            lines = head[:-4].split(b"\r\n")
+            length = 0
+            headers = [lines[0]]
+            for line in lines[1:]:
+                name = line.split(b":", 1)[0].strip().lower()
+                if name == b"content-length":
+                    length = int(line.split(b":", 1)[1])
+                if name != b"connection":
+                    headers.append(line)
+            body = await asyncio.wait_for(reader.readexactly(length), REQUEST_TIMEOUT) if length else b""
+            request = b"\r\n".join(headers + [b"connection: close", b"", b""]) + body
+
+            workers = [worker for worker in self.workers.values() if worker.ready]
+            responses = await asyncio.gather(*(self._ask(worker, request) for worker in workers))
+            if not responses:
+                response = _http_response("503 Service Unavailable")
+            elif path == b"/metrics":
+                bodies = {
+                    worker.slot: response.partition(b"\r\n\r\n")[2].decode()
+                    for worker, response in zip(workers, responses) if _status(response) == 200
+                }
+                response = _http_response(
+                    "200 OK", merge_metrics(bodies).encode(), "text/plain; version=0.0.4",
+                )
+            else:
+                # Report the worst outcome, so a caller retries if any worker missed it.
+                response = max(responses, key=_status)
+            writer.write(response)
+            await writer.drain()
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, client: socket.socket):
+        line = await self._request_line(client)
+        if line is None:
+            client.close()
+            return
+
+        parts = line.split(b" ")
+        method, target = (parts[0], parts[1]) if len(parts) == 3 else (b"", b"")
+        path = target.split(b"?", 1)[0]
+
+        if (method == b"POST" and path.startswith(b"/internal/")) or path == b"/metrics":
+            await self._fan_out(client, path)
+            return
+
+        room = WS_PATH.fullmatch(path)
+        worker = self.workers.get(self.ring.owner(int(room.group(1)))) if room else self._any_worker()
+        if not self._hand_off(client, worker):
+            try:
+                client.send(_http_response("503 Service Unavailable"))
+            except OSError:
+                pass
+        client.close()
+
+    async def _accept(self, listener: socket.socket):
+        loop = asyncio.get_running_loop()
+        while True:
+            client, _ = await loop.sock_accept(listener)
+            loop.create_task(self._route(client))
+
+    # ---------- main ----------
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for slot in range(self.initial_workers):
+            self.workers[slot] = Worker(slot)
+        await asyncio.gather(*(self._start(worker) for worker in self.workers.values()))
+        for slot in self.workers:
+            self.ring.add(slot)
+
+        listener = socket.create_server((self.host, self.port), backlog=2048, reuse_port=False)
+        listener.setblocking(False)
+        logger.info("Realtime front on %s:%d with %d workers", self.host, self.port, len(self.workers))
+
+        loop.add_signal_handler(signal.SIGTTIN, lambda: asyncio.create_task(self.add_worker()))
+        loop.add_signal_handler(signal.SIGTTOU, lambda: asyncio.create_task(self.remove_worker()))
+        loop.add_signal_handler(signal.SIGTERM, self.closing.set)
+        loop.add_signal_handler(signal.SIGINT, self.closing.set)
+
+        accepting = asyncio.create_task(self._accept(listener))
+        await self.closing.wait()
+        accepting.cancel()
+        listener.close()
+
+        for worker in self.workers.values():
+            if worker.process.returncode is None:
+                worker.process.terminate()
+        await asyncio.gather(*(worker.process.wait() for worker in self.workers.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--workers", type=int, default=REALTIME_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--control-fd", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+    if args.worker is not None:
+        run_worker(args.worker, args.control_fd, args.log_level)
+    else:
+        asyncio.run(Front(args.host, args.port, args.workers, args.log_level).run())
+
+
+if __name__ == "__main__":
+    main()
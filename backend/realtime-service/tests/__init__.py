@@ -0,0 +1,15 @@
+"""
+Unit tests for realtime-service.
+
+Run from the service directory with `python -m pytest tests` or
+`python -m unittest discover tests`. Besides requirements.txt they need
+fakeredis, as the benchmarks do.
+"""
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+# Code shared between services, as main.py sets up.
+sys.path.append(os.path.join(os.path.dirname(SERVICE_DIR), "shared"))
+os.environ.setdefault("JWT_SECRET", "test-secret-not-for-production")
@@ -0,0 +1,45 @@
+"""Stand-ins shared by the tests."""
+import asyncio
+import json
+
+
+class FakeWebSocket:
+    """Records what a Starlette WebSocket would have sent; `stalled` never finishes a send."""
+
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.sent = []
+        self.closed = False
+        self.close_code = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data):
+        await self._send(data)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def _send(self, data):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+        self.close_code = code
+
+    def messages(self, type_=None):
+        """Sent JSON frames, batches unpacked, optionally only those of one type."""
+        messages = []
+        for data in self.sent:
+            message = json.loads(data)
+            messages.extend(message["messages"] if message.get("type") == "batch" else [message])
+        return [message for message in messages if type_ is None or message.get("type") == type_]
+
+
+async def settle():
+    """Let writer tasks and scheduled closes run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
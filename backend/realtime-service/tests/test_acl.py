@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from acl import AclCache, BoardAcl, can_edit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+BOARD = {"owner_id": 1, "is_public": False, "permissions": {"2": "edit", "3": "view"}}
+
+
+class BoardAclTests(unittest.TestCase):
+    def test_levels(self):
+        acl = BoardAcl.from_dict(BOARD)
+        self.assertEqual([acl.level_for(user) for user in (1, 2, 3, 4)], ["owner", "edit", "view", None])
+        public = BoardAcl.from_dict({**BOARD, "is_public": True})
+        self.assertEqual(public.level_for(4), "view")
+
+    def test_can_edit(self):
+        self.assertEqual([can_edit(level) for level in ("owner", "admin", "edit", "view", None)],
+                         [True, True, True, False, False])
+
+
+class AclCacheTests(unittest.IsolatedAsyncioTestCase):
+    def cache(self, boards, **kwargs):
+        self.requests = []
+
+        async def fetch(ids):
+            self.requests.append(sorted(ids))
+            await asyncio.sleep(0)
+            return {board: boards[board] for board in ids if board in boards}
+
+        return AclCache(fetch, batch_window=0.001, **kwargs)
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        cache = self.cache({1: BOARD, 2: BOARD})
+        levels = await asyncio.gather(cache.level_for(1, 1), cache.level_for(1, 2), cache.level_for(2, 3),
+                                      cache.level_for(9, 1))
+        self.assertEqual(levels, ["owner", "edit", "view", None])
+        self.assertEqual(self.requests, [[1, 2, 9]])
+
+        self.assertEqual(await cache.level_for(9, 1), None)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_entries_expire(self):
+        clock = Clock()
+        cache = self.cache({1: BOARD}, ttl=10, clock=clock)
+        await cache.get(1)
+        clock.now = 5
+        await cache.get(1)
+        clock.now = 11
+        await cache.get(1)
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_missing_boards_expire_sooner(self):
+        clock = Clock()
+        boards = {}
+        cache = self.cache(boards, ttl=60, missing_ttl=5, clock=clock)
+        self.assertIsNone(await cache.get(1))
+        boards[1] = BOARD
+        clock.now = 4
+        self.assertIsNone(await cache.get(1))
+        clock.now = 5
+        self.assertIsNotNone(await cache.get(1))
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_invalidate_during_fetch_is_not_cached(self):
+        started, answer = asyncio.Event(), asyncio.Event()
+
+        async def fetch(ids):
+            self.requests.append(sorted(ids))
+            started.set()
+            await answer.wait()
+            return {1: BOARD}
+
+        self.requests = []
+        cache = AclCache(fetch, batch_window=0.001)
+        pending = asyncio.create_task(cache.get(1))
+        await started.wait()
+        cache.invalidate(1)
+        answer.set()
+        self.assertIsNotNone(await pending)
+        await cache.get(1)
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_fetch_failure_reaches_every_waiter(self):
+        async def fetch(ids):
+            raise OSError("board-service down")
+
+        cache = AclCache(fetch, batch_window=0.001)
+        results = await asyncio.gather(cache.get(1), cache.get(1), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, OSError) for result in results))
+        self.assertEqual(cache._entries, {})
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import unittest
+
+import fakeredis
+import fakeredis.aioredis
+
+from backplane import RedisBackplane, board_channel
+
+
+class BackplaneTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = fakeredis.FakeServer()
+        self.received = {"a": [], "b": []}
+        self.nodes = {}
+        for name in ("a", "b"):
+            node = RedisBackplane(fakeredis.aioredis.FakeRedis(server=self.server), node_id=name)
+            await node.start(self.handler(name))
+            self.nodes[name] = node
+            self.addAsyncCleanup(node.stop)
+
+    def handler(self, name):
+        async def on_message(whiteboard_id, data, exclude_user):
+            if data == "boom":
+                raise RuntimeError("relay failed")
+            self.received[name].append((whiteboard_id, data, exclude_user))
+        return on_message
+
+    async def wait_for(self, name, count):
+        for _ in range(100):
+            if len(self.received[name]) >= count:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"node {name} got {self.received[name]}")
+
+    async def test_relays_to_other_nodes_only(self):
+        await self.nodes["a"].join(1, 10)
+        await self.nodes["b"].join(1, 20)
+        await self.nodes["a"].publish(1, '{"type": "x"}', 10)
+        await self.wait_for("b", 1)
+        self.assertEqual(self.received["b"], [(1, '{"type": "x"}', 10)])
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.received["a"], [])
+
+    async def test_presence_spans_nodes(self):
+        await self.nodes["a"].join(1, 10)
+        await self.nodes["a"].join(1, 10)
+        await self.nodes["b"].join(1, 20)
+        self.assertEqual(await self.nodes["a"].get_online_users(1), [10, 20])
+        await self.nodes["b"].leave(1, 20, room_empty=True)
+        await self.nodes["a"].leave(1, 10, room_empty=False)
+        self.assertEqual(await self.nodes["b"].get_online_users(1), [10])
+
+    async def test_bad_messages_do_not_stop_the_listener(self):
+        await self.nodes["b"].join(1, 20)
+        redis = self.nodes["a"].redis
+        for raw in ("not json", "[1, 2]", json.dumps({"node": "a2", "data": 5}),
+                    json.dumps({"node": "a2", "data": "boom"})):
+            await redis.publish(board_channel(1), raw)
+        await self.nodes["a"].publish(1, "after", None)
+        await self.wait_for("b", 1)
+        self.assertEqual(self.received["b"], [(1, "after", None)])
+        self.assertEqual(self.nodes["b"].bad_messages, 4)
+
+    async def test_listener_is_restarted(self):
+        node = self.nodes["b"]
+        await node.join(1, 20)
+        first, handle = node._listener, node._handle
+
+        class ListenerBug(BaseException):
+            pass
+
+        async def fail(message):
+            node._handle = handle
+            raise ListenerBug()
+
+        node._handle = fail
+        with self.assertLogs("backplane", "ERROR"):
+            await self.nodes["a"].publish(1, "lost", None)
+            for _ in range(100):
+                if node._listener is not first:
+                    break
+                await asyncio.sleep(0.01)
+        self.assertIsNot(node._listener, first)
+
+        await self.nodes["a"].publish(1, "after", None)
+        await self.wait_for("b", 1)
+        self.assertEqual(self.received["b"], [(1, "after", None)])
+
+    async def test_redis_errors_are_logged_not_raised(self):
+        node = self.nodes["a"]
+
+        async def down(*args, **kwargs):
+            raise ConnectionError("redis down")
+
+        node.redis.publish = down
+        node.redis.hincrby = down
+        with self.assertLogs("backplane", "WARNING"):
+            await node.publish(1, "x", None)
+            await node.join(2, 10)
+            await node.leave(2, 10, room_empty=True)
+        self.assertEqual(node.publish_failures, 1)
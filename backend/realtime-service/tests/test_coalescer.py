@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from coalescer import UpdateCoalescer, clamp_window, object_id
+from protocol import Frame, receive_frame
+
+
+def update(obj, sender=None, **fields):
+    return Frame({"type": "object_updated", "payload": {"id": obj, **fields}}), sender
+
+
+class ObjectIdTests(unittest.TestCase):
+    def test_payload_then_top_level(self):
+        self.assertEqual(object_id({"payload": {"id": 3}}), 3)
+        self.assertEqual(object_id({"id": "a"}), "a")
+
+    def test_unusable_ids(self):
+        for message in ({"payload": {"id": [1]}}, {"id": {"x": 1}}, {"id": True}, {"payload": "x"}, {}):
+            with self.subTest(message=message):
+                self.assertIsNone(object_id(message))
+
+
+class ClampWindowTests(unittest.TestCase):
+    def test_clamp(self):
+        self.assertEqual(clamp_window(0), 0)
+        self.assertEqual(clamp_window(1), 16)
+        self.assertEqual(clamp_window(500), 50)
+
+
+class UpdateCoalescerTests(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, frames):
+        flushed = []
+
+        async def flush(events):
+            flushed.append(events)
+
+        coalescer = UpdateCoalescer(1, flush)
+        for frame, sender in frames:
+            coalescer.add(frame, sender)
+        await asyncio.sleep(0.02)
+        self.assertEqual(len(flushed), 1)
+        return flushed[0]
+
+    async def test_merges_updates_of_one_object(self):
+        events = await self.collect([update(1, 7, x=1), update(1, 7, y=2), update(2, 7, x=5), update(1, 7, x=3)])
+        self.assertEqual([e.frame.get_message()["payload"] for e in events],
+                         [{"id": 1, "x": 3, "y": 2}, {"id": 2, "x": 5}])
+        self.assertEqual(events[0].exclude_user, 7)
+
+    async def test_different_senders_are_not_excluded(self):
+        events = await self.collect([update(1, 7, x=1), update(1, 8, x=2)])
+        self.assertEqual(len(events), 1)
+        self.assertIsNone(events[0].exclude_user)
+
+    async def test_unmerged_frame_keeps_its_bytes(self):
+        text = '{"type": "object_updated", "payload": {"id": 1, "x": 1}}'
+        frame = receive_frame({"text": text})
+        events = await self.collect([(frame, None)])
+        self.assertIs(events[0].frame, frame)
+
+    async def test_other_events_end_a_merge_run(self):
+        delete = Frame({"type": "object_deleted", "id": 1})
+        events = await self.collect([update(1, None, x=1), (delete, None), update(1, None, x=2)])
+        self.assertEqual([e.frame.get_message()["type"] for e in events],
+                         ["object_updated", "object_deleted", "object_updated"])
+
+    async def test_versioned_update_only_replaces_what_it_supersedes(self):
+        older = update(1, None, x=1, v=[1, 1])
+        newer = update(1, None, x=2, v=[2, 1])
+        partial = update(1, None, y=3, v=[3, 1])
+        events = await self.collect([older, newer, partial])
+        self.assertEqual([e.frame.get_message()["payload"] for e in events],
+                         [newer[0].get_message()["payload"], partial[0].get_message()["payload"]])
+
+    async def test_updates_without_a_usable_payload_are_relayed(self):
+        frames = [
+            (Frame({"type": "object_updated"}), None),
+            (Frame({"type": "object_updated", "payload": [1]}), None),
+            (Frame({"type": "object_updated", "payload": {"id": [1], "x": 1}}), None),
+            (Frame({"type": "object_updated", "payload": {"id": [1], "x": 2}}), None),
+        ]
+        events = await self.collect(frames)
+        self.assertEqual([e.frame for e in events], [frame for frame, _ in frames])
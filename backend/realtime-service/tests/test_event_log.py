@@ -0,0 +1,44 @@
+import unittest
+
+import fakeredis.aioredis
+
+from event_log import MAX_ATTEMPTS, STREAMS_KEY, RedisEventLog, stream_key
+
+
+class RedisEventLogTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = fakeredis.aioredis.FakeRedis()
+        self.log = RedisEventLog(self.redis, flush_interval=60)
+
+    async def test_appends_per_board_stream(self):
+        self.log.append(1, '{"n": 1}', 7)
+        self.log.append(2, '{"n": 2}', 8)
+        self.log.append(1, '{"n": 3}')
+        await self.log.flush()
+        self.assertEqual([(data, sender) for _, data, sender in await self.log.read(1)],
+                         [('{"n": 1}', 7), ('{"n": 3}', 0)])
+        self.assertEqual(sorted(await self.redis.zrange(STREAMS_KEY, 0, -1)),
+                         [stream_key(1).encode(), stream_key(2).encode()])
+
+    async def test_rejected_entry_is_dead_lettered_alone(self):
+        await self.redis.set(stream_key(2), "not a stream")
+        self.log.append(1, '{"n": 1}', 7)
+        self.log.append(2, '{"n": 2}', 7)
+        self.log.append(1, '{"n": 3}', 7)
+        for _ in range(MAX_ATTEMPTS - 1):
+            await self.log.flush()
+            self.assertEqual(len(self.log.pending), 1)
+        await self.log.flush()
+
+        self.assertEqual((self.log.appended, self.log.dead_lettered, self.log.pending), (2, 1, []))
+        self.assertEqual(list(self.log.dead_letters), [(2, '{"n": 2}', 7)])
+        self.assertEqual(len(await self.log.read(1)), 2)
+
+    async def test_outage_keeps_the_batch(self):
+        async def down(batch):
+            raise ConnectionError("redis down")
+        self.log._write = down
+        self.log.append(1, "{}", 7)
+        for _ in range(MAX_ATTEMPTS * 2):
+            await self.log.flush()
+        self.assertEqual((len(self.log.pending), self.log.dead_lettered, self.log.failures), (1, 0, 6))
@@ -0,0 +1,35 @@
+import unittest
+
+from heartbeat import HeartbeatReaper
+from websocket_manager import ConnectionManager
+
+from tests.common import FakeWebSocket, settle
+
+
+class HeartbeatReaperTests(unittest.IsolatedAsyncioTestCase):
+    async def test_silent_socket_is_reaped_and_the_rest_pinged(self):
+        manager = ConnectionManager()
+        active, silent = FakeWebSocket(), FakeWebSocket(stalled=True)
+        active_connection = await manager.connect(active, 1, user_id=1)
+        silent_connection = await manager.connect(silent, 1, user_id=2)
+        await settle()
+
+        now = [100.0]
+        reaper = HeartbeatReaper(manager, interval=1, timeout=10, clock=lambda: now[0])
+        active_connection.last_seen = silent_connection.last_seen = 95
+        self.assertEqual(await reaper.beat(), 0)
+        await settle()
+        self.assertEqual(len(active.messages("ping")), 1)
+
+        active_connection.last_seen = now[0] = 106
+        stuck = silent_connection.queue.qsize()
+        self.assertEqual(await reaper.beat(), 1)
+        await settle()
+
+        self.assertEqual((silent.closed, silent.close_code), (True, 1001))
+        self.assertEqual([connection.websocket for connection in manager.active_connections[1]], [active])
+        self.assertEqual(active.messages("online_users")[-1]["users"], [1])
+        self.assertEqual(len(active.messages("ping")), 2)
+        self.assertFalse(active.closed)
+        self.assertEqual((reaper.reaped, reaper.reaped_frames), (1, stuck))
+        self.assertGreater(reaper.reaped_bytes, 0)
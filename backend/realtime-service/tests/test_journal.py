@@ -0,0 +1,77 @@
+import sqlite3
+import unittest
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from journal import MAX_ATTEMPTS, EventJournal
+from models import Base, RoomEvent
+
+
+class EventJournalTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.journal = EventJournal(engine, flush_interval=60, max_batch=100)
+        self.write = self.journal._write
+
+    def fail_on(self, bad):
+        def write(rows):
+            if any(row[4] == bad for row in rows):
+                raise ValueError("A string literal cannot contain NUL (0x00) characters.")
+            self.write(rows)
+        self.journal._write = write
+
+    async def test_writes_in_order(self):
+        for n in range(3):
+            self.journal.append(1, f'{{"n": {n}}}', 7, "object_updated")
+        self.journal.append(2, "{}", 7, "cursor")
+        await self.journal.flush()
+        self.assertEqual([row[3] for row in await self.journal.read(1)], ['{"n": 0}', '{"n": 1}', '{"n": 2}'])
+        self.assertEqual(self.journal.written, 4)
+
+    async def test_long_event_types_are_cut_to_the_column(self):
+        self.journal.append(1, "{}", 7, "x" * 100)
+        await self.journal.flush()
+        with self.journal.engine.connect() as connection:
+            self.assertEqual(connection.execute(select(RoomEvent.event_type)).scalar_one(), "x" * 32)
+
+    async def test_bad_rows_are_dead_lettered_after_the_attempt_limit(self):
+        self.fail_on("BAD")
+        for n in range(20):
+            self.journal.append(1, "BAD" if n == 13 else f'{{"n": {n}}}', 7, "object_updated")
+        for _ in range(MAX_ATTEMPTS - 1):
+            await self.journal.flush()
+            self.assertEqual((self.journal.written, len(self.journal.pending)), (0, 20))
+        await self.journal.flush()
+
+        self.assertEqual((self.journal.written, self.journal.dead_lettered), (19, 1))
+        self.assertEqual([row[4] for row in self.journal.dead_letters], ["BAD"])
+        self.assertEqual(len(await self.journal.read(1)), 19)
+        self.assertEqual(self.journal.pending, [])
+
+    async def test_outage_is_retried_without_a_limit(self):
+        def down(rows):
+            raise sqlite3.OperationalError("unable to open database file")
+        self.journal._write = down
+        self.journal.append(1, "{}", 7, "cursor")
+        for _ in range(MAX_ATTEMPTS * 2):
+            await self.journal.flush()
+        self.assertEqual((len(self.journal.pending), self.journal.dead_lettered), (1, 0))
+
+        self.journal._write = self.write
+        await self.journal.flush()
+        self.assertEqual(self.journal.written, 1)
+
+    async def test_buffer_is_bounded(self):
+        self.journal.max_pending = 5
+        for n in range(8):
+            self.journal.append(1, str(n))
+        self.assertEqual(([row[4] for _, row in self.journal.pending], self.journal.dropped),
+                         (["3", "4", "5", "6", "7"], 3))
+
+    async def test_stop_writes_what_is_left(self):
+        self.journal.start()
+        self.journal.append(1, "{}", 7, "cursor")
+        await self.journal.stop()
+        self.assertEqual(self.journal.written, 1)
@@ -0,0 +1,62 @@
+import unittest
+
+from lww import merge, next_stamp, parse_stamps, supersedes
+
+
+class MergeTests(unittest.TestCase):
+    def test_newer_counter_wins(self):
+        state, versions = {"x": 1}, {"x": [3, 9]}
+        self.assertEqual(merge(state, versions, {"x": 2}, (4, 1)), {"x": 2})
+        self.assertEqual((state, versions), ({"x": 2}, {"x": [4, 1]}))
+
+    def test_tie_is_broken_by_actor(self):
+        state, versions = {"x": 1}, {"x": [5, 7]}
+        self.assertEqual(merge(state, versions, {"x": 2}, (5, 6)), {})
+        self.assertEqual(merge(state, versions, {"x": 3}, (5, 8)), {"x": 3})
+        self.assertEqual((state, versions), ({"x": 3}, {"x": [5, 8]}))
+
+    def test_same_result_in_either_order(self):
+        edits = [({"x": 1}, (2, 4)), ({"x": 2}, (2, 5))]
+        results = []
+        for order in (edits, edits[::-1]):
+            state, versions = {}, {}
+            for fields, stamp in order:
+                merge(state, versions, fields, stamp)
+            results.append((state, versions))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][0], {"x": 2})
+
+    def test_stale_fields_are_dropped_and_the_rest_applied(self):
+        state, versions = {"x": 1, "y": 1}, {"x": [9, 1], "y": [2, 1]}
+        won = merge(state, versions, {"x": 5, "y": 5, "color": "red"}, {"x": (8, 1), "y": (3, 1), "color": (1, 1)})
+        self.assertEqual(won, {"y": 5, "color": "red"})
+        self.assertEqual(state, {"x": 1, "y": 5, "color": "red"})
+
+    def test_edit_where_every_field_loses_changes_nothing(self):
+        state, versions = {"x": 1, "y": 1}, {"x": [4, 2], "y": [4, 2]}
+        self.assertEqual(merge(state, versions, {"x": 7, "y": 7}, (4, 2)), {})
+        self.assertEqual(merge(state, versions, {"x": 7, "y": 7}, (3, 9)), {})
+        self.assertEqual((state, versions), ({"x": 1, "y": 1}, {"x": [4, 2], "y": [4, 2]}))
+
+    def test_fields_without_a_stamp_are_skipped(self):
+        state = {}
+        self.assertEqual(merge(state, {}, {"x": 1, "y": 2}, {"x": (1, 1)}), {"x": 1})
+        self.assertEqual(state, {"x": 1})
+
+
+class StampTests(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_stamps([3, 4]), (3, 4))
+        self.assertEqual(parse_stamps({"x": [1, 2]}), {"x": (1, 2)})
+        for value in (None, [1], [1, 2, 3], [True, 1], ["1", 2], {"x": [1]}, "3,4"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_stamps(value))
+
+    def test_next_stamp_passes_every_version(self):
+        self.assertEqual(next_stamp({"x": [3, 9], "y": [7, 1]}), (8, 0))
+        self.assertEqual(next_stamp({}), (1, 0))
+
+    def test_supersedes(self):
+        self.assertTrue(supersedes({"x": 1, "y": 1}, (2, 1), {"x": 0}, (1, 1)))
+        self.assertFalse(supersedes({"x": 1}, (2, 1), {"x": 0, "y": 0}, (1, 1)))
+        self.assertFalse(supersedes({"x": 1}, (1, 1), {"x": 0}, (1, 1)))
@@ -0,0 +1,87 @@
+import os
+import unittest
+
+# main reads its settings on import.
+os.environ.setdefault("ACL_CHECK_ENABLED", "False")
+os.environ.setdefault("HEARTBEAT_INTERVAL", "0")
+
+import msgpack
+from fastapi.testclient import TestClient
+from jose import jwt
+from starlette.websockets import WebSocketDisconnect
+
+import main
+
+
+def token(user_id):
+    return jwt.encode({"user_id": user_id}, main.JWT_SECRET, algorithm="HS256")
+
+
+class ReceiveLoopTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def join(self, whiteboard_id, user_id):
+        socket = self.client.websocket_connect(f"/ws/{whiteboard_id}?token={token(user_id)}")
+        socket.__enter__()
+        self.addCleanup(socket.__exit__, None, None, None)
+        self.assertEqual(socket.receive_json()["type"], "sync")
+        self.assertEqual(socket.receive_json()["type"], "online_users")
+        return socket
+
+    def test_relays_to_peers(self):
+        alice = self.join(101, 1)
+        bob = self.join(101, 2)
+        self.assertEqual(alice.receive_json(), {"type": "online_users", "users": [1, 2]})
+
+        bob.send_text('{"type": "object_created", "payload": {"id": 1}}')
+        message = alice.receive_json()
+        self.assertEqual((message["type"], message["payload"], message["seq"]), ("object_created", {"id": 1}, 1))
+
+    def test_malformed_frames_get_an_error_and_are_not_relayed(self):
+        alice = self.join(102, 1)
+        bob = self.join(102, 2)
+        alice.receive_json()
+
+        for text in ("[1, 2]", '{"type": "object_created", oops}', '{"type": 5}', "null"):
+            with self.subTest(text=text):
+                bob.send_text(text)
+                self.assertEqual(bob.receive_json()["type"], "error")
+
+        bob.send_text('{"type": "object_deleted", "id": 1}')
+        self.assertEqual(alice.receive_json()["type"], "object_deleted")
+
+    def test_frames_a_peer_cannot_receive_get_an_error(self):
+        alice = self.client.websocket_connect(f"/ws/104?token={token(1)}", subprotocols=["whiteboard.msgpack"])
+        alice.__enter__()
+        self.addCleanup(alice.__exit__, None, None, None)
+        alice.receive_bytes()
+        alice.receive_bytes()
+        bob = self.join(104, 2)
+        alice.receive_bytes()
+
+        # Too large for a MessagePack integer.
+        bob.send_text('{"type": "object_deleted", "id": %d}' % 2 ** 70)
+        self.assertEqual(bob.receive_json()["type"], "error")
+
+        bob.send_text('{"type": "object_deleted", "id": 1}')
+        self.assertEqual(msgpack.unpackb(alice.receive_bytes())["type"], "object_deleted")
+
+    def test_room_is_cleaned_up_on_disconnect(self):
+        alice = self.join(103, 1)
+        with self.client.websocket_connect(f"/ws/103?token={token(2)}") as bob:
+            bob.receive_json()
+            bob.receive_json()
+            alice.receive_json()
+        self.assertEqual(alice.receive_json(), {"type": "online_users", "users": [1]})
+
+    def test_clients_cannot_set_the_batch_window(self):
+        with self.client.websocket_connect(f"/ws/105?token={token(1)}&batch_ms=50") as socket:
+            socket.receive_json()
+            self.assertIsNone(main.manager.active_connections[105].coalescer)
+
+    def test_rejects_a_bad_token(self):
+        with self.assertRaises(WebSocketDisconnect) as raised:
+            with self.client.websocket_connect("/ws/104?token=nope") as socket:
+                socket.receive_json()
+        self.assertEqual(raised.exception.code, 1008)
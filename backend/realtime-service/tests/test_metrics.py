@@ -0,0 +1,54 @@
+import unittest
+
+import metrics
+
+
+class RenderTests(unittest.TestCase):
+    def metric(self, metric):
+        self.addCleanup(metrics._REGISTRY.remove, metric)
+        return metric
+
+    def test_counter(self):
+        counter = self.metric(metrics.Counter("test_bytes_total", "Bytes."))
+        counter.inc(3)
+        counter.inc()
+        self.assertEqual(counter.render(), "# HELP test_bytes_total Bytes.\n# TYPE test_bytes_total counter\n"
+                                           "test_bytes_total 4")
+
+    def test_unknown_message_types_are_other(self):
+        counter = self.metric(metrics.TypeCounter("test_frames_total", "Frames."))
+        counter.inc("object_updated", 2)
+        counter.inc("made_up")
+        counter.inc(None)
+        self.assertEqual(counter.render().splitlines()[2:], [
+            'test_frames_total{type="object_updated"} 2',
+            'test_frames_total{type="other"} 2',
+        ])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.metric(metrics.Histogram("test_seconds", "Time.", (0.5, 0.001, 0.01)))
+        for value in (0.0005, 0.001, 0.005, 2):
+            histogram.observe(value)
+        self.assertEqual(histogram.render().splitlines()[1:], [
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{le="0.001"} 2',
+            'test_seconds_bucket{le="0.01"} 3',
+            'test_seconds_bucket{le="0.5"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            "test_seconds_sum 2.0065",
+            "test_seconds_count 4",
+        ])
+
+    def test_gauge_is_read_at_scrape_time(self):
+        value = [1]
+        gauge = self.metric(metrics.Gauge("test_depth", "Depth.", lambda: value[0]))
+        total = self.metric(metrics.Gauge("test_dropped_total", "Dropped.", lambda: 7, kind="counter"))
+        value[0] = 2.5
+        self.assertEqual(gauge.render().splitlines()[1:], ["# TYPE test_depth gauge", "test_depth 2.5"])
+        self.assertIn("# TYPE test_dropped_total counter", total.render())
+
+    def test_render_joins_every_metric(self):
+        text = metrics.render()
+        self.assertTrue(text.endswith("\n"))
+        self.assertIn("# TYPE realtime_broadcast_duration_seconds histogram\n", text)
+        self.assertIn("realtime_jwt_failures_total ", text)
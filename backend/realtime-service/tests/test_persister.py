@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+
+from board_client import BoardServiceError
+from persister import MAX_ATTEMPTS, WriteBehindBuffer
+
+
+def updated(obj, **fields):
+    return {"type": "object_updated", "payload": {"id": obj, **fields}}
+
+
+class FakeClient:
+    def __init__(self):
+        self.updates = []
+        self.deletes = []
+        self.error = None
+        self.result = {}
+        self.delay = 0
+
+    async def bulk_update(self, updates, user_id):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.updates.append((user_id, updates))
+        return self.result
+
+    async def bulk_delete(self, ids, user_id):
+        if self.error:
+            raise self.error
+        self.deletes.append((user_id, sorted(ids)))
+        return {}
+
+
+class WriteBehindBufferTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.rejected = []
+        self.buffer = WriteBehindBuffer(self.client, flush_interval=60,
+                                        on_rejected=lambda *args: self.rejected.append(args))
+
+    async def test_merges_per_object_and_batches_per_user(self):
+        self.buffer.record(1, 7, updated(1, x=1))
+        self.buffer.record(1, 7, updated(1, y=2, name="ignored"))
+        self.buffer.record(1, 8, updated(2, x=3))
+        self.buffer.record(1, 7, {"type": "object_deleted", "id": 3})
+        self.assertEqual(self.buffer.pending, 3)
+        await self.buffer.flush()
+        self.assertEqual(self.client.updates, [(7, [{"id": 1, "x": 1, "y": 2}]), (8, [{"id": 2, "x": 3}])])
+        self.assertEqual(self.client.deletes, [(7, [3])])
+        self.assertEqual(self.buffer.pending, 0)
+
+    async def test_delete_discards_pending_updates(self):
+        self.buffer.record(1, 7, updated(1, x=1))
+        self.buffer.record(1, 7, {"type": "object_deleted", "id": 1})
+        self.buffer.record(1, 7, updated(1, x=2))
+        await self.buffer.flush()
+        self.assertEqual(self.client.updates, [])
+        self.assertEqual(self.client.deletes, [(7, [1])])
+
+    async def test_malformed_messages_are_ignored(self):
+        for message in (updated([1], x=1), {"type": "object_updated", "id": 1, "payload": [1]},
+                        {"type": "object_updated", "id": 1}, {"type": "object_deleted"}):
+            self.buffer.record(1, 7, message)
+        self.assertEqual(self.buffer.pending, 0)
+
+    async def test_versioned_fields_last_writer_wins(self):
+        self.buffer.record(1, 7, updated(1, x=2, v=[5, 1]))
+        self.buffer.record(1, 7, updated(1, x=1, v=[4, 2]))
+        await self.buffer.flush()
+        self.assertEqual(self.client.updates[0][1][0]["x"], 2)
+
+    async def test_retries_then_gives_up(self):
+        self.client.error = BoardServiceError("unavailable", 503)
+        self.buffer.record(1, 7, updated(1, x=1))
+        for _ in range(MAX_ATTEMPTS - 1):
+            await self.buffer.flush()
+            self.assertEqual(self.buffer.pending, 1)
+        await self.buffer.flush()
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(self.rejected, [(1, 7, "unavailable", [1])])
+
+    async def test_refused_batch_is_not_retried(self):
+        self.client.error = BoardServiceError("forbidden", 403)
+        self.buffer.record(1, 7, updated(1, x=1))
+        await self.buffer.flush()
+        self.assertEqual(self.buffer.pending, 0)
+        self.assertEqual(self.rejected, [(1, 7, "refused", [1])])
+
+    async def test_failed_batch_merges_under_newer_edits(self):
+        self.client.error = OSError("timeout")
+        self.buffer.record(1, 7, updated(1, x=1, y=1))
+        await self.buffer.flush()
+        self.buffer.record(1, 7, updated(1, x=2))
+        self.client.error = None
+        await self.buffer.flush()
+        self.assertEqual(self.client.updates, [(7, [{"id": 1, "x": 2, "y": 1}])])
+
+    async def test_reports_what_board_service_did_not_write(self):
+        self.client.result = {"updated": 1, "forbidden": [2], "not_found": [{"id": 3}], "invalid": [{"id": 4}]}
+        self.buffer.record(1, 7, updated(1, x=1))
+        await self.buffer.flush()
+        self.assertEqual(self.rejected, [(1, 7, "forbidden", [2]), (1, 7, "not_found", [3]),
+                                         (1, 7, "invalid", [4])])
+
+    async def test_stop_keeps_the_batch_in_flight(self):
+        self.client.delay = 0.05
+        self.buffer.flush_interval = 0.001
+        self.buffer.start()
+        self.buffer.record(1, 7, updated(1, x=1))
+        await asyncio.sleep(0.01)
+        self.client.delay = 0
+        await self.buffer.stop()
+        self.assertEqual(self.client.updates, [(7, [{"id": 1, "x": 1}])])
+        self.assertEqual(self.rejected, [])
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+
+from presence import CursorAggregator
+
+
+class CursorAggregatorTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sent = []
+
+        async def send(whiteboard_id, frame):
+            self.sent.append((whiteboard_id, frame.get_message()))
+
+        self.cursors = CursorAggregator(send, tick_ms=10)
+
+    async def test_one_frame_per_room_per_tick_with_the_latest_cursors(self):
+        for x in range(20):
+            self.cursors.update(1, 7, {"x": x, "y": 0})
+        self.cursors.update(1, 8, {"x": 1, "y": 1})
+        self.cursors.update(2, 7, {"x": 5, "y": 5})
+        self.assertEqual(self.sent, [])
+
+        await asyncio.sleep(0.03)
+        self.assertEqual(sorted(self.sent, key=lambda sent: sent[0]), [
+            (1, {"type": "cursors", "cursors": {"7": {"x": 19, "y": 0}, "8": {"x": 1, "y": 1}}}),
+            (2, {"type": "cursors", "cursors": {"7": {"x": 5, "y": 5}}}),
+        ])
+        self.assertEqual(self.cursors.frames_sent, 2)
+
+    async def test_stops_ticking_when_idle_and_restarts_on_the_next_move(self):
+        self.cursors.update(1, 7, {"x": 0, "y": 0})
+        await asyncio.sleep(0.05)
+        self.assertIsNone(self.cursors._task)
+        self.assertEqual(len(self.sent), 1)
+
+        self.cursors.update(1, 7, {"x": 1, "y": 0})
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.sent[-1], (1, {"type": "cursors", "cursors": {"7": {"x": 1, "y": 0}}}))
+
+    async def test_removed_user_is_sent_as_null(self):
+        self.cursors.update(1, 7, {"x": 0, "y": 0})
+        self.cursors.remove(1, 7)
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.sent, [(1, {"type": "cursors", "cursors": {"7": None}})])
+
+    async def test_dropped_room_sends_nothing(self):
+        self.cursors.update(1, 7, {"x": 0, "y": 0})
+        self.cursors.drop_room(1)
+        await asyncio.sleep(0.03)
+        self.assertEqual(self.sent, [])
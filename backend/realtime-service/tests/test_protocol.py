@@ -0,0 +1,148 @@
+import json
+import unittest
+
+import msgpack
+
+from protocol import (
+    JSON, MSGPACK, BatchFrame, Frame, MalformedFrame, negotiate, receive_frame, sniff_type,
+)
+
+DECODE = {"object_created", "object_updated", "object_deleted"}
+
+
+class SniffTypeTests(unittest.TestCase):
+    def test_json_type_first(self):
+        self.assertEqual(sniff_type('{"type": "object_updated", "payload": {}}'), "object_updated")
+
+    def test_json_type_not_first(self):
+        self.assertIsNone(sniff_type('{"payload": {}, "type": "object_updated"}'))
+
+    def test_msgpack(self):
+        self.assertEqual(sniff_type(msgpack.packb({"type": "cursor", "payload": {"x": 1}})), "cursor")
+        self.assertIsNone(sniff_type(msgpack.packb({"payload": 1, "type": "cursor"})))
+        self.assertIsNone(sniff_type(b""))
+
+
+class ReceiveFrameTests(unittest.TestCase):
+    def test_keeps_original_bytes(self):
+        text = '{"type": "object_updated", "payload": {"id": 1, "x": 2}}'
+        frame = receive_frame({"text": text})
+        self.assertIs(frame.encode(JSON), text)
+        self.assertEqual(frame.message_type, "object_updated")
+
+    def test_msgpack_frame(self):
+        data = msgpack.packb({"type": "object_deleted", "id": 3})
+        frame = receive_frame({"bytes": data})
+        self.assertIs(frame.encode(MSGPACK), data)
+        self.assertEqual(frame.get_message(), {"type": "object_deleted", "id": 3})
+
+    def test_malformed(self):
+        for event in (
+            {"text": "[1, 2]"},
+            {"text": '{"type": "object_created", oops}'},
+            {"text": '{"type": 5}'},
+            {"text": "{}"},
+            {"text": ""},
+            {"bytes": b"\xc1"},
+            {"bytes": msgpack.packb([1, 2])},
+        ):
+            with self.subTest(event=event), self.assertRaises(MalformedFrame):
+                receive_frame(event, DECODE)
+
+    def test_msgpack_values_without_a_json_form(self):
+        for message in (
+            {"type": "object_updated", "payload": b"\x00"},
+            {"type": "object_updated", "payload": {"data": [1, b"\x00"]}},
+            {"type": "object_updated", "payload": msgpack.ExtType(5, b"\x00")},
+            {"type": "object_updated", 1: 2},
+            {"type": "object_updated", b"key": 2},
+        ):
+            with self.subTest(message=message), self.assertRaises(MalformedFrame):
+                receive_frame({"bytes": msgpack.packb(message, use_bin_type=True)}, DECODE)
+
+    def test_other_types_are_not_decoded(self):
+        for text in ('{"type": "sticker", "payload": {"id": 1}}', '{"type": "sticker", oops}'):
+            with self.subTest(text=text):
+                frame = receive_frame({"text": text}, DECODE)
+                self.assertEqual(frame.message_type, "sticker")
+                self.assertIsNone(frame.message)
+        with self.assertRaises(MalformedFrame):
+            frame.encode(MSGPACK)
+
+        data = msgpack.packb({"type": "sticker", "payload": b"\x00"}, use_bin_type=True)
+        frame = receive_frame({"bytes": data}, DECODE)
+        self.assertIs(frame.encode(MSGPACK), data)
+        with self.assertRaises(MalformedFrame):
+            frame.encode(JSON)
+
+    def test_frames_that_could_hide_another_type_are_decoded(self):
+        for text in (
+            '{"type": "sticker", "type": "object_deleted", "id": 1}',
+            '{"type": "sticker", "typ\\u0065": "object_deleted", "id": 1}',
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(receive_frame({"text": text}, DECODE).message_type, "object_deleted")
+
+    def test_unencodable_for_a_peer_codec(self):
+        frame = receive_frame({"text": '{"type": "object_updated", "payload": {"x": %d}}' % 2 ** 70})
+        with self.assertRaises(MalformedFrame):
+            frame.encode(MSGPACK)
+
+    def test_decoded_type_wins_over_sniffed(self):
+        frame = receive_frame({"text": '{"type": "cursor", "type": "object_deleted", "id": 1}'})
+        self.assertEqual(frame.message_type, "object_deleted")
+
+
+class WithFieldTests(unittest.TestCase):
+    def test_json_splice(self):
+        frame = receive_frame({"text": '{"type": "object_updated", "payload": {"id": 1}}'})
+        stamped = frame.with_field("seq", 7)
+        self.assertEqual(json.loads(stamped.encode(JSON)),
+                         {"type": "object_updated", "payload": {"id": 1}, "seq": 7})
+
+    def test_field_wins_over_client_key(self):
+        frame = receive_frame({"text": '{"type": "cursor", "seq": 999}'})
+        self.assertEqual(json.loads(frame.with_field("seq", 1).encode(JSON))["seq"], 1)
+
+    def test_msgpack_splice(self):
+        frame = receive_frame({"bytes": msgpack.packb({"type": "cursor", "payload": {"x": 1}})})
+        stamped = frame.with_field("sender", 4)
+        self.assertEqual(MSGPACK.decode(stamped.encode(MSGPACK)),
+                         {"type": "cursor", "payload": {"x": 1}, "sender": 4})
+
+    def test_msgpack_splice_past_fixmap(self):
+        message = {"type": "x", **{f"k{i}": i for i in range(14)}}
+        frame = receive_frame({"bytes": msgpack.packb(message)})
+        stamped = frame.with_field("seq", 1).with_field("sender", 2)
+        self.assertEqual(MSGPACK.decode(stamped.encode(MSGPACK)), {**message, "seq": 1, "sender": 2})
+
+    def test_empty_object(self):
+        frame = Frame.from_encoded(JSON, "{}")
+        self.assertEqual(json.loads(frame.with_field("seq", 1).encode(JSON)), {"seq": 1})
+
+
+class BatchFrameTests(unittest.TestCase):
+    def test_spliced_from_children(self):
+        frames = [receive_frame({"text": '{"type": "a"}'}), Frame({"type": "b", "n": 1})]
+        batch = BatchFrame(frames)
+        expected = {"type": "batch", "messages": [{"type": "a"}, {"type": "b", "n": 1}]}
+        self.assertEqual(json.loads(batch.encode(JSON)), expected)
+        self.assertEqual(MSGPACK.decode(batch.encode(MSGPACK)), expected)
+
+
+class MsgpackPointsTests(unittest.TestCase):
+    def test_flat_points_round_trip(self):
+        message = {"type": "object_created", "payload": {"id": 1, "data": {"points": [1.5, 2.0, 3.25]}}}
+        self.assertEqual(MSGPACK.decode(MSGPACK.encode(message)), message)
+
+    def test_nested_points_sent_as_they_are(self):
+        message = {"type": "object_created", "payload": {"id": 1, "data": {"points": [[1, 2], [3, 4]]}}}
+        self.assertEqual(MSGPACK.decode(MSGPACK.encode(message)), message)
+
+
+class NegotiateTests(unittest.TestCase):
+    def test_prefers_msgpack(self):
+        self.assertEqual(negotiate("whiteboard.json, whiteboard.msgpack"), "whiteboard.msgpack")
+        self.assertEqual(negotiate("whiteboard.json"), "whiteboard.json")
+        self.assertIsNone(negotiate("other"))
+        self.assertIsNone(negotiate(None))
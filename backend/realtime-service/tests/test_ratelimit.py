@@ -0,0 +1,51 @@
+import unittest
+
+from ratelimit import RateLimiter, RateLimits, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_debt(self):
+        clock = Clock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+        self.assertEqual([bucket.take(), bucket.take()], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.take(), 0.1)
+        self.assertAlmostEqual(bucket.take(), 0.2)
+        clock.now = 1
+        self.assertEqual(bucket.take(), 0.0)
+
+
+class RateLimiterTests(unittest.IsolatedAsyncioTestCase):
+    async def test_disconnects_after_too_many_strikes(self):
+        clock = Clock()
+        limits = RateLimits(fast_rate=1000, fast_burst=1, room_fast_rate=1e9, room_fast_burst=1e9,
+                            max_strikes=3, strike_window=100)
+        limiter = RateLimiter(limits, clock=clock)
+        connection = limiter.connection(1)
+        admitted = [await connection.admit("cursor") for _ in range(6)]
+        self.assertEqual(admitted, [True, True, True, True, False, False])
+        self.assertEqual(limiter.throttled, 5)
+
+    async def test_structural_budget_is_separate(self):
+        clock = Clock()
+        limiter = RateLimiter(RateLimits(fast_rate=1e-3, fast_burst=1, max_strikes=1), clock=clock)
+        connection = limiter.connection(1)
+        self.assertTrue(await connection.admit("object_updated"))
+        self.assertTrue(await connection.admit("object_created"))
+        self.assertEqual(limiter.throttled, 0)
+
+    def test_room_buckets_are_shared_and_released(self):
+        limiter = RateLimiter(RateLimits())
+        first, second = limiter.connection(1), limiter.connection(1)
+        self.assertIs(first.room_fast, second.room_fast)
+        first.close()
+        self.assertIn(1, limiter.rooms)
+        second.close()
+        self.assertNotIn(1, limiter.rooms)
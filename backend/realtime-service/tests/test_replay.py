@@ -0,0 +1,89 @@
+import json
+import unittest
+
+from protocol import JSON, Frame
+from replay import ReplayLog
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def event(n):
+    return Frame({"type": "object_updated", "payload": {"id": n}})
+
+
+class ReplayLogTests(unittest.TestCase):
+    def test_stamps_consecutive_seq(self):
+        log = ReplayLog()
+        frames = [log.stamp(1, event(n), sender=None) for n in range(3)]
+        self.assertEqual([json.loads(frame.encode(JSON))["seq"] for frame in frames], [1, 2, 3])
+        self.assertEqual(log.head(1)[1], 3)
+        self.assertEqual(log.head(2)[1], 0)
+
+    def test_since_leaves_out_own_events(self):
+        log = ReplayLog()
+        epoch, _ = log.head(1)
+        log.stamp(1, event(1), sender=7)
+        log.stamp(1, event(2), sender=8)
+        log.stamp(1, event(3), sender=None)
+        missed = log.since(1, 0, epoch, user_id=7)
+        self.assertEqual([frame.get_message()["seq"] for frame in missed], [2, 3])
+        self.assertEqual(log.since(1, 3, epoch), [])
+
+    def test_gap_needs_a_resync(self):
+        log = ReplayLog(size=2)
+        epoch, _ = log.head(1)
+        for n in range(5):
+            log.stamp(1, event(n), sender=None)
+        self.assertIsNone(log.since(1, 1, epoch))
+        self.assertEqual(len(log.since(1, 3, epoch)), 2)
+        self.assertIsNone(log.since(1, 9, epoch))
+        self.assertIsNone(log.since(1, 3, "another-epoch"))
+
+    def test_trimmed_by_bytes(self):
+        size = len(Frame({"type": "object_updated", "payload": {"id": 0}, "seq": 10}).encode(JSON))
+        log = ReplayLog(max_bytes=size * 3)
+        for n in range(10):
+            log.stamp(1, event(n), sender=None)
+        room = log.rooms[1]
+        self.assertEqual(len(room.events), 3)
+        self.assertLessEqual(room.bytes, size * 3)
+
+    def test_idle_room_expires(self):
+        clock = Clock()
+        log = ReplayLog(idle_ttl=10, clock=clock)
+        epoch, _ = log.head(1)
+        log.stamp(1, event(1), sender=None)
+        log.leave(1)
+
+        clock.now = 5
+        self.assertEqual(len(log.since(1, 0, epoch)), 1)
+        log.leave(1)
+        clock.now = 16
+        log.head(2)
+        self.assertNotIn(1, log.rooms)
+        self.assertNotEqual(log.head(1)[0], epoch)
+
+    def test_rejoined_room_does_not_expire(self):
+        clock = Clock()
+        log = ReplayLog(idle_ttl=10, clock=clock)
+        log.head(1)
+        log.leave(1)
+        log.stamp(1, event(1), sender=None)
+        clock.now = 100
+        log.head(2)
+        self.assertIn(1, log.rooms)
+
+    def test_least_recently_used_room_is_evicted(self):
+        log = ReplayLog(max_rooms=2)
+        epoch, _ = log.head(1)
+        log.head(2)
+        log.head(1)
+        log.head(3)
+        self.assertEqual(list(log.rooms), [1, 3])
+        self.assertEqual(log.head(1)[0], epoch)
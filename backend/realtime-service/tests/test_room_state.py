@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+from room_state import RoomStateStore
+
+
+def created(obj, **fields):
+    return {"type": "object_created", "payload": {"id": obj, **fields}}
+
+
+class RoomStateStoreTests(unittest.IsolatedAsyncioTestCase):
+    def store(self, objects=(), max_objects=100):
+        self.fetches = 0
+
+        async def fetch(whiteboard_id, token):
+            self.fetches += 1
+            await asyncio.sleep(0)
+            return [dict(obj) if isinstance(obj, dict) else obj for obj in objects]
+
+        return RoomStateStore(fetch, max_objects)
+
+    async def test_loads_once_and_tracks_events(self):
+        store = self.store([{"id": 1, "x": 0}, {"id": 2, "x": 0}])
+        self.assertTrue(await store.load(1, "token"))
+        self.assertTrue(await store.load(1, "token"))
+        self.assertEqual(self.fetches, 1)
+
+        store.apply(1, created(3, x=5))
+        store.apply(1, {"type": "object_updated", "payload": {"id": 1, "x": 9}})
+        store.apply(1, {"type": "object_deleted", "id": 2})
+        self.assertEqual(sorted(store.snapshot(1), key=lambda obj: obj["id"]),
+                         [{"id": 1, "x": 9}, {"id": 3, "x": 5}])
+        self.assertEqual(store.total_objects, 2)
+
+    async def test_events_during_the_load_are_applied_after_it(self):
+        store = self.store([{"id": 1, "x": 0}])
+        joining = asyncio.create_task(store.load(1, "token"))
+        await asyncio.sleep(0)
+        store.apply(1, {"type": "object_updated", "payload": {"id": 1, "x": 4}})
+        self.assertTrue(await joining)
+        self.assertEqual(store.snapshot(1), [{"id": 1, "x": 4}])
+
+    async def test_state_is_dropped_with_the_last_socket(self):
+        store = self.store([{"id": 1}])
+        await store.load(1, "token")
+        await store.load(1, "token")
+        store.release(1)
+        self.assertIsNotNone(store.snapshot(1))
+        store.release(1)
+        self.assertIsNone(store.snapshot(1))
+        self.assertEqual(store.total_objects, 0)
+
+    async def test_room_over_the_limit_is_not_kept(self):
+        store = self.store([{"id": n} for n in range(5)], max_objects=4)
+        self.assertFalse(await store.load(1, "token"))
+        self.assertIsNone(store.snapshot(1))
+        self.assertEqual((store.skipped, store.total_objects), (1, 0))
+
+    async def test_room_over_the_limit_is_not_refetched_until_the_ttl(self):
+        store = self.store([{"id": n} for n in range(5)], max_objects=4)
+        now = [0.0]
+        store.skip_ttl, store.clock = 30, lambda: now[0]
+        self.assertFalse(await store.load(1, "token"))
+        store.release(1)
+        self.assertFalse(await store.load(1, "token"))
+        self.assertEqual((self.fetches, store.skipped), (1, 2))
+
+        now[0] = 30
+        self.assertFalse(await store.load(1, "token"))
+        self.assertEqual(self.fetches, 2)
+
+    async def test_failed_fetch(self):
+        async def fetch(whiteboard_id, token):
+            raise OSError("board-service down")
+
+        store = RoomStateStore(fetch)
+        self.assertFalse(await store.load(1, "token"))
+        self.assertIsNone(store.snapshot(1))
+
+    async def test_malformed_events_are_ignored(self):
+        store = self.store([{"id": 1, "x": 0}, "junk", {"no": "id"}])
+        await store.load(1, "token")
+        for message in (
+            {"type": "object_created", "payload": "x", "id": 5},
+            {"type": "object_created"},
+            {"type": "object_updated", "payload": [1], "id": 1},
+            {"type": "object_updated", "payload": {"id": [1]}},
+            {"type": "object_deleted", "id": {"a": 1}},
+        ):
+            with self.subTest(message=message):
+                self.assertTrue(store.apply(1, message))
+        self.assertEqual(store.snapshot(1), [{"id": 1, "x": 0}])
+        self.assertEqual(store.total_objects, 1)
+
+    async def test_stale_versioned_update_changes_nothing(self):
+        store = self.store([{"id": 1, "x": 0}])
+        await store.load(1, "token")
+        self.assertTrue(store.apply(1, {"type": "object_updated", "payload": {"id": 1, "x": 2, "v": [5, 1]}}))
+        self.assertFalse(store.apply(1, {"type": "object_updated", "payload": {"id": 1, "x": 1, "v": [4, 1]}}))
+        self.assertEqual(store.snapshot(1)[0]["x"], 2)
@@ -0,0 +1,112 @@
+import socket
+import sys
+import unittest
+
+from ring import HashRing
+from serve import MSG_SOCKET, Front, Worker, add_worker_label, merge_metrics
+
+
+class HashRingTests(unittest.TestCase):
+    def test_owner_is_stable(self):
+        ring, again = HashRing([0, 1, 2]), HashRing([2, 0, 1])
+        self.assertEqual([ring.owner(board) for board in range(200)], [again.owner(board) for board in range(200)])
+
+    def test_load_is_spread(self):
+        ring = HashRing(range(4))
+        counts = [0] * 4
+        for board in range(10_000):
+            counts[ring.owner(board)] += 1
+        self.assertTrue(all(1500 < count < 3500 for count in counts), counts)
+
+    def test_adding_a_node_only_moves_rooms_to_it(self):
+        before = HashRing(range(4))
+        after = HashRing(range(5))
+        moved = [board for board in range(10_000) if before.owner(board) != after.owner(board)]
+        self.assertTrue(all(after.owner(board) == 4 for board in moved))
+        self.assertLess(len(moved), 10_000 * 0.3)
+
+    def test_removing_a_node_only_moves_its_rooms(self):
+        ring = HashRing(range(4))
+        owners = {board: ring.owner(board) for board in range(2000)}
+        ring.remove(2)
+        for board, owner in owners.items():
+            if owner != 2:
+                self.assertEqual(ring.owner(board), owner)
+        self.assertNotIn(2, ring)
+
+    def test_empty_ring(self):
+        with self.assertRaises(LookupError):
+            HashRing().owner(1)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_worker_label(self):
+        self.assertEqual(add_worker_label("rooms 3", 1), 'rooms{worker="1"} 3')
+        self.assertEqual(add_worker_label('requests{path="/"} 3', 0), 'requests{worker="0",path="/"} 3')
+
+    def test_merge_keeps_families_together(self):
+        body = "# HELP rooms Rooms.\n# TYPE rooms gauge\nrooms 1\n"
+        self.assertEqual(merge_metrics({0: body, 1: body}),
+                         '# HELP rooms Rooms.\n# TYPE rooms gauge\nrooms{worker="0"} 1\nrooms{worker="1"} 1\n')
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "hand-off uses SCM_RIGHTS")
+class RoutingTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.front = Front("127.0.0.1", 0, 3, "warning")
+        self.control = {}
+        for slot in range(3):
+            ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            worker = self.front.workers[slot] = Worker(slot)
+            worker.control, worker.ready = ours, True
+            self.control[slot] = theirs
+            self.front.ring.add(slot)
+            self.addCleanup(ours.close)
+            self.addCleanup(theirs.close)
+
+    async def route(self, request: bytes) -> socket.socket:
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        server.setblocking(False)
+        client.sendall(request)
+        await self.front._route(server)
+        return client
+
+    def handed_to(self):
+        """Slots whose control socket got a client, with what each one received."""
+        handed = {}
+        for slot, control in self.control.items():
+            control.setblocking(False)
+            try:
+                message, fds, _, _ = socket.recv_fds(control, 1024, 4)
+            except BlockingIOError:
+                continue
+            handed[slot] = [socket.socket(fileno=fd) for fd in fds]
+            self.assertEqual(message, MSG_SOCKET)
+            for sock in handed[slot]:
+                self.addCleanup(sock.close)
+        return handed
+
+    async def test_room_goes_to_its_owner(self):
+        for board in (1, 42, 1337):
+            with self.subTest(board=board):
+                client = await self.route(f"GET /ws/{board}?token=t HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+                handed = self.handed_to()
+                self.assertEqual(list(handed), [self.front.ring.owner(board)])
+
+                # The worker gets the client's socket with the request still unread.
+                worker_side = handed[self.front.ring.owner(board)][0]
+                self.assertTrue(worker_side.recv(64).startswith(f"GET /ws/{board}?".encode()))
+                worker_side.sendall(b"hello")
+                self.assertEqual(client.recv(5), b"hello")
+
+    async def test_other_requests_go_to_any_worker(self):
+        await self.route(b"GET /health HTTP/1.1\r\n\r\n")
+        self.assertEqual(len(self.handed_to()), 1)
+
+    async def test_no_ready_owner_gets_503(self):
+        board = 7
+        self.front.workers[self.front.ring.owner(board)].ready = False
+        client = await self.route(f"GET /ws/{board} HTTP/1.1\r\n\r\n".encode())
+        self.assertTrue(client.recv(64).startswith(b"HTTP/1.1 503"))
+        self.assertEqual(self.handed_to(), {})
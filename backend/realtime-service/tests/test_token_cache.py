@@ -0,0 +1,58 @@
+import unittest
+
+from token_cache import TokenCache
+
+
+class TokenCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = TokenCache(max_size=2, clock=lambda: self.now)
+
+    def test_entry_expires_at_exp(self):
+        self.cache.put("a", {"user_id": 1, "exp": 1010})
+        self.now = 1009.999
+        self.assertEqual(self.cache.get("a"), {"user_id": 1, "exp": 1010})
+        self.now = 1010
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_max_ttl_caps_the_lifetime(self):
+        cache = TokenCache(max_ttl=5, clock=lambda: self.now)
+        cache.put("a", {"exp": 2000})
+        self.now = 1005
+        self.assertIsNone(cache.get("a"))
+
+    def test_tokens_without_a_future_exp_are_not_cached(self):
+        self.cache.put("a", {"user_id": 1})
+        self.cache.put("b", {"user_id": 2, "exp": 1000})
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put("a", {"exp": 2000})
+        self.cache.put("b", {"exp": 2000})
+        self.cache.get("a")
+        self.cache.put("c", {"exp": 2000})
+        self.assertIsNotNone(self.cache.get("a"))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+    def test_hits_and_misses(self):
+        verified = []
+
+        def verify(token):
+            verified.append(token)
+            return {"user_id": 1, "exp": 2000}
+
+        for _ in range(3):
+            self.assertEqual(self.cache.get_or_verify("a", verify)["user_id"], 1)
+        self.assertEqual(verified, ["a"])
+        self.assertEqual(self.cache.stats(), {"size": 1, "hits": 2, "misses": 1, "hit_rate": 2 / 3})
+
+    def test_verify_errors_are_not_cached(self):
+        def verify(token):
+            raise ValueError("bad token")
+
+        with self.assertRaises(ValueError):
+            self.cache.get_or_verify("a", verify)
+        self.assertEqual(self.cache.stats()["size"], 0)
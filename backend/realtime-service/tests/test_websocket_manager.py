@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+
+from protocol import Frame, MalformedFrame, receive_frame
+from replay import ReplayLog
+from websocket_manager import ConnectionManager
+
+from tests.common import FakeWebSocket, settle
+
+
+class SlowConsumerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_full_queue_closes_the_socket_and_leaves_the_room(self):
+        manager = ConnectionManager(max_queue=4)
+        fast, stalled = FakeWebSocket(), FakeWebSocket(stalled=True)
+        await manager.connect(fast, 1, user_id=1)
+        await manager.connect(stalled, 1, user_id=2)
+
+        for n in range(10):
+            await manager.relay_local(1, Frame({"type": "object_updated", "payload": {"id": n}}))
+            await settle()
+
+        self.assertEqual(manager.dropped_connections, 1)
+        self.assertEqual([connection.websocket for connection in manager.active_connections[1]], [fast])
+        self.assertEqual(manager.get_online_users(1), [1])
+        self.assertEqual((stalled.closed, stalled.close_code), (True, 1013))
+        self.assertEqual(len(fast.messages("object_updated")), 10)
+        self.assertFalse(fast.closed)
+
+
+class PresenceTests(unittest.IsolatedAsyncioTestCase):
+    async def test_user_with_several_sockets_is_listed_once(self):
+        manager = ConnectionManager()
+        tab1, tab2, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await manager.connect(tab1, 1, user_id=1)
+        await manager.connect(tab2, 1, user_id=1)
+        await manager.connect(other, 1, user_id=2)
+        await settle()
+        self.assertEqual(other.messages("online_users")[-1]["users"], [1, 2])
+
+        await manager.disconnect(tab1, 1, 1)
+        await manager.broadcast_presence(1)
+        await settle()
+        self.assertEqual(other.messages("online_users")[-1]["users"], [1, 2])
+
+        await manager.disconnect(tab2, 1, 1)
+        await manager.broadcast_presence(1)
+        await settle()
+        self.assertEqual(other.messages("online_users")[-1]["users"], [2])
+        self.assertEqual(manager.active_connections[1].user_refs, {2: 1})
+
+    async def test_room_goes_away_with_its_last_socket(self):
+        manager = ConnectionManager()
+        socket = FakeWebSocket()
+        await manager.connect(socket, 1, user_id=1)
+        await manager.disconnect(socket, 1, 1)
+        await manager.disconnect(socket, 1, 1)
+        self.assertNotIn(1, manager.active_connections)
+        self.assertEqual(manager.get_online_users(1), [])
+
+
+class CoalescedRelayTests(unittest.IsolatedAsyncioTestCase):
+    async def test_undecodable_frame_is_kept_out_of_the_batch(self):
+        manager = ConnectionManager(batch_window_ms=16)
+        sender, peer = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(sender, 1, user_id=1)
+        await manager.connect(peer, 1, user_id=2)
+
+        with self.assertRaises(MalformedFrame):
+            await manager.relay(1, receive_frame({"text": '{"type": "sticker", oops}'}), 1)
+        await manager.relay(1, receive_frame({"text": '{"type": "sticker", "id": 1}'}), 1)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(peer.messages("sticker"), [{"type": "sticker", "id": 1}])
+
+    async def test_joiner_gets_events_still_in_the_batch_once(self):
+        manager = ConnectionManager(batch_window_ms=16, replay=ReplayLog())
+        await manager.connect(FakeWebSocket(), 1, user_id=1)
+        await manager.relay(1, Frame({"type": "object_deleted", "id": 1}), 1)
+        await asyncio.sleep(0.05)
+        epoch, _ = manager.replay.head(1)
+
+        await manager.relay(1, Frame({"type": "object_deleted", "id": 2}), 1)
+        joiner = FakeWebSocket()
+        await manager.connect(joiner, 1, user_id=2, since=0, epoch=epoch)
+        await asyncio.sleep(0.05)
+
+        self.assertEqual([(message["id"], message["seq"]) for message in joiner.messages("object_deleted")],
+                         [(1, 1), (2, 2)])
+
+
+class SyncTests(unittest.IsolatedAsyncioTestCase):
+    async def test_sync_says_whether_edits_are_persisted_here(self):
+        manager = ConnectionManager()
+        manager.write_behind = True
+        socket = FakeWebSocket()
+        await manager.connect(socket, 1, user_id=1)
+        await settle()
+        self.assertEqual(socket.messages("sync"), [{"type": "sync", "epoch": None, "seq": 0, "write_behind": True}])
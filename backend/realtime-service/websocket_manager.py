@@ -1,43 +1,443 @@
 from fastapi import WebSocket
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional
+from decouple import config
+from coalescer import UpdateCoalescer, PendingEvent, clamp_window
+from protocol import Frame, BatchFrame, JSON, codec_for
+from room_state import STATE_EVENTS
+from presence import CursorAggregator, CURSOR_EVENTS, CURSORS_FRAME
+import metrics
+import asyncio
+import time
+
+SEND_QUEUE_SIZE = config("SEND_QUEUE_SIZE", default=256, cast=int)
+# Coalescing window for client events in every room; 0 relays every frame
+# at once. Server-side only: it adds latency for the whole room.
+ROOM_BATCH_WINDOW_MS = config("ROOM_BATCH_WINDOW_MS", default=0, cast=float)
+# How often aggregated cursor frames go out to each room.
+CURSOR_TICK_MS = config("CURSOR_TICK_MS", default=50, cast=float)
+# Client frames decoded on arrival, since the manager reads them anyway.
+# Anything else is relayed as it was sent unless a peer needs it decoded.
+DECODED_EVENTS = STATE_EVENTS | CURSOR_EVENTS
+
+
+class Connection:
+    """
+    A single client socket with its own bounded send queue.
+
+    A dedicated writer task drains the queue, so a slow client only ever
+    delays itself and never the broadcaster or the rest of the room.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int, max_queue: int = SEND_QUEUE_SIZE, codec=JSON):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.codec = codec
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        # When the client last sent anything; see HeartbeatReaper.
+        self.last_seen = time.monotonic()
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def enqueue(self, data) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _writer(self):
+        send = self.websocket.send_bytes if self.codec.binary else self.websocket.send_text
+        try:
+            while True:
+                data = await self.queue.get()
+                await send(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # The socket is gone; the receive loop will clean up the rest.
+            self.closed = True
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.stop()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def stop(self):
+        self.closed = True
+        if not self.writer_task.done():
+            self.writer_task.cancel()
+
+
+class Room:
+    """
+    The sockets joined to one whiteboard on this node.
+
+    Connections are keyed by socket identity and users are reference counted,
+    so join, leave and presence lookups are O(1) and a user with several tabs
+    is reported once.
+    """
+
+    __slots__ = ("connections", "user_refs", "coalescer")
 
-class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[int, List[tuple]] = {}
-    
-    async def connect(self, websocket: WebSocket, whiteboard_id: int, user_id: int):
-        await websocket.accept()
+        self.connections: Dict[int, Connection] = {}
+        self.user_refs: Dict[int, int] = {}
+        self.coalescer: Optional[UpdateCoalescer] = None
+
+    def add(self, connection: Connection):
+        self.connections[id(connection.websocket)] = connection
+        self.user_refs[connection.user_id] = self.user_refs.get(connection.user_id, 0) + 1
+
+    def remove(self, websocket: WebSocket) -> Optional[Connection]:
+        connection = self.connections.pop(id(websocket), None)
+        if connection is None:
+            return None
+
+        refs = self.user_refs[connection.user_id] - 1
+        if refs:
+            self.user_refs[connection.user_id] = refs
+        else:
+            del self.user_refs[connection.user_id]
+        return connection
+
+    def users(self) -> List[int]:
+        return list(self.user_refs)
+
+    def __iter__(self):
+        return iter(self.connections.values())
 
-        if whiteboard_id not in self.active_connections:
-            self.active_connections[whiteboard_id] = []
+    def __len__(self):
+        return len(self.connections)
 
-        self.active_connections[whiteboard_id].append((websocket, user_id))
+
+class ConnectionManager:
+    def __init__(self, max_queue: int = SEND_QUEUE_SIZE, backplane=None,
+                 batch_window_ms: float = ROOM_BATCH_WINDOW_MS, room_state=None,
+                 cursor_tick_ms: float = CURSOR_TICK_MS, replay=None, event_log=None,
+                 journal=None):
+        self.active_connections: Dict[int, Room] = {}
+        self.max_queue = max_queue
+        self.dropped_connections = 0
+        # Optional RedisBackplane; when set, broadcasts reach every node.
+        self.backplane = backplane
+        self.batch_window_ms = clamp_window(batch_window_ms)
+        # Optional RoomStateStore; when set, joiners get a snapshot frame.
+        self.room_state = room_state
+        self.cursors = CursorAggregator(self._send_cursors, cursor_tick_ms)
+        # Optional ReplayLog; when set, room events carry a seq and
+        # reconnecting clients can catch up with ?since=.
+        self.replay = replay
+        # Optional RedisEventLog; when set, relayed events are appended to
+        # the board's stream by the node that received them.
+        self.event_log = event_log
+        # Optional EventJournal; when set, relayed events are also written
+        # to realtime-db by the node that received them.
+        self.journal = journal
+        # Whether relayed edits are persisted here (WriteBehindBuffer), so
+        # clients may skip their own REST writes; told to them in "sync".
+        self.write_behind = False
+
+    async def connect(self, websocket: WebSocket, whiteboard_id: int, user_id: int,
+                      subprotocol: Optional[str] = None, token: Optional[str] = None,
+                      since: Optional[int] = None, epoch: Optional[str] = None) -> Connection:
+        await websocket.accept(subprotocol=subprotocol)
+
+        loaded = False
+        if self.room_state:
+            loaded = await self.room_state.load(whiteboard_id, token)
+
+        # No awaits from here until the snapshot is queued, so the snapshot
+        # and the live events that follow it line up exactly.
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            room = self.active_connections[whiteboard_id] = Room()
+            if self.batch_window_ms:
+                self.set_batch_window(whiteboard_id, self.batch_window_ms)
+
+        connection = Connection(websocket, user_id, self.max_queue, codec_for(subprotocol))
+        room.add(connection)
+
+        caught_up = False
+        if self.replay and since is not None:
+            missed = self.replay.since(whiteboard_id, since, epoch, user_id)
+            if missed is not None:
+                caught_up = True
+                if missed:
+                    frame = missed[0] if len(missed) == 1 else BatchFrame(missed)
+                    connection.enqueue(frame.encode(connection.codec))
+
+        if loaded and not caught_up:
+            snapshot = Frame({"type": "snapshot", "objects": self.room_state.snapshot(whiteboard_id)})
+            connection.enqueue(snapshot.encode(connection.codec))
+
+        if self.replay or self.write_behind:
+            # "resync": the missed events are gone and the client must reload the board.
+            head_epoch, head_seq = self.replay.head(whiteboard_id) if self.replay else (None, 0)
+            sync_type = "resync" if since is not None and not caught_up and not loaded else "sync"
+            sync = Frame({"type": sync_type, "epoch": head_epoch, "seq": head_seq,
+                          "write_behind": self.write_behind})
+            connection.enqueue(sync.encode(connection.codec))
+
+        if self.backplane:
+            await self.backplane.join(whiteboard_id, user_id)
+
+        await self.broadcast_presence(whiteboard_id)
+        return connection
+
+    async def disconnect(self, websocket: WebSocket, whiteboard_id: int, user_id: int):
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+
+        connection = room.remove(websocket)
+        if connection is None:
+            return
+
+        connection.stop()
+        if self.room_state:
+            self.room_state.release(whiteboard_id)
+        if not room:
+            if room.coalescer:
+                room.coalescer.cancel()
+            self.cursors.drop_room(whiteboard_id)
+            if self.replay:
+                self.replay.leave(whiteboard_id)
+            del self.active_connections[whiteboard_id]
+        elif user_id not in room.user_refs:
+            self.cursors.remove(whiteboard_id, user_id)
+
+        if self.backplane:
+            await self.backplane.leave(whiteboard_id, user_id, room_empty=not room)
+
+    async def close_room(self, whiteboard_id: int, code: int = 1012, reason: str = "Room moved"):
+        """Disconnect everyone in a room, e.g. when another worker now owns it."""
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+
+        for connection in list(room):
+            await self.disconnect(connection.websocket, whiteboard_id, connection.user_id)
+            asyncio.create_task(connection.close(code=code, reason=reason))
+
+    async def broadcast(self, whiteboard_id: int, message: dict, exclude_user: int = None):
+        # Encoded at most once per codec, not once per recipient.
+        frame = Frame(message)
+        await self.relay_local(whiteboard_id, frame, exclude_user)
+
+        if self.backplane:
+            await self.backplane.publish(whiteboard_id, frame.encode(JSON), exclude_user)
+
+    def set_batch_window(self, whiteboard_id: int, window_ms: float):
+        """Opt a room in to (or, with 0, out of) coalesced client events."""
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+
+        window_ms = clamp_window(window_ms)
+        if room.coalescer:
+            if room.coalescer.window * 1000 == window_ms:
+                return
+            room.coalescer.cancel()
+            room.coalescer = None
+        if window_ms:
+            room.coalescer = UpdateCoalescer(
+                window_ms,
+                lambda events: self._flush_batch(whiteboard_id, events),
+            )
+
+    async def relay(self, whiteboard_id: int, frame: Frame, sender: int):
+        """
+        Forward a client's frame to the rest of its room. The frame is only
+        decoded if coalescing or a peer on another codec needs it, which
+        raises MalformedFrame if it turns out not to decode.
+        """
+        if frame.message_type in CURSOR_EVENTS:
+            self.cursors.update(whiteboard_id, sender, frame.get_message().get("payload") or {})
+            return
+
+        self._check_batchable(whiteboard_id, frame)
+        if not self._track_state(whiteboard_id, frame):
+            # An edit older than what every peer already has.
+            return
+        if self.event_log:
+            self.event_log.append(whiteboard_id, frame.encode(JSON), sender)
+        if self.journal:
+            self.journal.append(whiteboard_id, frame.encode(JSON), sender, frame.message_type)
+
+        await self._deliver(whiteboard_id, frame, sender)
+
+        if self.backplane:
+            # Remote nodes sequence and coalesce for their own sockets.
+            await self.backplane.publish(whiteboard_id, frame.encode(JSON), sender)
+
+    async def relay_remote(self, whiteboard_id: int, data: str, exclude_user: Optional[int] = None):
+        """Entry point for frames published by other nodes."""
+        frame = Frame.from_encoded(JSON, data)
+        if frame.message_type == CURSORS_FRAME:
+            self._relay_lossy(whiteboard_id, frame)
+            return
+        if frame.message_type == "online_users":
+            await self.relay_local(whiteboard_id, frame, exclude_user)
+            return
+
+        self._check_batchable(whiteboard_id, frame)
+        self._track_state(whiteboard_id, frame)
+        await self._deliver(whiteboard_id, frame, exclude_user)
+
+    async def _deliver(self, whiteboard_id: int, frame: Frame, exclude_user: Optional[int]):
+        room = self.active_connections.get(whiteboard_id)
+        if room is not None and room.coalescer is not None:
+            # Stamped when the batch goes out (_flush_batch), so a joiner's
+            # since() never includes an event it is about to get anyway.
+            room.coalescer.add(frame, exclude_user)
+            return
+        if self.replay:
+            frame = self.replay.stamp(whiteboard_id, frame, exclude_user)
+        await self.relay_local(whiteboard_id, frame, exclude_user)
+
+    def _check_batchable(self, whiteboard_id: int, frame: Frame):
+        """
+        Decode a frame before it joins a batch, since batches are spliced
+        from their children's bytes and one bad child would spoil the batch
+        for the whole room. Raises MalformedFrame.
+        """
+        room = self.active_connections.get(whiteboard_id)
+        if room is not None and room.coalescer is not None:
+            frame.get_message()
+
+    def _track_state(self, whiteboard_id: int, frame: Frame) -> bool:
+        if self.room_state and frame.message_type in STATE_EVENTS:
+            return self.room_state.apply(whiteboard_id, frame.get_message())
+        return True
+
+    async def _flush_batch(self, whiteboard_id: int, events: List[PendingEvent]):
+        if self.replay:
+            for event in events:
+                event.frame = self.replay.stamp(whiteboard_id, event.frame, event.exclude_user)
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+
+        # One frame for everyone, plus one per sender without its own events.
+        started = time.perf_counter()
+        senders = {event.exclude_user for event in events if event.exclude_user is not None}
+        frames: Dict[Optional[int], Optional[Frame]] = {}
+        sent: Dict[Optional[int], int] = {}
+        slow: List[Connection] = []
+        sent_bytes = 0
+
+        for connection in room:
+            key = connection.user_id if connection.user_id in senders else None
+            if key not in frames:
+                children = [event.frame for event in events if key is None or event.exclude_user != key]
+                if not children:
+                    frames[key] = None
+                elif len(children) == 1:
+                    frames[key] = children[0]
+                else:
+                    frames[key] = BatchFrame(children)
+
+            frame = frames[key]
+            if frame is None:
+                continue
+            data = frame.encode(connection.codec)
+            if connection.enqueue(data):
+                sent[key] = sent.get(key, 0) + 1
+                sent_bytes += len(data)
+            elif not connection.closed:
+                slow.append(connection)
+
+        for key, count in sent.items():
+            metrics.MESSAGES_OUT.inc(frames[key].message_type, count)
+        metrics.BYTES_OUT.inc(sent_bytes)
+        metrics.BROADCAST_SECONDS.observe(time.perf_counter() - started)
+
+        for connection in slow:
+            await self._drop_slow_consumer(connection, whiteboard_id)
+
+    async def relay_local(self, whiteboard_id: int, frame: Frame, exclude_user: Optional[int] = None):
+        """Fan a frame out to the sockets on this node."""
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+
+        started = time.perf_counter()
+        slow: List[Connection] = []
+        sent = sent_bytes = 0
+
+        for connection in room:
+            if exclude_user is not None and connection.user_id == exclude_user:
+                continue
+            data = frame.encode(connection.codec)
+            if connection.enqueue(data):
+                sent += 1
+                sent_bytes += len(data)
+            elif not connection.closed:
+                slow.append(connection)
+
+        metrics.MESSAGES_OUT.inc(frame.message_type, sent)
+        metrics.BYTES_OUT.inc(sent_bytes)
+        metrics.BROADCAST_SECONDS.observe(time.perf_counter() - started)
+
+        for connection in slow:
+            await self._drop_slow_consumer(connection, whiteboard_id)
+
+    def send_to_user(self, whiteboard_id: int, user_id: int, message: dict):
+        """Queue a frame for every socket the user has in the room on this node."""
+        room = self.active_connections.get(whiteboard_id)
+        if room is None or user_id not in room.user_refs:
+            return
+        frame = Frame(message)
+        for connection in room:
+            if connection.user_id == user_id:
+                connection.enqueue(frame.encode(connection.codec))
+
+    async def _send_cursors(self, whiteboard_id: int, frame: Frame):
+        self._relay_lossy(whiteboard_id, frame)
+        if self.backplane:
+            await self.backplane.publish(whiteboard_id, frame.encode(JSON))
+
+    def _relay_lossy(self, whiteboard_id: int, frame: Frame):
+        """Fan out a frame that may be skipped; a full queue is not a slow consumer."""
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return
+        sent = sent_bytes = 0
+        for connection in room:
+            data = frame.encode(connection.codec)
+            if connection.enqueue(data):
+                sent += 1
+                sent_bytes += len(data)
+        metrics.MESSAGES_OUT.inc(frame.message_type, sent)
+        metrics.BYTES_OUT.inc(sent_bytes)
+
+    async def _drop_slow_consumer(self, connection: Connection, whiteboard_id: int):
+        """Close a client whose send queue is full; it can reconnect and resync."""
+        self.dropped_connections += 1
+        await self.disconnect(connection.websocket, whiteboard_id, connection.user_id)
+        asyncio.create_task(connection.close(code=1013, reason="Slow consumer"))
+
+    def get_online_users(self, whiteboard_id: int) -> List[int]:
+        room = self.active_connections.get(whiteboard_id)
+        if room is None:
+            return []
+
+        return room.users()
+
+    async def broadcast_presence(self, whiteboard_id: int):
+        if self.backplane:
+            users = await self.backplane.get_online_users(whiteboard_id)
+        else:
+            users = self.get_online_users(whiteboard_id)
 
         await self.broadcast(
             whiteboard_id,
             {
                 "type": "online_users",
-                "users": self.get_online_users(whiteboard_id)
+                "users": users
             }
         )
-
-    
-    def disconnect(self, websocket: WebSocket, whiteboard_id: int, user_id: int):
-        if whiteboard_id in self.active_connections:
-            self.active_connections[whiteboard_id] = [
-                (ws, uid) for ws, uid in self.active_connections[whiteboard_id]
-                if ws != websocket
-            ]
-    
-    async def broadcast(self, whiteboard_id: int, message: dict, exclude_user: int = None):
-        if whiteboard_id in self.active_connections:
-            for websocket, user_id in self.active_connections[whiteboard_id]:
-                if exclude_user is None or user_id != exclude_user:
-                    await websocket.send_text(json.dumps(message))
-                    
-    def get_online_users(self, whiteboard_id: int) -> List[int]:
-        if whiteboard_id not in self.active_connections:
-            return []
-
-        return [user_id for _, user_id in self.active_connections[whiteboard_id]]
@@ -0,0 +1,85 @@
+"""
+Property-level last-writer-wins merging with Lamport clocks, shared by
+board-service (CanvasObject.versions) and realtime-service (room state,
+write-behind, update coalescing).
+
+An edit carries a stamp `v: [counter, actor]` for every field it sets, or
+a `{field: [counter, actor]}` map once edits have been combined. Each
+object remembers, per field, the stamp of the edit that last set it, and an
+incoming value only wins over a strictly greater stamp, compared as
+(counter, actor). Clients move their counter past every stamp they see, so
+an edit made after seeing another one wins over it; concurrent edits are
+ordered by actor, the same way on every replica whatever the arrival order.
+
+Actors are random per client session; 0 is reserved for stamps
+board-service assigns to edits that arrive without one.
+"""
+from typing import Dict, List, Optional, Tuple, Union
+
+STAMP_KEY = "v"
+SERVER_ACTOR = 0
+
+Stamp = Tuple[int, int]
+Stamps = Union[Stamp, Dict[str, Stamp]]
+
+
+def parse_stamp(value) -> Optional[Stamp]:
+    if (
+        isinstance(value, (list, tuple)) and len(value) == 2
+        and all(isinstance(part, int) and not isinstance(part, bool) for part in value)
+    ):
+        return (value[0], value[1])
+    return None
+
+
+def parse_stamps(value) -> Optional[Stamps]:
+    """A single stamp, a per-field map of stamps, or None if `value` is neither."""
+    stamp = parse_stamp(value)
+    if stamp is not None:
+        return stamp
+    if isinstance(value, dict):
+        stamps = {name: parse_stamp(part) for name, part in value.items()}
+        if all(stamps.values()):
+            return stamps
+    return None
+
+
+def stamp_for(stamps: Optional[Stamps], name: str) -> Optional[Stamp]:
+    if isinstance(stamps, dict):
+        return stamps.get(name)
+    return stamps
+
+
+def clock_of(versions: Dict[str, List[int]]) -> int:
+    """The highest counter among an object's field versions."""
+    return max((version[0] for version in versions.values()), default=0)
+
+
+def next_stamp(versions: Dict[str, List[int]], actor: int = SERVER_ACTOR) -> Stamp:
+    return (clock_of(versions) + 1, actor)
+
+
+def merge(state: dict, versions: Dict[str, List[int]], fields: dict, stamps: Stamps) -> dict:
+    """
+    Apply `fields` edited at `stamps` to `state` and `versions` in place.
+
+    Returns the fields that won, which is empty when the edit was stale or
+    already applied.
+    """
+    won = {}
+    for name, value in fields.items():
+        stamp = stamp_for(stamps, name)
+        if stamp is None:
+            continue
+        current = versions.get(name)
+        if current is not None and tuple(current) >= stamp:
+            continue
+        state[name] = value
+        versions[name] = [stamp[0], stamp[1]]
+        won[name] = value
+    return won
+
+
+def supersedes(new_fields: dict, new_stamp: Stamp, old_fields: dict, old_stamp: Stamp) -> bool:
+    """True if the new edit overwrites every field of the old one, wherever it is applied."""
+    return new_stamp > old_stamp and old_fields.keys() <= new_fields.keys()
@@ -0,0 +1,87 @@
+"""
+Bounded, expiry-aware cache of verified JWTs, shared by board-service and
+realtime-service.
+
+Only tokens that passed full verification are stored, keyed by a SHA-256
+digest of the raw token, and an entry is never returned at or after the
+token's own `exp`. Tokens without an `exp` claim are not cached.
+"""
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+import hashlib
+import threading
+import time
+
+
+class TokenCache:
+    def __init__(self, max_size: int = 10_000, max_ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.clock = clock
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: Union[str, bytes]) -> bytes:
+        if isinstance(token, str):
+            token = token.encode()
+        return hashlib.sha256(token).digest()
+
+    def get(self, token: Union[str, bytes]) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, claims = entry
+                if self.clock() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: Union[str, bytes], claims: dict):
+        exp = claims.get("exp")
+        if exp is None:
+            return
+        expires_at = float(exp)
+        if self.max_ttl is not None:
+            expires_at = min(expires_at, self.clock() + self.max_ttl)
+        if expires_at <= self.clock():
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_verify(self, token: Union[str, bytes], verify: Callable[[Union[str, bytes]], dict]) -> dict:
+        """Return cached claims, or run `verify` (which raises on bad tokens) and cache them."""
+        claims = self.get(token)
+        if claims is None:
+            claims = verify(token)
+            self.put(token, claims)
+        return claims
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,8 +1,8 @@
 
-import { useEffect } from 'react';
 import { useParams } from 'react-router-dom';
 import { useCanvasStore } from '../../../store/canvasStore';
 import { useAuthStore } from '../../../store/authStore';
+import { useRealtimeStore } from '../../../store/realtimeStore';
 import { useCanvasSocket } from '../hooks/useCanvasSocket';
 import { useCanvasDrawing } from '../hooks/useCanvasDrawing';
 import { useEraserTool } from '../hooks/useEraserTool';
@@ -27,6 +27,8 @@ export default function Canvas() {
   // WebSocket connection
   const { isConnected, broadcastCreate, broadcastUpdate, broadcastDelete } = 
     useCanvasSocket(whiteboardId, token);
+  const sendCursor = useRealtimeStore((state) => state.sendCursor);
+  const closeReason = useRealtimeStore((state) => state.closeReason);
 
   // Drawing logic
   const handleDrawingComplete = (newObject) => {
@@ -52,22 +54,21 @@ export default function Canvas() {
 
   const { handleObjectClick } = useEraserTool(handleDelete);
 
-  // Load objects on mount
-  useEffect(() => {
-    console.log('Canvas mounted, whiteboard ID:', whiteboardId);
-    if (whiteboardId) {
-      loadObjects(whiteboardId);
-    }
-  }, [whiteboardId, loadObjects]);
+  // Share the pointer with the room; sendCursor sends at most one update per interval.
+  const handlePointerMove = (point) => {
+    if (point) sendCursor(point.x, point.y);
+    handleMouseMove(point);
+  };
+
+  // Objects are loaded by useCanvasSocket: from the join snapshot, or over
+  // REST when the server has none.
 
   // Handle drag end
   const handleDragEnd = (e, obj) => {
     const node = e.target;
     const updates = { x: node.x(), y: node.y() };
 
-    updateObject(obj.id, updates).then(() => {
-      broadcastUpdate(obj.id, updates);
-    });
+    broadcastUpdate(obj.id, updates, updateObject(obj.id, updates));
   };
 
   // Handle transform end
@@ -85,9 +86,7 @@ export default function Canvas() {
       height: Math.max(5, node.height() * scaleY),
     };
 
-    updateObject(obj.id, updates).then(() => {
-      broadcastUpdate(obj.id, updates);
-    });
+    broadcastUpdate(obj.id, updates, updateObject(obj.id, updates));
   };
 
   // Handle object click (select or erase)
@@ -134,11 +133,12 @@ export default function Canvas() {
         previewShape={previewShape}
         currentDrawing={currentDrawing}
         onMouseDown={handleMouseDown}
-        onMouseMove={handleMouseMove}
+        onMouseMove={handlePointerMove}
         onMouseUp={handleMouseUp}
         onDragEnd={handleDragEnd}
         onTransformEnd={handleTransformEnd}
         onObjectClick={handleCanvasObjectClick}
+        currentUserId={user?.id}
       />
 
       {/* Connection status indicator */}
@@ -146,7 +146,7 @@ export default function Canvas() {
         <div className={`px-3 py-1 rounded-full text-xs font-medium ${
           isConnected ? 'bg-green-100 text-green-800' : 'bg-red-100 text-red-800'
         }`}>
-          {isConnected ? '🟢 Live' : '🔴 Connecting...'}
+          {isConnected ? '🟢 Live' : `🔴 ${closeReason || 'Connecting...'}`}
         </div>
       </div>
     </div>
@@ -4,6 +4,7 @@ import { useCanvasStore } from '../../../store/canvasStore';
 import CanvasObjects from './CanvasObjects';
 import PreviewLayer from './PreviewLayer';
 import TransformerLayer from './TransformerLayer';
+import CursorLayer from './CursorLayer';
 
 export default function CanvasStage({
   objects,
@@ -15,6 +16,7 @@ export default function CanvasStage({
   onDragEnd,
   onTransformEnd,
   onObjectClick,
+  currentUserId,
 }) {
   const stageRef = useRef(null);
   const { deselectObject } = useCanvasStore();
@@ -78,6 +80,8 @@ export default function CanvasStage({
         {/* Transformer for resizing */}
         <TransformerLayer stageRef={stageRef} />
       </Layer>
+
+      <CursorLayer currentUserId={currentUserId} />
     </Stage>
   );
 }
\ No newline at end of file
@@ -0,0 +1,22 @@
+import { Layer, Group, Circle, Text } from 'react-konva';
+import { useRealtimeStore } from '../../../store/realtimeStore';
+
+// Other users' pointers, from the server's aggregated `cursors` frames.
+export default function CursorLayer({ currentUserId }) {
+  const cursors = useRealtimeStore((state) => state.cursors);
+
+  return (
+    <Layer listening={false}>
+      {Object.entries(cursors)
+        .filter(([userId, cursor]) =>
+          String(userId) !== String(currentUserId) &&
+          Number.isFinite(cursor?.x) && Number.isFinite(cursor?.y))
+        .map(([userId, cursor]) => (
+          <Group key={userId} x={cursor.x} y={cursor.y}>
+            <Circle radius={4} fill="#4F46E5" />
+            <Text text={`User ${userId}`} x={8} y={-6} fontSize={11} fill="#4F46E5" />
+          </Group>
+        ))}
+    </Layer>
+  );
+}
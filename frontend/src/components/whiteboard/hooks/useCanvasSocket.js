@@ -2,34 +2,67 @@ import { useEffect } from 'react';
 import { useRealtimeStore } from '../../../store/realtimeStore';
 import { useCanvasStore } from '../../../store/canvasStore';
 
+// How long to wait for the server's first frame before loading over REST.
+const INITIAL_LOAD_TIMEOUT_MS = 3000;
+
 export function useCanvasSocket(whiteboardId, token) {
   const { connect, send, setMessageHandler, isConnected, disconnect } = useRealtimeStore();
-  const { addObject, updateObject, deleteObject } = useCanvasStore();
+  const { applyRemoteCreate, applyRemoteUpdate, applyRemoteDelete, setObjects, loadObjects } = useCanvasStore();
 
   useEffect(() => {
     if (!token || !whiteboardId) return;
 
+    // The board is loaded once, from whichever comes first: a snapshot
+    // (rooms with server-side state send it before anything else) or REST,
+    // when the first frame is something else or none arrives in time.
+    let loaded = false;
+    let fallback = null;
+    const settle = () => {
+      loaded = true;
+      clearTimeout(fallback);
+    };
+    fallback = setTimeout(() => {
+      settle();
+      loadObjects(whiteboardId);
+    }, INITIAL_LOAD_TIMEOUT_MS);
+
     connect(whiteboardId, token);
 
     setMessageHandler((msg) => {
       console.log('📨 Received:', msg);
 
+      if (msg.type === 'snapshot') {
+        settle();
+        setObjects(msg.objects);
+      } else if (!loaded || msg.type === 'resync') {
+        // No snapshot, or reconnected after missing more events than the server buffers.
+        settle();
+        loadObjects(whiteboardId);
+      }
+      // Edits the server relayed but could not save; reload what it has.
+      if (msg.type === 'persist_failed') {
+        console.warn(`Edits not saved (${msg.reason}):`, msg.ids);
+        loadObjects(whiteboardId);
+      }
       if (msg.type === 'object_created') {
-        addObject(whiteboardId, msg.payload);
+        applyRemoteCreate(msg.payload);
       }
       if (msg.type === 'object_updated') {
-        updateObject(msg.payload.id, msg.payload);
+        applyRemoteUpdate(msg.payload);
       }
       if (msg.type === 'object_deleted') {
-        deleteObject(msg.id);
+        applyRemoteDelete(msg.id);
       }
     });
 
-    return () => disconnect();
-  }, [whiteboardId, token, connect, disconnect, setMessageHandler, addObject, updateObject, deleteObject]);
+    return () => {
+      clearTimeout(fallback);
+      disconnect();
+    };
+  }, [whiteboardId, token, connect, disconnect, setMessageHandler, applyRemoteCreate, applyRemoteUpdate, applyRemoteDelete, setObjects, loadObjects]);
 
   const broadcastCreate = (obj) => send({ type: 'object_created', payload: obj });
-  const broadcastUpdate = (id, updates) => send({ type: 'object_updated', payload: { id, ...updates } });
+  const broadcastUpdate = (id, updates, v) => send({ type: 'object_updated', payload: { id, ...updates, v } });
   const broadcastDelete = (id) => send({ type: 'object_deleted', id });
 
   return {
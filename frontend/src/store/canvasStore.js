@@ -1,5 +1,38 @@
 import { create } from 'zustand';
 import { canvasAPI } from '../api/canvas';
+import { useRealtimeStore } from './realtimeStore';
+
+// When realtime-service persists socket edits itself, skip the REST write;
+// an edit made while the socket is down would be lost, so it goes over REST.
+const persistedBySocket = () => useRealtimeStore.getState().persistsEdits();
+
+// Last-writer-wins per field with Lamport stamps [counter, actor], the same
+// rules as backend/shared/lww.py. The actor is random per tab; 0 is the server's.
+const ACTOR = 1 + Math.floor(Math.random() * 0x7ffffffe);
+let clock = 0;
+
+const observe = (versions) => {
+  Object.values(versions || {}).forEach(([counter]) => {
+    if (counter > clock) clock = counter;
+  });
+};
+
+const newer = (a, b) => !b || a[0] > b[0] || (a[0] === b[0] && a[1] > b[1]);
+
+// Apply fields stamped with `v` (one stamp, or one per field); returns the object unchanged if nothing won.
+const mergeFields = (obj, fields, v) => {
+  const versions = { ...(obj.versions || {}) };
+  const merged = { ...obj };
+  let changed = false;
+  Object.entries(fields).forEach(([name, value]) => {
+    const stamp = Array.isArray(v) ? v : v?.[name];
+    if (!stamp || !newer(stamp, versions[name])) return;
+    merged[name] = value;
+    versions[name] = stamp;
+    changed = true;
+  });
+  return changed ? { ...merged, versions } : obj;
+};
 
 export const useCanvasStore = create((set, get) => ({
   objects: [],
@@ -22,6 +55,7 @@ export const useCanvasStore = create((set, get) => ({
     set({ isLoading: true, error: null });
     try {
       const objects = await canvasAPI.getObjects(whiteboardId);
+      objects.forEach((obj) => observe(obj.versions));
       set({ objects, isLoading: false });
       console.log('✅ Loaded objects:', objects);
     } catch (error) {
@@ -45,23 +79,60 @@ export const useCanvasStore = create((set, get) => ({
     }
   },
 
-  updateObject: async (id, updates) => {
-    try {
-      await canvasAPI.updateObject(id, updates);
+  // A local edit: applied and stamped at once, persisted in the background.
+  // Returns the stamp to broadcast with it; nothing waits on the server.
+  updateObject: (id, updates) => {
+    clock += 1;
+    const v = [clock, ACTOR];
+    set((state) => ({
+      objects: state.objects.map((obj) =>
+        obj.id === id ? mergeFields(obj, updates, v) : obj
+      ),
+    }));
+    if (!persistedBySocket()) {
+      canvasAPI.updateObject(id, { ...updates, v }).catch((error) => {
+        console.error('❌ Failed to update object:', error);
+      });
+    }
+    return v;
+  },
+
+  // An edit from another client; older than what we have, it changes nothing.
+  applyRemoteUpdate: (payload) => {
+    const { id, v, ...fields } = payload;
+    if (!v) {
       set((state) => ({
-        objects: state.objects.map((obj) =>
-          obj.id === id ? { ...obj, ...updates } : obj
-        ),
+        objects: state.objects.map((obj) => (obj.id === id ? { ...obj, ...fields } : obj)),
       }));
-      console.log('✅ Updated object:', id, updates);
-    } catch (error) {
-      console.error('❌ Failed to update object:', error);
+      return;
     }
+    observe(Array.isArray(v) ? { v } : v);
+    set((state) => ({
+      objects: state.objects.map((obj) => (obj.id === id ? mergeFields(obj, fields, v) : obj)),
+    }));
+  },
+
+  // An object another client created (and saved); a replayed create we already have is ignored.
+  applyRemoteCreate: (obj) => {
+    observe(obj.versions);
+    set((state) => (
+      state.objects.some((existing) => existing.id === obj.id) ? state : { objects: [...state.objects, obj] }
+    ));
+  },
+
+  // An object another client deleted; it is already gone from the server.
+  applyRemoteDelete: (id) => {
+    set((state) => ({
+      objects: state.objects.filter((obj) => obj.id !== id),
+      selectedObjectId: state.selectedObjectId === id ? null : state.selectedObjectId,
+    }));
   },
 
   deleteObject: async (id) => {
     try {
-      await canvasAPI.deleteObject(id);
+      if (!persistedBySocket()) {
+        await canvasAPI.deleteObject(id);
+      }
       set((state) => ({
         objects: state.objects.filter((obj) => obj.id !== id),
         selectedObjectId: state.selectedObjectId === id ? null : state.selectedObjectId,
@@ -87,5 +158,10 @@ export const useCanvasStore = create((set, get) => ({
     set({ isDrawing: false, currentDrawing: null });
   },
 
+  setObjects: (objects) => {
+    objects.forEach((obj) => observe(obj.versions));
+    set({ objects, isLoading: false });
+  },
+
   clearObjects: () => set({ objects: [] }),
 }));
\ No newline at end of file
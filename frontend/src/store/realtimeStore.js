@@ -2,54 +2,159 @@ import { create } from 'zustand';
 
 let socket = null;
 
+// Matches the server's CURSOR_TICK_MS; faster cursor updates would be merged anyway.
+const CURSOR_INTERVAL_MS = 50;
+let cursorTimer = null;
+let pendingCursor = null;
+
+// Last event seen, so a reconnect only asks for what it missed (?since=).
+let replay = { whiteboardId: null, epoch: null, seq: 0 };
+let closedByUser = false;
+
+// Reconnects back off from 1 s to 30 s, with jitter so a room does not
+// reconnect in lockstep after a restart.
+const RECONNECT_DELAY_MS = 1000;
+const MAX_RECONNECT_DELAY_MS = 30000;
+let reconnectAttempts = 0;
+// Policy violation: bad or expired token, no access, rate limited.
+// Retrying with the same credentials would only be refused again.
+const POLICY_CLOSE = 1008;
+
+const reconnectDelay = () => {
+  const delay = Math.min(MAX_RECONNECT_DELAY_MS, RECONNECT_DELAY_MS * 2 ** reconnectAttempts);
+  reconnectAttempts += 1;
+  return delay / 2 + Math.random() * (delay / 2);
+};
+
 export const useRealtimeStore = create((set, get) => ({
   isConnected: false,
+  // Why the server closed the socket for good, e.g. "Access denied".
+  closeReason: null,
   onlineUsers: [],
+  // Latest cursor per user id, from the server's aggregated `cursors` frames.
+  cursors: {},
+  // Whether the server persists the edits it relays; told in its "sync" frame.
+  writeBehind: false,
 
   connect: (whiteboardId, token) => {
     if (socket?.readyState === WebSocket.OPEN) return;
 
     const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-    const url = `${protocol}://${window.location.hostname}/ws/${whiteboardId}?token=${encodeURIComponent(token)}`;
+    let url = `${protocol}://${window.location.hostname}/ws/${whiteboardId}?token=${encodeURIComponent(token)}`;
+    if (replay.whiteboardId === whiteboardId && replay.epoch) {
+      url += `&since=${replay.seq}&epoch=${replay.epoch}`;
+    } else {
+      replay = { whiteboardId, epoch: null, seq: 0 };
+    }
 
-    socket = new WebSocket(url);
+    closedByUser = false;
+    const ws = new WebSocket(url);
+    socket = ws;
 
-    socket.onopen = () => {
+    ws.onopen = () => {
       console.log('WebSocket Connected');
-      set({ isConnected: true });
+      reconnectAttempts = 0;
+      set({ isConnected: true, closeReason: null });
     };
 
-    socket.onmessage = (event) => {
-      const msg = JSON.parse(event.data);
+    const handleMessage = (msg) => {
+      // Server heartbeat; sockets that stop answering are dropped.
+      if (msg.type === "ping") {
+        get().send({ type: 'pong' });
+        return;
+      }
+
+      // A frame of ours the server could not parse and did not relay.
+      if (msg.type === "error") {
+        console.warn('Realtime error:', msg.reason);
+        return;
+      }
+
+      if (msg.type === "sync" || msg.type === "resync") {
+        replay = { whiteboardId, epoch: msg.epoch, seq: msg.seq };
+        set({ writeBehind: Boolean(msg.write_behind) });
+      } else if (msg.seq > replay.seq) {
+        replay.seq = msg.seq;
+      }
 
       if (msg.type === "online_users") {
         set({ onlineUsers: msg.users });
       }
 
+      if (msg.type === "cursors") {
+        const cursors = { ...get().cursors };
+        Object.entries(msg.cursors).forEach(([userId, cursor]) => {
+          if (cursor === null) delete cursors[userId];
+          else cursors[userId] = cursor;
+        });
+        set({ cursors });
+        return;
+      }
+
       if (get().onMessage) {
         get().onMessage(msg);
       }
     };
 
-    socket.onclose = () => {
-      console.log('WebSocket Disconnected');
-      set({ isConnected: false });
-      socket = null;
+    ws.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+
+      // Rooms with coalescing enabled deliver several events per frame.
+      if (msg.type === "batch") {
+        msg.messages.forEach(handleMessage);
+        return;
+      }
+
+      handleMessage(msg);
+    };
+
+    ws.onclose = (event) => {
+      console.log('WebSocket Disconnected', event.code, event.reason);
+      set({ isConnected: false, cursors: {}, writeBehind: false });
+      if (socket === ws) socket = null;
+      if (closedByUser) return;
+
+      if (event.code === POLICY_CLOSE) {
+        set({ closeReason: event.reason || 'Connection refused' });
+        return;
+      }
+
+      // The server replays what was missed, or sends "resync" if it can't.
+      setTimeout(() => {
+        // Pick up a token the user got since, e.g. by logging in again.
+        const latest = localStorage.getItem('access_token') || token;
+        if (!closedByUser && !socket) get().connect(whiteboardId, latest);
+      }, reconnectDelay());
     };
 
-    socket.onerror = (err) => console.error('WS Error:', err);
+    ws.onerror = (err) => console.error('WS Error:', err);
   },
 
+  // Whether an edit sent now will be saved by the server; if not, save it over REST.
+  persistsEdits: () => get().writeBehind && socket?.readyState === WebSocket.OPEN,
+
   send: (message) => {
     if (socket?.readyState === WebSocket.OPEN) {
       socket.send(JSON.stringify(message));
     }
   },
 
+  // Safe to call on every pointer move: only the latest position is sent, at most once per interval.
+  sendCursor: (x, y) => {
+    pendingCursor = { x, y };
+    if (cursorTimer) return;
+    cursorTimer = setTimeout(() => {
+      cursorTimer = null;
+      get().send({ type: 'cursor', payload: pendingCursor });
+    }, CURSOR_INTERVAL_MS);
+  },
+
   disconnect: () => {
+    closedByUser = true;
+    reconnectAttempts = 0;
     socket?.close();
     socket = null;
-    set({ isConnected: false });
+    set({ isConnected: false, writeBehind: false });
   },
 
   setMessageHandler: (handler) => set({ onMessage: handler }),